@@ -0,0 +1,290 @@
+# Benchmarks of the map model, the map files and the editor canvas on synthetic maps:
+#	python benchmarks/benchmark.py [--sizes 16,64,256,1024,2048] [--stories 3] [--layers 6] [--densities 0.1,0.5,1]
+#		[--repeat 3] [--no-canvas] [--out results.json] [--compare older.json]
+# Every map size and paint density is benchmarked in fresh worker processes, one for the model and one for the canvas,
+# so that the peak memory of a run is not inflated by the runs before it, and so that the model is timed without Kivy.
+# The canvas runs under Kivy's SDL2 window with SDL's offscreen video driver and a hidden window, so no display is needed.
+# Timings are the fastest of --repeat runs, along with their median. Peak memory is measured in one more run with
+# tracemalloc, which sees the numpy arrays and Python objects allocated but not the memory held by the GPU driver.
+# Results are written as JSON, by default to benchmarks/results/<commit>.json, and --compare prints how much every case
+# got slower or faster than in an older results file.
+
+# Fundamental imports
+import os, sys, json, time, argparse, subprocess, tempfile, tracemalloc, resource, pickle, platform
+from os.path import dirname, abspath, join
+
+root = dirname(dirname(abspath(__file__)))
+if not root in sys.path:
+	sys.path.insert(0, root)
+
+# Environment of the canvas workers:
+HEADLESS = {"SDL_VIDEODRIVER": "offscreen", "KIVY_NO_ARGS": "1", "KIVY_NO_CONSOLELOG": "1", "KIVY_NO_FILELOG": "1"}
+# Tiles painted one by one in the set_graphics cases, at most:
+PAINT_COUNT = 10000
+# Units whose movement range is found in the reachable case, with this budget, and routes found in the find_path case,
+# between tiles this many tiles apart:
+RANGE_COUNT = 64
+RANGE_BUDGET = 8
+ROUTE_COUNT = 16
+ROUTE_LENGTH = 32
+# Triggers set in the triggers case, at most one per 4 tiles, and queries made of them, of regions of QUERY_SIZE x
+# QUERY_SIZE tiles, about a view, and of the nearest trigger:
+TRIGGER_COUNT = 10000
+QUERY_COUNT = 100
+QUERY_SIZE = 40
+# Size in pixels of the view the canvas is scrolled in, as in an editor window:
+VIEW_SIZE = (1280, 720)
+
+# Sprites of the synthetic maps, cut from the tilesets that come with the editor:
+SPRITES = [["graphics/tileset base.png", [[[x, y]]], [128, 64]] for x in range(0, 512, 128) for y in range(0, 256, 64)]
+SPRITES += [["graphics/wall base.png", [[[x, 576]]], [128, 192]] for x in range(0, 512, 128)]
+# An animated sprite of four frames, for the animate case:
+ANIMATED = ["graphics/tileset base.png", [[[x, 0] for x in range(0, 512, 128)]], [128, 64]]
+
+def make_map(size, stories, layerCount, density, seed = 0):
+	# Returns a size x size map, whose layer l has a share density / (l + 1) of its tiles painted with random sprites.
+	import numpy
+	from isomapmaker.core.mapfile import MapFile
+	random = numpy.random.default_rng(seed)
+	mapFile = MapFile(name = "Benchmark", i = size, j = size, stories = stories, layerCount = layerCount)
+	ids = numpy.array([mapFile.spriteTable.intern(definition) for definition in SPRITES], dtype = numpy.uint16)
+	for story in mapFile.stories:
+		for l in range(layerCount):
+			painted = random.random((size, size)) < density / (l + 1)
+			story.sprites[l][painted] = ids[random.integers(0, len(ids), int(painted.sum()))]
+	return mapFile
+
+def measure(function, repeat, setup = None):
+	# Runs function repeat times, after setup if given, and returns the sorted times, the peak memory of one more run
+	# and the result of the last run.
+	times = []
+	for n in range(repeat):
+		argument = setup() if setup != None else None
+		start = time.perf_counter()
+		result = function(argument)
+		times.append(time.perf_counter() - start)
+	argument = setup() if setup != None else None
+	tracemalloc.start()
+	function(argument)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return sorted(times), peak, result
+
+def record(results, case, config, times, peak, **extra):
+	entry = dict(config, case = case, seconds = times[0], median = times[len(times) // 2], peakBytes = peak)
+	entry.update(extra)
+	results.append(entry)
+
+def run_model(config, repeat):
+	# Map creation, painting, pathfinding, and saving and loading in the map format and with pickle.
+	import numpy
+	from isomapmaker.core.mapfile import MapFile
+	from isomapmaker.core import msfformat, pathfinding
+	size, stories, layerCount, density = config["size"], config["stories"], config["layers"], config["density"]
+	results = []
+	times, peak, mapFile = measure(lambda x: MapFile(i = size, j = size, stories = stories, layerCount = layerCount), repeat)
+	record(results, "MapFile", config, times, peak)
+	mapFile = make_map(size, stories, layerCount, density)
+	random = numpy.random.default_rng(1)
+	count = min(PAINT_COUNT, size * size)
+	tiles = random.integers(0, size, (count, 2)).tolist()
+	def paint(x):
+		story = mapFile.stories[-1]
+		for n in range(count):
+			story.matrix[tiles[n][0]][tiles[n][1]].set_graphics(1, SPRITES[n % len(SPRITES)])
+	times, peak, x = measure(paint, repeat)
+	record(results, "set_graphics", config, times, peak, count = count)
+	# Walking costs 1 to 3 on most tiles, and a tenth of the tiles can not be entered.
+	for story in mapFile.stories:
+		story.stepCost[0] = random.choice([1, 2, 3, pathfinding.IMPASSABLE], size = (size, size), p = [0.6, 0.2, 0.1, 0.1])
+	times, peak, grid = measure(lambda x: pathfinding.PathGrid(mapFile), repeat)
+	record(results, "PathGrid", config, times, peak)
+	starts = [(stories - 1, int(i), int(j)) for i, j in random.integers(0, size, (RANGE_COUNT, 2))]
+	times, peak, x = measure(lambda x: grid.reachable_batch([(start, RANGE_BUDGET) for start in starts]), repeat)
+	record(results, "reachable", config, times, peak, count = RANGE_COUNT, budget = RANGE_BUDGET)
+	length = min(ROUTE_LENGTH, size - 1)
+	routes = [((0, int(i), int(j)), (0, int(i) + length, int(j) + length)) for i, j in random.integers(0, size - length, (ROUTE_COUNT, 2))]
+	times, peak, x = measure(lambda x: [grid.find_path(start, goal) for start, goal in routes], repeat)
+	record(results, "find_path", config, times, peak, count = ROUTE_COUNT, length = length)
+	count = min(TRIGGER_COUNT, size * size // 4)
+	places = random.integers(0, size, (count, 2)).tolist()
+	def set_triggers(x):
+		story = mapFile.stories[0]
+		story.triggers.clear()
+		for n in range(count):
+			story.matrix[places[n][0]][places[n][1]].set_trigger({"type": "door" if n % 2 else "chest"})
+	times, peak, x = measure(set_triggers, repeat)
+	record(results, "set_trigger", config, times, peak, count = count)
+	corners = random.integers(0, max(1, size - QUERY_SIZE), (QUERY_COUNT, 2)).tolist()
+	times, peak, x = measure(lambda x: [mapFile.find('triggers', 0, [i, i + QUERY_SIZE, j, j + QUERY_SIZE]) for i, j in corners], repeat)
+	record(results, "find triggers", config, times, peak, count = QUERY_COUNT)
+	times, peak, x = measure(lambda x: [mapFile.nearest('triggers', 0, i, j, kind = "door") for i, j in corners], repeat)
+	record(results, "nearest trigger", config, times, peak, count = QUERY_COUNT)
+	with tempfile.TemporaryDirectory() as directory:
+		for compress in [False, True]:
+			path = join(directory, "compressed.msf" if compress else "plain.msf")
+			suffix = " compressed" if compress else ""
+			times, peak, x = measure(lambda x: msfformat.save_map(mapFile, path, compress), repeat)
+			record(results, "save" + suffix, config, times, peak, fileBytes = os.path.getsize(path))
+			# Loading maps the tiles in, so every plane is read as well, as the canvas would when building all chunks.
+			def load(x):
+				loaded = msfformat.load_map(path)
+				for story in loaded.stories:
+					story.sprites.sum()
+				return loaded
+			times, peak, x = measure(load, repeat)
+			record(results, "load" + suffix, config, times, peak)
+		data = pickle.dumps(mapFile, protocol = pickle.HIGHEST_PROTOCOL)
+		times, peak, x = measure(lambda x: pickle.dumps(mapFile, protocol = pickle.HIGHEST_PROTOCOL), repeat)
+		record(results, "pickle save", config, times, peak, fileBytes = len(data))
+		times, peak, x = measure(lambda x: pickle.loads(data), repeat)
+		record(results, "pickle load", config, times, peak)
+	return results
+
+def run_canvas(config, repeat):
+	# Showing a map on the canvas, drawing a frame, zooming and painting, in a view the size of an editor window
+	# scrolled to the middle of the map.
+	from kivy.config import Config
+	Config.set('graphics', 'window_state', 'hidden')
+	from kivy.core.window import Window
+	from kivy.uix.scrollview import ScrollView
+	from isomapmaker.editor.canvas import MapCanvas
+	size, stories, layerCount, density = config["size"], config["stories"], config["layers"], config["density"]
+	results = []
+	mapFile = make_map(size, stories, layerCount, density)
+	view = ScrollView(size = VIEW_SIZE, size_hint = (None, None), scroll_x = 0.5, scroll_y = 0.5)
+	Window.add_widget(view)
+	# Every chunk in view is built at once, rather than a few per frame.
+	canvas = MapCanvas(chunksPerFrame = None)
+	view.add_widget(canvas)
+	times, peak, x = measure(lambda x: canvas.set_map(mapFile), repeat)
+	record(results, "set_map", config, times, peak)
+	canvas.currentStory = stories - 1
+	times, peak, x = measure(lambda x: canvas.clear_lists(), repeat)
+	record(results, "clear_lists", config, times, peak)
+	times, peak, x = measure(lambda x: canvas.populate_lists(), repeat, setup = lambda: canvas.clear_lists())
+	record(results, "populate_lists", config, times, peak, chunks = len(canvas.chunkCache))
+	times, peak, x = measure(lambda x: canvas.render_map(), repeat)
+	record(results, "render_map", config, times, peak)
+	times, peak, x = measure(lambda x: Window.dispatch('on_draw'), repeat)
+	record(results, "draw", config, times, peak)
+	# Switching to another layer and drawing the next frame, back and forth between the two top layers.
+	def switch_layer(x):
+		canvas.set_layer(max(0, layerCount - 2) if canvas.currentLayer == layerCount - 1 else layerCount - 1)
+		Window.dispatch('on_draw')
+	times, peak, x = measure(switch_layer, repeat)
+	record(results, "switch layer", config, times, peak)
+	def zoom(x):
+		canvas.set_zoom(0.5)
+		canvas.set_zoom(1)
+	times, peak, x = measure(zoom, repeat)
+	record(results, "zoom out and in", config, times, peak)
+	# Painting tiles in view one by one, then redrawing them as on the next frame.
+	i0, i1, j0, j1 = canvas.get_visible_range(canvas.currentStory)
+	count = min(PAINT_COUNT // 10, (i1 - i0) * (j1 - j0))
+	tiles = [(i0 + n % max(1, i1 - i0), j0 + (n // max(1, i1 - i0)) % max(1, j1 - j0)) for n in range(count)]
+	def paint(x):
+		for n in range(count):
+			canvas.set_graphics(SPRITES[n % len(SPRITES)], tiles[n][0], tiles[n][1], 1)
+		canvas.flush_dirty()
+	times, peak, x = measure(paint, repeat)
+	record(results, "canvas set_graphics", config, times, peak, count = count)
+	# Showing the next frame of the animated sprites in view and drawing it, with every tile of the bottom layer of the
+	# story shown animated.
+	mapFile.stories[canvas.currentStory].sprites[0] = mapFile.spriteTable.intern(ANIMATED)
+	canvas.refresh_stories([canvas.currentStory])
+	frames = [0]
+	def animate(x):
+		frames[0] += 1
+		for rate in list(canvas.animator.runs.keys()):
+			canvas.animator.advance(rate, frames[0])
+		Window.dispatch('on_draw')
+	times, peak, x = measure(animate, repeat)
+	record(results, "animate", config, times, peak, count = sum(len(run.tiles) for key in canvas.visibleChunks if canvas.chunkCache.peek(key) != None for run in canvas.chunkCache.peek(key).runs[0]))
+	return results
+
+def run_worker(kind, config, repeat):
+	results = run_model(config, repeat) if kind == "model" else run_canvas(config, repeat)
+	# Peak resident memory of the worker, in bytes:
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+	for result in results:
+		result["kind"] = kind
+		result["workerPeakRss"] = rss
+	return results
+
+def start_worker(kind, config, repeat):
+	# Runs a worker process and returns its results, or an entry holding its error.
+	environment = dict(os.environ, **HEADLESS) if kind == "canvas" else os.environ
+	process = subprocess.run([sys.executable, abspath(__file__), "--worker", kind, "--config", json.dumps(config), "--repeat", str(repeat)],
+							cwd = root, env = environment, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+	if process.returncode != 0:
+		return [dict(config, kind = kind, error = process.stderr.decode(errors = "replace").strip().splitlines()[-1:])]
+	return json.loads(process.stdout.decode().strip().splitlines()[-1])
+
+def get_commit():
+	try:
+		return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd = root, stderr = subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return "unknown"
+
+def compare(results, older, threshold):
+	# Prints the cases that got slower or faster than in older by more than threshold, and returns the slower ones.
+	key = lambda r: (r["kind"], r["case"], r["size"], r["stories"], r["layers"], r["density"])
+	before = dict((key(r), r) for r in older["results"] if "seconds" in r)
+	slower = []
+	print("Compared with " + older["commit"] + ":")
+	for result in results:
+		if not "seconds" in result or not key(result) in before:
+			continue
+		ratio = result["seconds"] / max(before[key(result)]["seconds"], 1e-9)
+		if abs(ratio - 1) > threshold:
+			print("  %-8s %-20s %5d  density %4.2f  %6.2fx %s" % (result["kind"], result["case"], result["size"], result["density"], ratio, "slower" if ratio > 1 else "faster"))
+			if ratio > 1:
+				slower.append(result)
+	return slower
+
+def main(arguments = None):
+	parser = argparse.ArgumentParser(description = "Benchmarks the map model, map files and canvas on synthetic maps.")
+	parser.add_argument("--sizes", default = "16,64,256,1024,2048", help = "map sizes, in tiles along each side")
+	parser.add_argument("--stories", type = int, default = 3)
+	parser.add_argument("--layers", type = int, default = 6)
+	parser.add_argument("--densities", default = "0.1,0.5,1", help = "shares of the tiles of the first layer that are painted")
+	parser.add_argument("--repeat", type = int, default = 3, help = "runs of every case, of which the fastest counts")
+	parser.add_argument("--no-canvas", action = "store_true", help = "only benchmark the model, without Kivy")
+	parser.add_argument("--out", default = None, help = "results file, benchmarks/results/<commit>.json by default")
+	parser.add_argument("--compare", default = None, help = "older results file to compare with")
+	parser.add_argument("--threshold", type = float, default = 0.2, help = "relative change reported by --compare")
+	parser.add_argument("--worker", default = None, help = argparse.SUPPRESS)
+	parser.add_argument("--config", default = None, help = argparse.SUPPRESS)
+	args = parser.parse_args(arguments)
+	if args.worker != None:
+		print(json.dumps(run_worker(args.worker, json.loads(args.config), args.repeat)))
+		return 0
+	commit = get_commit()
+	results = []
+	for size in [int(s) for s in args.sizes.split(",")]:
+		for density in [float(d) for d in args.densities.split(",")]:
+			config = {"size": size, "stories": args.stories, "layers": args.layers, "density": density}
+			for kind in ["model"] if args.no_canvas else ["model", "canvas"]:
+				for result in start_worker(kind, config, args.repeat):
+					results.append(result)
+					if "error" in result:
+						print("%-8s %5d  density %4.2f  failed: %s" % (kind, size, density, " ".join(result["error"])))
+					else:
+						print("%-8s %-20s %5d  density %4.2f  %10.2f ms  peak %8.1f MB" % (kind, result["case"], size, density, result["seconds"] * 1000, result["peakBytes"] / 2 ** 20))
+	import numpy
+	out = args.out if args.out != None else join(root, "benchmarks", "results", commit + ".json")
+	os.makedirs(dirname(abspath(out)), exist_ok = True)
+	with open(out, "w") as file:
+		json.dump({"commit": commit, "date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+					"numpy": numpy.__version__, "platform": platform.platform(), "repeat": args.repeat, "results": results}, file, indent = 1)
+	print("Results written to " + out)
+	if args.compare != None:
+		with open(args.compare) as file:
+			older = json.load(file)
+		# Slower cases give a non-zero exit status, for scripts.
+		return 1 if len(compare(results, older, args.threshold)) != 0 else 0
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
\ No newline at end of file
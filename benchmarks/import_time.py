@@ -0,0 +1,62 @@
+# Import time of the packages, each measured in fresh interpreters:
+#	python benchmarks/import_time.py [--runs 20] [--json]
+# The core is measured both on its own and after numpy, which it depends on, so that its own cost can be told apart
+# from numpy's. Every run also checks that importing the core and the editor package did not load Kivy.
+
+# Fundamental imports
+import os, sys, json, argparse, subprocess
+from os.path import dirname, abspath
+
+root = dirname(dirname(abspath(__file__)))
+
+# Name, modules imported before the clock starts, modules timed:
+CASES = [
+	("numpy", [], ["numpy"]),
+	("isomapmaker.core", [], ["isomapmaker.core"]),
+	("isomapmaker.core after numpy", ["numpy"], ["isomapmaker.core"]),
+	("isomapmaker.core.msfformat after numpy", ["numpy"], ["isomapmaker.core.msfformat"]),
+	("isomapmaker.editor after numpy", ["numpy"], ["isomapmaker.editor"]),
+]
+
+CHILD = """
+import sys, time, json, importlib
+for name in {before!r}:
+	importlib.import_module(name)
+start = time.perf_counter()
+for name in {timed!r}:
+	importlib.import_module(name)
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "kivy": any(name == "kivy" or name.startswith("kivy.") for name in sys.modules)}}))
+"""
+
+def measure(before, timed, runs):
+	# Returns the import times of runs fresh interpreters, and whether any of them loaded Kivy.
+	environment = dict(os.environ, PYTHONPATH = root + os.pathsep + os.environ.get("PYTHONPATH", ""))
+	times = []
+	kivy = False
+	for n in range(runs):
+		output = subprocess.check_output([sys.executable, "-c", CHILD.format(before = before, timed = timed)], cwd = root, env = environment)
+		result = json.loads(output.decode().strip().splitlines()[-1])
+		times.append(result["seconds"])
+		kivy = kivy or result["kivy"]
+	return sorted(times), kivy
+
+def main(arguments = None):
+	parser = argparse.ArgumentParser(description = "Measures the import time of the packages in fresh interpreters.")
+	parser.add_argument("--runs", type = int, default = 20)
+	parser.add_argument("--json", action = "store_true", help = "print the results as JSON")
+	args = parser.parse_args(arguments)
+	results = []
+	for name, before, timed in CASES:
+		times, kivy = measure(before, timed, args.runs)
+		results.append({"case": name, "runs": args.runs, "minimum": times[0], "median": times[len(times) // 2], "kivy": kivy})
+	if args.json:
+		print(json.dumps(results, indent = 1))
+	else:
+		for result in results:
+			print("%-40s min %7.2f ms   median %7.2f ms%s" % (result["case"], result["minimum"] * 1000, result["median"] * 1000, "   loads Kivy" if result["kivy"] else ""))
+	# Loading Kivy from the core or the editor package is a failure, for scripts.
+	return 1 if any(result["kivy"] for result in results) else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,4 @@
+# IsoMapMaker:
+#	isomapmaker.core	the map model, the .msf format, rendering and map tools, with no Kivy dependency, for servers and tools
+#	isomapmaker.editor	the Kivy editor, which imports Kivy only when its widgets are used
+# Importing the package itself imports neither.
\ No newline at end of file
@@ -0,0 +1,8 @@
+# The map model and its serialization, importable without Kivy or a display.
+# The model classes and the loading and saving functions are imported here. Rendering, the catalog, history and the
+# map tools are imported from their modules when needed, e.g. from isomapmaker.core import renderer.
+from .tile import Tile
+from .story import Story
+from .sprites import SpriteTable
+from .mapfile import MapFile
+from .msfformat import load_map, save_map, read_header, is_msf, MapFormatError
\ No newline at end of file
@@ -0,0 +1,128 @@
+# Fundamental imports
+import os, sqlite3, threading
+import numpy
+# Elements from subdirectories
+from . import msfformat
+from .profiling import log
+
+# Map catalog:
+# An SQLite index of the maps in a directory, holding per map file its name, ID, size, story and layer counts and a
+# thumbnail, so that listing and searching maps never opens the map files themselves.
+# Entries are refreshed by comparing the modification time and size of every file with those recorded, so only new and
+# changed files are read. Binary maps only need their header, metadata and a sample of their sprite planes, while
+# legacy pickled maps have to be loaded once.
+# Only the .msf files directly in the directory are listed, not those in subdirectories such as the autosaves.
+CATALOG_NAME = ".catalog.db"
+# Thumbnails are at most THUMBNAIL_SIZE x THUMBNAIL_SIZE pixels, one per sampled tile, stored as RGBA bytes.
+THUMBNAIL_SIZE = 64
+COLUMNS = ["file", "mtime", "bytes", "name", "ID", "iCount", "jCount", "storyCount", "layerCount", "thumbnailWidth", "thumbnailHeight", "thumbnail"]
+
+def sprite_colors(ids):
+	# Gives every sprite index a fixed colour of its own, spread over the colour wheel, and 0 transparent.
+	ids = numpy.asarray(ids, dtype = numpy.uint32)
+	colors = numpy.zeros(ids.shape + (4,), dtype = numpy.uint8)
+	colors[..., 0] = 64 + (ids * 97) % 192
+	colors[..., 1] = 64 + (ids * 57) % 192
+	colors[..., 2] = 64 + (ids * 151) % 192
+	colors[..., 3] = numpy.where(ids != 0, 255, 0)
+	return colors
+
+def make_thumbnail(mapFile, size = THUMBNAIL_SIZE):
+	# Returns [width, height, RGBA bytes] of a top-down thumbnail of a map, in which each pixel is the colour of the
+	# highest sprite painted on a sampled tile. Rows are i and columns j, the first row at the bottom.
+	iCount, jCount = mapFile.stories[0].iCount, mapFile.stories[0].jCount
+	step = max(1, -(-max(iCount, jCount) // size))
+	top = None
+	for story in mapFile.stories:
+		# Strided views only read the sampled rows of mapped planes.
+		for l in range(story.layerCount):
+			sample = numpy.asarray(story.sprites[l, ::step, ::step])
+			top = sample.copy() if top is None else numpy.where(sample != 0, sample, top)
+	pixels = sprite_colors(top)
+	return [pixels.shape[1], pixels.shape[0], pixels.tobytes()]
+
+def read_entry(path):
+	# Returns the catalog columns of a map file, except for its file name, modification time and size.
+	# Binary maps are only mapped, and only the samples for the thumbnail are read from their planes.
+	mapFile = msfformat.load_map(path)
+	width, height, thumbnail = make_thumbnail(mapFile)
+	return [str(mapFile.name), str(mapFile.ID), mapFile.stories[0].iCount, mapFile.stories[0].jCount, len(mapFile.stories), mapFile.layerCount, width, height, thumbnail]
+
+class Catalog():
+	def __init__(self, directory, **kwargs):
+		self.directory = directory
+		self.path = os.path.join(directory, CATALOG_NAME)
+		# The connection is shared with the refresh thread, one statement at a time.
+		self.lock = threading.Lock()
+		self.connection = sqlite3.connect(self.path, check_same_thread = False)
+		with self.lock, self.connection:
+			self.connection.execute("CREATE TABLE IF NOT EXISTS maps (file TEXT PRIMARY KEY, mtime REAL, bytes INTEGER, name TEXT, ID TEXT, "
+									"iCount INTEGER, jCount INTEGER, storyCount INTEGER, layerCount INTEGER, "
+									"thumbnailWidth INTEGER, thumbnailHeight INTEGER, thumbnail BLOB)")
+		self.thread = None
+
+	def refresh(self):
+		# Brings the catalog up to date with the directory. Returns the number of entries added, changed or removed.
+		files = {}
+		for entry in os.scandir(self.directory):
+			if entry.is_file() and entry.name[-4:] == ".msf":
+				stat = entry.stat()
+				files[entry.name] = (stat.st_mtime, stat.st_size)
+		with self.lock:
+			known = dict((row[0], (row[1], row[2])) for row in self.connection.execute("SELECT file, mtime, bytes FROM maps"))
+		changes = 0
+		for file in known:
+			if not file in files:
+				with self.lock, self.connection:
+					self.connection.execute("DELETE FROM maps WHERE file = ?", (file,))
+				changes += 1
+		for file, (mtime, size) in sorted(files.items()):
+			if known.get(file) == (mtime, size):
+				continue
+			try:
+				values = read_entry(os.path.join(self.directory, file))
+			except Exception:
+				# Broken files are listed without details, and read again once they change.
+				log.exception("Reading %s for the catalog failed", file)
+				values = ["", "", 0, 0, 0, 0, 0, 0, b""]
+			with self.lock, self.connection:
+				self.connection.execute("INSERT OR REPLACE INTO maps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [file, mtime, size] + values)
+			changes += 1
+		return changes
+
+	def refresh_async(self, onDone = None):
+		# Refreshes the catalog on a worker thread. onDone(changes) is called from that thread when done.
+		if self.thread != None:
+			return
+		def run():
+			changes = 0
+			try:
+				changes = self.refresh()
+			except Exception:
+				log.exception("Refreshing the catalog of %s failed", self.directory)
+			self.thread = None
+			if onDone != None:
+				onDone(changes)
+		self.thread = threading.Thread(target = run, daemon = True)
+		self.thread.start()
+
+	def search(self, text = ""):
+		# Returns the entries whose file name, map name or ID contain text, as dicts of the columns without the thumbnail,
+		# sorted by file name.
+		pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+		with self.lock:
+			rows = self.connection.execute("SELECT " + ", ".join(COLUMNS[:-1]) + " FROM maps WHERE file LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\' OR ID LIKE ? ESCAPE '\\' ORDER BY file",
+											(pattern, pattern, pattern)).fetchall()
+		return [dict(zip(COLUMNS[:-1], row)) for row in rows]
+
+	def get_thumbnail(self, file):
+		# Returns [width, height, RGBA bytes] of the thumbnail of a map file, or None.
+		with self.lock:
+			row = self.connection.execute("SELECT thumbnailWidth, thumbnailHeight, thumbnail FROM maps WHERE file = ?", (file,)).fetchone()
+		if row == None or row[0] == 0:
+			return None
+		return [row[0], row[1], bytes(row[2])]
+
+	def close(self):
+		with self.lock:
+			self.connection.close()
\ No newline at end of file
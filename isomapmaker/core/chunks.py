@@ -0,0 +1,106 @@
+# Fundamental imports
+from collections import OrderedDict
+
+# Maps are split into square chunks of CHUNK_SIZE x CHUNK_SIZE tiles, which are the unit of loading, building and eviction.
+CHUNK_SIZE = 32
+# Rough memory cost of one Kivy instruction, used to weigh chunks against the memory budget.
+INSTRUCTION_BYTES = 600
+# Default memory budget of the built chunks.
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+def chunk_count(count, chunkSize = CHUNK_SIZE):
+	# Number of chunks needed to cover count tiles.
+	return (count + chunkSize - 1) // chunkSize
+
+def chunk_bounds(ci, cj, iCount, jCount, chunkSize = CHUNK_SIZE):
+	# Returns the tile range [i0, i1, j0, j1] covered by chunk (ci, cj), clipped to the map.
+	return [ci * chunkSize, min((ci + 1) * chunkSize, iCount), cj * chunkSize, min((cj + 1) * chunkSize, jCount)]
+
+class Chunk():
+	def __init__(self, story, ci, cj, chunkSize = CHUNK_SIZE):
+		# A chunk is a window into the planes of a story. The planes may be memory-mapped, in which case the
+		# tiles of the chunk are only read from disk when the chunk is first accessed.
+		self.story = story
+		self.ci = ci
+		self.cj = cj
+		self.bounds = chunk_bounds(ci, cj, story.iCount, story.jCount, chunkSize)
+		i0, i1, j0, j1 = self.bounds
+		self.sprites = story.sprites[:, i0:i1, j0:j1]
+
+	def is_empty(self):
+		return not self.sprites.any()
+
+	def painted(self, layer):
+		# Returns the (i, j) map coordinates of the painted tiles of a layer in this chunk.
+		i0, i1, j0, j1 = self.bounds
+		di, dj = self.sprites[layer].nonzero()
+		return zip((di + i0).tolist(), (dj + j0).tolist())
+
+class ChunkCache():
+	def __init__(self, budget = DEFAULT_BUDGET, onEvict = None):
+		# Least recently used cache of built chunks, weighed in bytes against budget.
+		# onEvict(key, value) is called for every chunk pushed out of the cache, so that its instructions can be removed.
+		self.budget = budget
+		self.onEvict = onEvict
+		self.entries = OrderedDict()
+		self.costs = {}
+		self.size = 0
+		# Hit and miss counters of get:
+		self.hits = 0
+		self.misses = 0
+
+	def __contains__(self, key):
+		return key in self.entries
+
+	def __len__(self):
+		return len(self.entries)
+
+	def keys(self):
+		return list(self.entries.keys())
+
+	def get(self, key):
+		# Returns the chunk stored under key and marks it as recently used, or None.
+		if key in self.entries:
+			self.hits += 1
+			self.entries.move_to_end(key)
+			return self.entries[key]
+		self.misses += 1
+		return None
+
+	def peek(self, key):
+		# Returns the chunk stored under key, or None, without marking it as used or counting a hit or miss.
+		return self.entries.get(key)
+
+	def get_hit_rate(self):
+		if self.hits + self.misses == 0:
+			return 0
+		return self.hits / (self.hits + self.misses)
+
+	def put(self, key, value, cost):
+		if key in self.entries:
+			self.remove(key)
+		self.entries[key] = value
+		self.costs[key] = cost
+		self.size += cost
+
+	def remove(self, key):
+		value = self.entries.pop(key, None)
+		self.size -= self.costs.pop(key, 0)
+		return value
+
+	def evict(self, keep = ()):
+		# Pushes out the least recently used chunks until the cache fits its budget. Chunks in keep are never evicted.
+		for key in list(self.entries.keys()):
+			if self.size <= self.budget:
+				break
+			if key in keep:
+				continue
+			value = self.remove(key)
+			if self.onEvict != None:
+				self.onEvict(key, value)
+
+	def clear(self):
+		for key in list(self.entries.keys()):
+			value = self.remove(key)
+			if self.onEvict != None:
+				self.onEvict(key, value)
\ No newline at end of file
@@ -0,0 +1,205 @@
+# Fundamental imports
+import time
+import numpy
+
+# Undo history:
+# Instead of snapshots of the map, every change is recorded as a delta holding only what it touched. A paint or fill is
+# the flat indices of the tiles changed on one layer with their old and new sprites, a swap is the two stories swapped,
+# and a resize is the two sizes plus the data of the tiles it cut off.
+# Deltas recorded during one stroke, from pressing the mouse button until releasing it, make up a single step, and a
+# stroke following the previous one within coalesceTime seconds on the same layer joins its step.
+# The steps, both those to undo and those to redo, are kept under a memory budget in bytes, dropping the oldest ones first.
+DEFAULT_BUDGET = 16 * 1024 * 1024
+# Data of a story that a resize can cut off:
+PLANES = ['sprites', 'enterDir', 'stepCost', 'terrain']
+
+class PaintDelta():
+	def __init__(self, story, layer, index, old, new, jCount):
+		self.kind = 'paint'
+		self.story = story
+		self.layer = layer
+		# Flat indices i * jCount + j of the tiles changed:
+		self.index = numpy.asarray(index, dtype = numpy.uint32)
+		self.old = numpy.asarray(old, dtype = numpy.uint16)
+		self.new = numpy.broadcast_to(numpy.asarray(new, dtype = numpy.uint16), self.index.shape).copy()
+		self.jCount = jCount
+
+	def nbytes(self):
+		return self.index.nbytes + self.old.nbytes + self.new.nbytes
+
+	def get_tiles(self):
+		# Returns the arrays (i, j) of the tiles changed.
+		return self.index // self.jCount, self.index % self.jCount
+
+	def can_merge(self, other):
+		return other.kind == 'paint' and other.story == self.story and other.layer == self.layer and other.jCount == self.jCount
+
+	def merge(self, other):
+		# Takes in a later paint of the same layer. Where both touched a tile, the old sprite is taken from this one
+		# and the new sprite from the other. Returns False if the other delta cannot be merged.
+		if not self.can_merge(other):
+			return False
+		index = numpy.concatenate([self.index, other.index])
+		old = numpy.concatenate([self.old, other.old])
+		new = numpy.concatenate([self.new, other.new])
+		self.index, first = numpy.unique(index, return_index = True)
+		last = len(index) - 1 - numpy.unique(index[::-1], return_index = True)[1]
+		self.old = old[first]
+		self.new = new[last]
+		# Tiles painted back to what they were are no change at all.
+		changed = self.old != self.new
+		self.index, self.old, self.new = self.index[changed], self.old[changed], self.new[changed]
+		return True
+
+	def apply(self, mapFile, undo):
+		plane = mapFile.stories[self.story].sprites[self.layer]
+		i, j = self.get_tiles()
+		plane[i, j] = self.old if undo else self.new
+
+class SwapDelta():
+	def __init__(self, story1, story2):
+		self.kind = 'swap'
+		self.story1 = story1
+		self.story2 = story2
+
+	def nbytes(self):
+		return 0
+
+	def can_merge(self, other):
+		return False
+
+	def merge(self, other):
+		return False
+
+	def apply(self, mapFile, undo):
+		# Swapping is its own inverse.
+		mapFile.swap_stories(self.story1, self.story2)
+
+class ResizeDelta():
+	def __init__(self, mapFile, i, j):
+		# Records resizing mapFile to i x j tiles. Must be made before the map is resized.
+		self.kind = 'resize'
+		self.oldSize = [mapFile.stories[0].iCount, mapFile.stories[0].jCount]
+		self.newSize = [i, j]
+		# Per story, the strips of every plane that are cut off, below row i and right of column j, and the occupants
+		# and triggers on them. Growing the map cuts nothing off, and the strips are empty.
+		self.lost = []
+		for story in mapFile.stories:
+			strips = dict((name, [getattr(story, name)[..., i:, :].copy(), getattr(story, name)[..., :i, j:].copy()]) for name in PLANES)
+			occupants = dict((k, v) for k, v in story.occupants.items() if k[0] >= i or k[1] >= j)
+			triggers = dict((k, v) for k, v in story.triggers.items() if k[0] >= i or k[1] >= j)
+			self.lost.append([strips, occupants, triggers])
+
+	def nbytes(self):
+		return sum(sum(strip.nbytes for strips in lost[0].values() for strip in strips) for lost in self.lost)
+
+	def can_merge(self, other):
+		return False
+
+	def merge(self, other):
+		return False
+
+	def apply(self, mapFile, undo):
+		if not undo:
+			mapFile.resize(*self.newSize)
+			return
+		mapFile.resize(*self.oldSize)
+		i, j = self.newSize
+		for story, (strips, occupants, triggers) in zip(mapFile.stories, self.lost):
+			for name in PLANES:
+				plane = getattr(story, name)
+				plane[..., i:, :] = strips[name][0]
+				plane[..., :i, j:] = strips[name][1]
+			story.occupants.update(occupants)
+			story.triggers.update(triggers)
+			story.terrainIndex.rebuild()
+
+class Step():
+	def __init__(self):
+		# The deltas of one undo step, in the order they were made.
+		self.deltas = []
+		self.time = time.time()
+
+	def nbytes(self):
+		return sum(delta.nbytes() for delta in self.deltas)
+
+	def add(self, delta):
+		if len(self.deltas) == 0 or not self.deltas[-1].merge(delta):
+			self.deltas.append(delta)
+		self.time = time.time()
+
+class History():
+	def __init__(self, budget = DEFAULT_BUDGET, coalesceTime = 0.5):
+		self.budget = budget
+		self.coalesceTime = coalesceTime
+		self.undoSteps = []
+		self.redoSteps = []
+		# The step that the deltas of the current stroke go into, or None outside of a stroke:
+		self.stroke = None
+		# The step recorded last, which a new stroke may continue:
+		self.lastStep = None
+		# Bytes held by the steps to undo and to redo:
+		self.size = 0
+
+	def can_undo(self):
+		return len(self.undoSteps) != 0
+
+	def can_redo(self):
+		return len(self.redoSteps) != 0
+
+	def begin(self):
+		self.stroke = Step()
+
+	def end(self):
+		self.stroke = None
+
+	def record(self, delta):
+		# Records a change that has been made to the map. Outside of a stroke, every change is a step of its own.
+		self.size -= sum(step.nbytes() for step in self.redoSteps)
+		self.redoSteps = []
+		step = self.stroke if self.stroke != None else Step()
+		if len(step.deltas) == 0:
+			# The first change of a stroke joins the step recorded last if that was made just before, on the same layer.
+			last = self.lastStep
+			if self.stroke != None and last != None and time.time() - last.time < self.coalesceTime and last.deltas[-1].can_merge(delta):
+				step = self.stroke = last
+			else:
+				self.undoSteps.append(step)
+		self.size -= step.nbytes()
+		step.add(delta)
+		self.size += step.nbytes()
+		self.lastStep = step
+		self.trim()
+
+	def trim(self):
+		# Drops the oldest steps until the history fits its budget, always keeping the newest one.
+		while self.size > self.budget and len(self.undoSteps) > 1:
+			self.size -= self.undoSteps.pop(0).nbytes()
+
+	def undo(self, mapFile):
+		# Undoes the last step, and returns its deltas in the order they were undone, or [] if there is nothing to undo.
+		if not self.can_undo():
+			return []
+		self.stroke = self.lastStep = None
+		step = self.undoSteps.pop()
+		for delta in reversed(step.deltas):
+			delta.apply(mapFile, True)
+		self.redoSteps.append(step)
+		return list(reversed(step.deltas))
+
+	def redo(self, mapFile):
+		# Redoes the last step undone, and returns its deltas, or [] if there is nothing to redo.
+		if not self.can_redo():
+			return []
+		self.stroke = self.lastStep = None
+		step = self.redoSteps.pop()
+		for delta in step.deltas:
+			delta.apply(mapFile, False)
+		self.undoSteps.append(step)
+		return step.deltas
+
+	def clear(self):
+		self.undoSteps = []
+		self.redoSteps = []
+		self.stroke = self.lastStep = None
+		self.size = 0
\ No newline at end of file
@@ -0,0 +1,166 @@
+# Fundamental imports
+import numpy
+# Elements from subdirectories
+from .tile import Tile
+from .story import Story
+from .sprites import SpriteTable
+from .chunks import Chunk, CHUNK_SIZE, chunk_count
+from .graphicsobject import GraphicsObject, FloorObject
+
+class MapFile():
+	def __init__(self, name = "New Map", ID = 0000, i = 14, j = 14, stories = 1, layerCount = 6, chunkSize = CHUNK_SIZE, **kwargs):
+		# Sprite definitions and terrain types are shared between all stories, which only store indices into them.
+		self.spriteTable = SpriteTable()
+		self.terrainTypes = [None]
+		self.stories = [ Story(i = i, j = j, layerCount = layerCount, spriteTable = self.spriteTable, terrainTypes = self.terrainTypes) for m in range(stories) ]
+		self.storyCount = stories
+		self.layerCount = layerCount
+		self.name = name
+		self.ID = ID
+		# Size of the square chunks the map is loaded and rendered in.
+		self.chunkSize = chunkSize
+		# Number of changes made to each story, by story. Savers compare these to tell which stories changed since they last wrote them.
+		# Changes made through Tiles are counted by the stories themselves, which do not know their number in the map.
+		self.revisions = {}
+
+	def add_story(self, i, j, l):
+		self.stories.append(Story(i = i, j = j, layerCount = l, spriteTable = self.spriteTable, terrainTypes = self.terrainTypes))
+		self.storyCount = len(self.stories)
+		self.mark_changed(self.storyCount - 1)
+
+	def swap_stories(self, story1, story2):
+		if story1 != story2:
+			self.stories[story1], self.stories[story2] = self.stories[story2], self.stories[story1]
+			self.mark_changed(story1)
+			self.mark_changed(story2)
+
+	def resize(self, i, j):
+		# Crops or extends every story to i x j tiles.
+		for story in self.stories:
+			story.resize(i, j)
+		self.mark_changed()
+
+	def mark_changed(self, story = None):
+		# Marks one story, or all of them, as changed.
+		for s in ([story] if story != None else range(len(self.stories))):
+			self.revisions[s] = self.revisions.get(s, 0) + 1
+
+	def get_revisions(self):
+		# Revision of each story, as [changes counted by the map, changes counted by the story].
+		return [[self.revisions.get(s, 0), self.stories[s].changes] for s in range(len(self.stories))]
+
+	def nbytes(self):
+		# Memory used by the tile data of the whole map.
+		return sum(story.nbytes() for story in self.stories)
+
+	def get_chunk_counts(self):
+		# Returns the number of chunks in the [i, j] directions.
+		return [chunk_count(self.stories[0].iCount, self.chunkSize), chunk_count(self.stories[0].jCount, self.chunkSize)]
+
+	def get_chunk(self, story, ci, cj):
+		# Returns the chunk (ci, cj) of a story. Chunks are views of the story planes and cost nothing until their tiles are read.
+		return Chunk(self.stories[story], ci, cj, self.chunkSize)
+
+	# Bulk painting:
+	# These paint many tiles of one layer of a story in a single pass over the sprite plane, and return the arrays
+	# (i, j, old) of the tiles that actually changed and the sprites they held, so that only those need to be redrawn,
+	# and the change can be undone.
+	def fill(self, story, layer, mask, sprite):
+		# Paints sprite on every tile where the boolean mask over the map is True.
+		plane = self.stories[story].sprites[layer]
+		i, j = (mask & (plane != sprite)).nonzero()
+		old = plane[i, j]
+		plane[i, j] = sprite
+		if len(i) != 0:
+			self.mark_changed(story)
+		return i, j, old
+
+	def fill_rect(self, story, layer, rect, sprite):
+		# Paints sprite on the tiles i0 <= i < i1, j0 <= j < j1 of rect = [i0, i1, j0, j1].
+		plane = self.stories[story].sprites[layer]
+		i0, i1, j0, j1 = max(0, rect[0]), min(plane.shape[0], rect[1]), max(0, rect[2]), min(plane.shape[1], rect[3])
+		region = plane[i0:i1, j0:j1]
+		i, j = (region != sprite).nonzero()
+		old = region[i, j]
+		region[i, j] = sprite
+		if len(i) != 0:
+			self.mark_changed(story)
+		return i + i0, j + j0, old
+
+	def flood_region(self, story, layer, i, j, mask = None):
+		# Returns a boolean mask of the tiles connected to (i, j), sideways in i or j, that hold the same sprite on this
+		# layer. If mask is given, the region does not spread outside of it.
+		# This is a scanline fill: each step takes a whole run of matching tiles in a row, and looks for new runs
+		# in the rows on either side of it.
+		plane = self.stories[story].sprites[layer]
+		iCount, jCount = plane.shape
+		matching = plane == plane[i, j]
+		if mask is not None:
+			matching &= mask
+		region = numpy.zeros((iCount, jCount), dtype = bool)
+		if not matching[i, j]:
+			return region
+		seeds = [(i, j)]
+		while len(seeds) != 0:
+			i, j = seeds.pop()
+			if region[i, j]:
+				continue
+			# Find the run of matching tiles around j in row i.
+			blocked = numpy.flatnonzero(~matching[i])
+			left = blocked[blocked < j]
+			right = blocked[blocked > j]
+			j0 = int(left[-1]) + 1 if len(left) != 0 else 0
+			j1 = int(right[0]) if len(right) != 0 else jCount
+			region[i, j0:j1] = True
+			# Start a new run from every run of matching, unfilled tiles next to this one.
+			for n in (i - 1, i + 1):
+				if 0 <= n < iCount:
+					free = matching[n, j0:j1] & ~region[n, j0:j1]
+					starts = numpy.flatnonzero(free & ~numpy.concatenate([[False], free[:-1]]))
+					seeds += [(n, int(k) + j0) for k in starts]
+		return region
+
+	def flood_fill(self, story, layer, i, j, sprite, mask = None):
+		# Paints sprite on the region found by flood_region.
+		return self.fill(story, layer, self.flood_region(story, layer, i, j, mask), sprite)
+
+	# Spatial queries:
+	# Occupants and triggers, what being 'occupants' or 'triggers', and terrain are looked up through the spatial indexes
+	# of the stories, on story s, or on every story if s is None. See spatialindex.py.
+	def get_story_numbers(self, s):
+		return range(len(self.stories)) if s == None else [s]
+
+	def find(self, what, s = None, rect = None, kind = None):
+		# Returns [(s, i, j, value), ...] of the entries in the rectangle of tiles [i0, i1, j0, j1], or anywhere if rect is
+		# None, and only of kind if given.
+		found = []
+		for n in self.get_story_numbers(s):
+			index = getattr(self.stories[n], what)
+			if rect != None:
+				items = index.items_in(rect, kind)
+			elif kind != None:
+				items = index.items_of_kind(kind)
+			else:
+				items = index.items()
+			found += [(n, i, j, value) for (i, j), value in items]
+		return found
+
+	def nearest(self, what, s, i, j, count = 1, kind = None):
+		# Returns [(s, i, j, value), ...] of the count entries of story s nearest to (i, j), nearest first.
+		return [(s, ni, nj, value) for (ni, nj), value in getattr(self.stories[s], what).nearest(i, j, count, kind)]
+
+	def find_terrain(self, terrainType, s = None, rect = None):
+		# Returns the arrays (s, i, j) of the tiles of terrainType, in the rectangle [i0, i1, j0, j1] if given.
+		found = [numpy.zeros(0, dtype = numpy.int64)] * 3
+		if terrainType in self.terrainTypes:
+			t = self.terrainTypes.index(terrainType)
+			for n in self.get_story_numbers(s):
+				i, j = self.stories[n].terrainIndex.tiles(t, rect)
+				found = [numpy.concatenate([found[0], numpy.full(len(i), n, dtype = numpy.int64)]), numpy.concatenate([found[1], i]), numpy.concatenate([found[2], j])]
+		return found
+
+	def nearest_terrain(self, terrainType, s, i, j):
+		# Returns the tile (i, j) of terrainType on story s nearest to (i, j), or None if there is none.
+		if not terrainType in self.terrainTypes:
+			return None
+		return self.stories[s].terrainIndex.nearest(self.terrainTypes.index(terrainType), i, j)
\ No newline at end of file
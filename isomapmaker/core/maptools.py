@@ -0,0 +1,146 @@
+# Fundamental imports
+import os
+import numpy
+# Elements from subdirectories
+from . import msfformat, pngio, renderer
+
+# Map tools:
+# Checks, statistics, conversion and thumbnails for map files, without Kivy, for the command-line tool and batch jobs.
+# The functions working on a file path return a dict describing the result, so that they can run in a process pool
+# and have their results printed or collected as JSON by the caller.
+
+def file_problems(path):
+	# Returns a list of the problems found in the data of a map file as stored, empty if there are none. Loading a map
+	# builds a consistent MapFile whatever the file says, so the header, section table and metadata of binary maps, and
+	# the unpickled record of legacy maps, are checked before that.
+	if not msfformat.is_msf(path):
+		return msfformat.legacy_problems(msfformat.read_legacy_record(path))
+	header = msfformat.read_header(path)
+	fileBytes = os.path.getsize(path)
+	storyCount, layerCount = header["storyCount"], header["layerCount"]
+	problems = []
+	tableEnd = header["sectionTableOffset"] + msfformat.SECTION.size * header["sectionCount"]
+	if tableEnd > fileBytes or header["metadataOffset"] + header["metadataLength"] > fileBytes:
+		return ["the section table or metadata lies beyond the end of the file"]
+	with open(path, "rb") as file:
+		file.seek(header["sectionTableOffset"])
+		table = file.read(tableEnd - header["sectionTableOffset"])
+	# The bytes every section should hold uncompressed, by (story, kind, layer):
+	tiles = header["iCount"] * header["jCount"]
+	expected = {}
+	for s in range(storyCount):
+		for l in range(layerCount):
+			expected[(s, msfformat.SECTION_SPRITES, l)] = tiles * msfformat.SECTION_DTYPES[msfformat.SECTION_SPRITES].itemsize
+		expected[(s, msfformat.SECTION_ENTERDIR, 0)] = tiles * msfformat.SECTION_DTYPES[msfformat.SECTION_ENTERDIR].itemsize
+		expected[(s, msfformat.SECTION_STEPCOST, 0)] = 3 * tiles * msfformat.SECTION_DTYPES[msfformat.SECTION_STEPCOST].itemsize
+		expected[(s, msfformat.SECTION_TERRAIN, 0)] = tiles * msfformat.SECTION_DTYPES[msfformat.SECTION_TERRAIN].itemsize
+	seen = set()
+	for n in range(header["sectionCount"]):
+		s, l, kind, reserved, offset, length = msfformat.SECTION.unpack_from(table, n * msfformat.SECTION.size)
+		key = (s, kind, l)
+		if not key in expected:
+			problems.append("section " + str(key) + " does not belong to a map of " + str(storyCount) + " stories and " + str(layerCount) + " layers")
+		elif key in seen:
+			problems.append("section " + str(key) + " is stored more than once")
+		elif not header["flags"] & msfformat.FLAG_ZLIB and length != expected[key]:
+			problems.append("section " + str(key) + " holds " + str(length) + " bytes instead of " + str(expected[key]))
+		if offset + length > fileBytes:
+			problems.append("section " + str(key) + " lies beyond the end of the file")
+		seen.add(key)
+	for key in sorted(set(expected) - seen):
+		problems.append("section " + str(key) + " is missing")
+	try:
+		metadata = msfformat.read_metadata(path, header)
+	except ValueError as e:
+		return problems + ["the metadata cannot be read: " + str(e)]
+	for what in ["occupants", "triggers"]:
+		for s, i, j, value in metadata.get(what, []):
+			if not (0 <= s < storyCount and 0 <= i < header["iCount"] and 0 <= j < header["jCount"]):
+				problems.append(what[:-1] + " " + repr(value) + " lies outside the map, on story " + str(s) + " at (" + str(i) + ", " + str(j) + ")")
+	return problems
+
+def validate_map(mapFile, searchPaths = None):
+	# Returns a list of the problems found in a map, empty if there are none. A map loaded from a file is consistent in
+	# itself, so its file is checked with file_problems too.
+	problems = []
+	tilesets = renderer.TilesetCache(searchPaths)
+	if mapFile.storyCount != len(mapFile.stories):
+		problems.append("storyCount is " + str(mapFile.storyCount) + " but the map has " + str(len(mapFile.stories)) + " stories")
+	iCount, jCount = mapFile.stories[0].iCount, mapFile.stories[0].jCount
+	for s in range(len(mapFile.stories)):
+		story = mapFile.stories[s]
+		if story.layerCount != mapFile.layerCount or story.sprites.shape[0] != mapFile.layerCount:
+			problems.append("story " + str(s) + " has " + str(story.sprites.shape[0]) + " layers, the map " + str(mapFile.layerCount))
+		if [story.iCount, story.jCount] != [iCount, jCount] or story.sprites.shape[1:] != (iCount, jCount):
+			problems.append("story " + str(s) + " is " + str(story.sprites.shape[1]) + " x " + str(story.sprites.shape[2]) + ", the map " + str(iCount) + " x " + str(jCount))
+		highest = int(story.sprites.max()) if story.sprites.size != 0 else 0
+		if highest >= len(mapFile.spriteTable):
+			problems.append("story " + str(s) + " uses sprite " + str(highest) + ", beyond the " + str(len(mapFile.spriteTable) - 1) + " sprites of the map")
+		highest = int(story.terrain.max()) if story.terrain.size != 0 else 0
+		if highest >= len(mapFile.terrainTypes):
+			problems.append("story " + str(s) + " uses terrain " + str(highest) + ", beyond the " + str(len(mapFile.terrainTypes) - 1) + " terrain types of the map")
+	sizes = {}
+	for index in range(1, len(mapFile.spriteTable)):
+		definition = mapFile.spriteTable.get(index)
+		path = tilesets.resolve(definition[0])
+		if path == None:
+			problems.append("sprite " + str(index) + " uses the missing tileset " + str(definition[0]))
+			continue
+		if not path in sizes:
+			sizes[path] = pngio.read_size(path)
+		width, height = sizes[path]
+		w, h = definition[2]
+		for part in definition[1]:
+			for x, y in part:
+				if x < 0 or y < 0 or x + w > width or y + h > height:
+					problems.append("sprite " + str(index) + " has the region " + str([x, y, w, h]) + " outside of " + os.path.basename(path) + " (" + str(width) + " x " + str(height) + ")")
+	return problems
+
+def map_stats(mapFile):
+	# Returns a dict of statistics about a map.
+	painted = []
+	for story in mapFile.stories:
+		painted.append([int(numpy.count_nonzero(story.sprites[l])) for l in range(story.sprites.shape[0])])
+	used = set()
+	for story in mapFile.stories:
+		used.update(numpy.unique(story.sprites).tolist())
+	used.discard(0)
+	return {"name": mapFile.name, "ID": mapFile.ID, "iCount": mapFile.stories[0].iCount, "jCount": mapFile.stories[0].jCount,
+			"storyCount": len(mapFile.stories), "layerCount": mapFile.layerCount, "sprites": len(mapFile.spriteTable) - 1,
+			"spritesUsed": len(used), "terrainTypes": len(mapFile.terrainTypes) - 1, "paintedTiles": painted,
+			"occupants": sum(len(story.occupants) for story in mapFile.stories),
+			"triggers": sum(len(story.triggers) for story in mapFile.stories), "bytes": mapFile.nbytes()}
+
+# Jobs on map files:
+def validate_file(path, searchPaths = None):
+	try:
+		problems = file_problems(path)
+	except Exception as e:
+		problems = ["cannot be read: " + str(e)]
+	else:
+		# The problems of the stored data are kept when the map then fails to load because of them.
+		try:
+			problems += validate_map(msfformat.load_map(path), searchPaths)
+		except Exception as e:
+			problems.append("cannot be loaded: " + str(e))
+	return {"file": path, "ok": len(problems) == 0, "problems": problems}
+
+def stats_file(path):
+	result = map_stats(msfformat.load_map(path))
+	header = msfformat.read_header(path) if msfformat.is_msf(path) else None
+	result.update({"file": path, "fileBytes": os.path.getsize(path), "format": "legacy" if header == None else "msf " + str(header["version"]),
+					"compressed": header != None and bool(header["flags"] & msfformat.FLAG_ZLIB)})
+	return result
+
+def convert_file(path, outPath = None, compress = False):
+	# Rewrites a map, legacy or binary, in the binary format, in place unless outPath is given.
+	legacy = not msfformat.is_msf(path)
+	mapFile = msfformat.load_map(path)
+	outPath = outPath if outPath != None else path
+	msfformat.save_map(mapFile, outPath, compress)
+	return {"file": path, "output": outPath, "legacy": legacy, "bytesBefore": os.path.getsize(path) if outPath != path else None, "bytesAfter": os.path.getsize(outPath)}
+
+def thumbnail_file(path, outPath, tileWidth = 16, searchPaths = None):
+	# Renders a map into a small PNG, at tileWidth pixels per tile.
+	width, height = renderer.export_png(path, outPath, processes = 1, tileWidth = tileWidth, tileHeight = tileWidth // 2, searchPaths = searchPaths)
+	return {"file": path, "output": outPath, "width": width, "height": height}
\ No newline at end of file
@@ -0,0 +1,430 @@
+# Reading and writing of .msf map files.
+#
+# Version 1 of the format is a binary container laid out as follows, all numbers little-endian:
+#
+#	HEADER (48 bytes)
+#		magic				4s		b"MSF\0"
+#		version				uint16
+#		flags				uint16	FLAG_ZLIB if the sections are compressed, other bits reserved
+#		iCount				uint32
+#		jCount				uint32
+#		storyCount			uint32
+#		layerCount			uint32
+#		sectionCount		uint32
+#		sectionTableOffset	uint64
+#		metadataOffset		uint64
+#		metadataLength		uint32
+#
+#	SECTION TABLE (sectionCount entries of 24 bytes)
+#		story				uint32
+#		layer				uint16	layer for sprite sections, 0 otherwise
+#		kind				uint8	see SECTION_* below
+#		reserved			uint8
+#		offset				uint64	absolute offset of the section data
+#		length				uint64	length of the section data in bytes, as stored
+#
+#	METADATA
+#		UTF-8 JSON object holding:
+#		"name", "ID"		the map properties
+#		"sprites"			the deduplicated sprite table, entry n being the definition with index n + 1
+#		"terrainTypes"		the terrain table, entry n being the terrain with index n + 1
+#		"occupants"			[[story, i, j, occupant], ...]
+#		"triggers"			[[story, i, j, trigger], ...]
+#		Occupants and triggers must therefore be JSON-serializable.
+#		A map without stories has iCount and jCount 0.
+#
+#	SECTIONS
+#		Dense row-major arrays of the shapes below. Every section starts on a multiple of SECTION_ALIGN bytes,
+#		except that the sprite layers of a story follow each other without gaps.
+#		SECTION_SPRITES		uint16 [i, j], one per story and layer
+#		SECTION_ENTERDIR	uint8 [i, j], one per story
+#		SECTION_STEPCOST	uint8 [3, i, j], one per story
+#		SECTION_TERRAIN		uint16 [i, j], one per story
+#		With FLAG_ZLIB set, every section is instead the zlib stream of its array.
+#		Sections of arrays without elements, as of a map without layers, are written with length 0.
+#
+# Loading memory-maps the sections copy-on-write, so opening a map only reads the header and the metadata,
+# and the tiles are paged in from disk as they are accessed. Edits stay in memory until the map is saved.
+# Compressed sections cannot be mapped, and are decompressed into memory when the map is opened.
+#
+# Files written by older versions of the editor are pickled MapFile objects. They are recognised by the missing
+# magic and read with load_legacy_map, and convert_legacy_map rewrites them in the binary format.
+
+# Fundamental imports
+import os, json, struct, pickle, time, zlib, logging
+import numpy
+# Elements from subdirectories
+from .mapfile import MapFile
+from .story import Story
+
+# The logger of profiling.py, looked up by name so that the format does not import the profiler.
+log = logging.getLogger("isomapmaker")
+MAGIC = b"MSF\0"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIIIIQQI")
+SECTION = struct.Struct("<IHBBQQ")
+SECTION_ALIGN = 16
+# Header flags:
+FLAG_ZLIB = 1
+# zlib level of compressed sections, favouring speed:
+COMPRESS_LEVEL = 1
+# Section kinds:
+SECTION_SPRITES = 1
+SECTION_ENTERDIR = 2
+SECTION_STEPCOST = 3
+SECTION_TERRAIN = 4
+# Story planes that are stored in sections:
+PLANES = ['sprites', 'enterDir', 'stepCost', 'terrain']
+# Windows can not replace a file while it is memory-mapped, see replace_file:
+DETACH_BEFORE_REPLACE = os.name == "nt"
+REPLACE_RETRIES = 10
+REPLACE_RETRY_DELAY = 0.1
+# On-disk dtypes of the section kinds:
+SECTION_DTYPES = {
+	SECTION_SPRITES: numpy.dtype("<u2"),
+	SECTION_ENTERDIR: numpy.dtype("u1"),
+	SECTION_STEPCOST: numpy.dtype("u1"),
+	SECTION_TERRAIN: numpy.dtype("<u2"),
+}
+
+class MapFormatError(Exception):
+	pass
+
+def align(offset):
+	return (offset + SECTION_ALIGN - 1) // SECTION_ALIGN * SECTION_ALIGN
+
+def is_msf(path):
+	# Checks whether a file is in the binary format, as opposed to a legacy pickle.
+	with open(path, "rb") as file:
+		return file.read(len(MAGIC)) == MAGIC
+
+def story_planes(story, s):
+	# Lists the (story, layer, kind, array) of every section of one story, in the order they are written.
+	planes = []
+	for l in range(story.layerCount):
+		planes.append((s, l, SECTION_SPRITES, story.sprites[l]))
+	planes.append((s, 0, SECTION_ENTERDIR, story.enterDir))
+	planes.append((s, 0, SECTION_STEPCOST, story.stepCost))
+	planes.append((s, 0, SECTION_TERRAIN, story.terrain))
+	return planes
+
+def section_planes(mapFile):
+	# Lists the (story, layer, kind, array) of every section of a map, in the order they are written.
+	planes = []
+	for s in range(len(mapFile.stories)):
+		planes += story_planes(mapFile.stories[s], s)
+	return planes
+
+def encode_planes(planes, compress = False):
+	# Returns the (story, layer, kind, data) of the sections holding planes, data being the bytes to write.
+	sections = []
+	for s, l, kind, plane in planes:
+		array = numpy.ascontiguousarray(plane, dtype = SECTION_DTYPES[kind])
+		data = memoryview(array).cast("B") if array.size != 0 else b""
+		if compress:
+			data = zlib.compress(data, COMPRESS_LEVEL)
+		sections.append((s, l, kind, data))
+	return sections
+
+def map_size(mapFile):
+	# Returns [iCount, jCount, storyCount, layerCount] as written to the header.
+	if len(mapFile.stories) == 0:
+		return [0, 0, 0, mapFile.layerCount]
+	story = mapFile.stories[0]
+	return [story.iCount, story.jCount, len(mapFile.stories), mapFile.layerCount]
+
+def build_metadata(mapFile):
+	# Returns the encoded metadata of mapFile. Raises TypeError naming the first occupant or trigger that can not be
+	# written, before anything is written.
+	occupants = []
+	triggers = []
+	for s in range(len(mapFile.stories)):
+		story = mapFile.stories[s]
+		occupants += [[s, i, j, occupant] for (i, j), occupant in sorted(story.occupants.items())]
+		triggers += [[s, i, j, trigger] for (i, j), trigger in sorted(story.triggers.items())]
+	metadata = {
+		"name": mapFile.name,
+		"ID": mapFile.ID,
+		"sprites": mapFile.spriteTable.definitions[1:],
+		"terrainTypes": mapFile.terrainTypes[1:],
+		"occupants": occupants,
+		"triggers": triggers,
+	}
+	try:
+		return json.dumps(metadata).encode("utf-8")
+	except (TypeError, ValueError) as e:
+		for what, entries in [("occupant", occupants), ("trigger", triggers)]:
+			for s, i, j, value in entries:
+				try:
+					json.dumps(value)
+				except (TypeError, ValueError):
+					raise TypeError("The %s on story %d at (%d, %d) can not be saved, as it is not JSON-serializable: %r" % (what, s, i, j, value))
+		raise TypeError("The map properties can not be saved, as they are not JSON-serializable: " + str(e))
+
+def write_sections(file, size, metadata, sections, flags = 0, onProgress = None):
+	# Writes a map to an open, binary file object, from its size [iCount, jCount, storyCount, layerCount], its encoded
+	# metadata and its encoded sections. onProgress, if given, is called with the fraction written after every section.
+	sectionTableOffset = HEADER.size
+	metadataOffset = sectionTableOffset + SECTION.size * len(sections)
+	# Lay out the sections after the metadata:
+	offsets = []
+	offset = align(metadataOffset + len(metadata))
+	for s, l, kind, data in sections:
+		# The sprite layers of a story are packed back to back, so that they can be mapped as one array.
+		if kind != SECTION_SPRITES or l == 0:
+			offset = align(offset)
+		offsets.append(offset)
+		offset += len(data)
+	file.write(HEADER.pack(MAGIC, VERSION, flags, size[0], size[1], size[2], size[3], len(sections), sectionTableOffset, metadataOffset, len(metadata)))
+	for n in range(len(sections)):
+		s, l, kind, data = sections[n]
+		file.write(SECTION.pack(s, l, kind, 0, offsets[n], len(data)))
+	file.write(metadata)
+	for n in range(len(sections)):
+		file.write(bytes(offsets[n] - file.tell()))
+		file.write(sections[n][3])
+		if onProgress != None:
+			onProgress((n + 1) / len(sections))
+
+def write_map(mapFile, file, compress = False, metadata = None):
+	# Writes mapFile in the binary format to an open, binary file object.
+	if metadata == None:
+		metadata = build_metadata(mapFile)
+	write_sections(file, map_size(mapFile), metadata, encode_planes(section_planes(mapFile), compress), FLAG_ZLIB if compress else 0)
+
+def detach_map(mapFile, path):
+	# Copies the planes of mapFile that are memory-mapped from path into memory, so that nothing maps path any more.
+	# Returns the number of planes copied.
+	if not os.path.exists(path):
+		return 0
+	count = 0
+	for story in mapFile.stories:
+		for name in PLANES:
+			plane = getattr(story, name)
+			if isinstance(plane, numpy.memmap) and plane.filename != None and os.path.exists(plane.filename) and os.path.samefile(plane.filename, path):
+				setattr(story, name, numpy.array(plane))
+				count += 1
+	return count
+
+def replace_file(path, write):
+	# Calls write with a binary file object for a temporary file next to path, which replaces path once complete and
+	# flushed to disk. A crash part-way leaves the old file as it was.
+	# Maps are saved on Linux, macOS and Windows. On Linux and macOS the file a map is memory-mapped from can be replaced
+	# while mapped: the mapping keeps the old file, which is never truncated, until it is closed. Windows refuses to
+	# replace a mapped file, so there the map being saved is detached from it first, see detach_map, and a replace
+	# refused because another reader, such as the catalog, has the file open for a moment is tried again.
+	tempPath = path + ".tmp"
+	try:
+		with open(tempPath, "wb") as file:
+			write(file)
+			file.flush()
+			os.fsync(file.fileno())
+		for attempt in range(REPLACE_RETRIES):
+			try:
+				os.replace(tempPath, path)
+				break
+			except PermissionError:
+				if not DETACH_BEFORE_REPLACE or attempt == REPLACE_RETRIES - 1:
+					raise
+				time.sleep(REPLACE_RETRY_DELAY)
+	except BaseException:
+		if os.path.exists(tempPath):
+			os.remove(tempPath)
+		raise
+
+def save_map(mapFile, path, compress = False):
+	# Saves mapFile to path.
+	if DETACH_BEFORE_REPLACE:
+		detach_map(mapFile, path)
+	# The metadata is encoded first, so that a map that can not be saved leaves no temporary file behind.
+	metadata = build_metadata(mapFile)
+	replace_file(path, lambda file: write_map(mapFile, file, compress, metadata))
+
+def read_header(path):
+	# Returns the header of a map file as a dict, without reading any tile data.
+	with open(path, "rb") as file:
+		data = file.read(HEADER.size)
+	if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+		raise MapFormatError(path + " is not a binary map file")
+	magic, version, flags, iCount, jCount, storyCount, layerCount, sectionCount, sectionTableOffset, metadataOffset, metadataLength = HEADER.unpack(data)
+	if version > VERSION:
+		raise MapFormatError(path + " has format version " + str(version) + ", newer than the supported " + str(VERSION))
+	if flags & ~FLAG_ZLIB:
+		raise MapFormatError(path + " uses unknown flags " + str(flags))
+	return {"version": version, "flags": flags, "iCount": iCount, "jCount": jCount, "storyCount": storyCount, "layerCount": layerCount,
+			"sectionCount": sectionCount, "sectionTableOffset": sectionTableOffset,
+			"metadataOffset": metadataOffset, "metadataLength": metadataLength}
+
+def read_metadata(path, header = None):
+	if header == None:
+		header = read_header(path)
+	with open(path, "rb") as file:
+		file.seek(header["metadataOffset"])
+		return json.loads(file.read(header["metadataLength"]).decode("utf-8"))
+
+def read_sections(path, header):
+	with open(path, "rb") as file:
+		file.seek(header["sectionTableOffset"])
+		data = file.read(SECTION.size * header["sectionCount"])
+	sections = {}
+	for n in range(header["sectionCount"]):
+		s, l, kind, reserved, offset, length = SECTION.unpack_from(data, n * SECTION.size)
+		sections[(s, kind, l)] = (offset, length)
+	return sections
+
+def map_section(path, sections, key, shape):
+	# Memory-maps one section copy-on-write.
+	if not key in sections:
+		raise MapFormatError(path + " is missing section " + str(key))
+	offset, length = sections[key]
+	dtype = SECTION_DTYPES[key[1]]
+	if length != int(numpy.prod(shape)) * dtype.itemsize:
+		raise MapFormatError(path + " has a section of the wrong size: " + str(key))
+	if length == 0:
+		# Zero-length mappings are not allowed.
+		return numpy.zeros(shape, dtype = dtype)
+	return numpy.memmap(path, dtype = dtype, mode = "c", offset = offset, shape = shape)
+
+def read_section(path, sections, key, shape):
+	# Reads and decompresses one compressed section.
+	if not key in sections:
+		raise MapFormatError(path + " is missing section " + str(key))
+	offset, length = sections[key]
+	with open(path, "rb") as file:
+		file.seek(offset)
+		data = file.read(length)
+	try:
+		data = zlib.decompress(data)
+	except zlib.error:
+		raise MapFormatError(path + " has a corrupt section: " + str(key))
+	dtype = SECTION_DTYPES[key[1]]
+	if len(data) != int(numpy.prod(shape)) * dtype.itemsize:
+		raise MapFormatError(path + " has a section of the wrong size: " + str(key))
+	return numpy.frombuffer(data, dtype = dtype).reshape(shape).copy()
+
+def load_section(path, header, sections, key, shape):
+	if header["flags"] & FLAG_ZLIB:
+		return read_section(path, sections, key, shape)
+	return map_section(path, sections, key, shape)
+
+def load_map(path):
+	# Loads a map file, falling back to the legacy loader for pickled maps.
+	if not is_msf(path):
+		return load_legacy_map(path)
+	header = read_header(path)
+	metadata = read_metadata(path, header)
+	sections = read_sections(path, header)
+	iCount, jCount, layerCount = header["iCount"], header["jCount"], header["layerCount"]
+	mapFile = MapFile(name = metadata["name"], ID = metadata["ID"], i = iCount, j = jCount, stories = 0, layerCount = layerCount)
+	for definition in metadata["sprites"]:
+		mapFile.spriteTable.intern(definition)
+	mapFile.terrainTypes += metadata["terrainTypes"]
+	for s in range(header["storyCount"]):
+		spriteKeys = [(s, SECTION_SPRITES, l) for l in range(layerCount)]
+		planeBytes = iCount * jCount * SECTION_DTYPES[SECTION_SPRITES].itemsize
+		if layerCount == 0:
+			sprites = numpy.zeros((0, iCount, jCount), dtype = SECTION_DTYPES[SECTION_SPRITES])
+		elif header["flags"] & FLAG_ZLIB:
+			sprites = numpy.stack([read_section(path, sections, k, (iCount, jCount)) for k in spriteKeys])
+		elif all(k in sections and sections[k][0] == sections[spriteKeys[0]][0] + l * planeBytes for l, k in enumerate(spriteKeys)):
+			# The layers follow each other, so they are mapped as one block.
+			first = sections[spriteKeys[0]][0]
+			sprites = map_section(path, {spriteKeys[0]: (first, planeBytes * layerCount)}, spriteKeys[0], (layerCount, iCount, jCount))
+		else:
+			sprites = numpy.stack([map_section(path, sections, k, (iCount, jCount)) for k in spriteKeys])
+		mapFile.stories.append(Story(i = iCount, j = jCount, layerCount = layerCount,
+										spriteTable = mapFile.spriteTable, terrainTypes = mapFile.terrainTypes,
+										sprites = sprites,
+										enterDir = load_section(path, header, sections, (s, SECTION_ENTERDIR, 0), (iCount, jCount)),
+										stepCost = load_section(path, header, sections, (s, SECTION_STEPCOST, 0), (3, iCount, jCount)),
+										terrain = load_section(path, header, sections, (s, SECTION_TERRAIN, 0), (iCount, jCount))))
+	mapFile.storyCount = len(mapFile.stories)
+	for s, i, j, occupant in metadata["occupants"]:
+		mapFile.stories[s].occupants[(i, j)] = occupant
+	for s, i, j, trigger in metadata["triggers"]:
+		mapFile.stories[s].triggers[(i, j)] = trigger
+	return mapFile
+
+# Legacy pickled maps:
+class LegacyRecord():
+	# Stands in for the classes of the old object graph, so that old pickles load whatever the current classes look like.
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+
+class LegacyUnpickler(pickle.Unpickler):
+	legacyClasses = [("mapfile", "MapFile"), ("story", "Story"), ("tile", "Tile"),
+					("graphicsobject", "GraphicsObject"), ("graphicsobject", "FloorObject")]
+
+	def find_class(self, module, name):
+		if (module, name) in self.legacyClasses:
+			return LegacyRecord
+		return super(LegacyUnpickler, self).find_class(module, name)
+
+def read_legacy_record(path):
+	# Unpickles a legacy map as it was saved, without converting it.
+	with open(path, "rb") as file:
+		record = LegacyUnpickler(file).load()
+	if not hasattr(record, "stories") or len(record.stories) == 0:
+		raise MapFormatError(path + " is neither a binary nor a pickled map file")
+	return record
+
+def legacy_problems(record):
+	# Returns a list of the places where a legacy map disagrees with itself: its storyCount and the stories it holds,
+	# the sizes of its stories, and its layerCount and the graphics layers of its tiles. Converting such a map keeps
+	# the stories it holds, the size of its first story and layerCount layers, dropping or adding the rest.
+	problems = []
+	storyCount = getattr(record, "storyCount", len(record.stories))
+	if storyCount != len(record.stories):
+		problems.append("storyCount is " + str(storyCount) + " but the map has " + str(len(record.stories)) + " stories")
+	iCount = len(record.stories[0].matrix)
+	jCount = len(record.stories[0].matrix[0]) if iCount != 0 else 0
+	layerCount = getattr(record, "layerCount", 6)
+	for s in range(len(record.stories)):
+		matrix = record.stories[s].matrix
+		if len(matrix) != iCount or any(len(row) != jCount for row in matrix):
+			problems.append("story " + str(s) + " is not " + str(iCount) + " x " + str(jCount) + " like the first story")
+		# Only the first tile of each kind of mismatch is reported, not every tile of a broken story.
+		counts = {}
+		for i in range(len(matrix)):
+			for j in range(len(matrix[i])):
+				count = len(getattr(matrix[i][j], "graphics", []))
+				if count != layerCount and not count in counts:
+					counts[count] = (i, j)
+		for count, (i, j) in sorted(counts.items()):
+			problems.append("story " + str(s) + " has tiles with " + str(count) + " graphics layers, the map " + str(layerCount) + ", first at (" + str(i) + ", " + str(j) + ")")
+	return problems
+
+def load_legacy_map(path):
+	# Reads a pickled map, where every story holds a matrix of Tile objects, and copies it into a new MapFile.
+	# Maps that disagree with themselves are loaded all the same, as best they can be, with a warning for every problem.
+	record = read_legacy_record(path)
+	for problem in legacy_problems(record):
+		log.warning("%s: %s", path, problem)
+	iCount = len(record.stories[0].matrix)
+	jCount = len(record.stories[0].matrix[0])
+	layerCount = getattr(record, "layerCount", 6)
+	mapFile = MapFile(name = getattr(record, "name", "New Map"), ID = getattr(record, "ID", 0), i = iCount, j = jCount, stories = len(record.stories), layerCount = layerCount)
+	for s in range(len(record.stories)):
+		story = mapFile.stories[s]
+		matrix = record.stories[s].matrix
+		for i in range(min(iCount, len(matrix))):
+			for j in range(min(jCount, len(matrix[i]))):
+				old = matrix[i][j]
+				tile = story.get_tile(i, j)
+				for l in range(min(layerCount, len(old.graphics))):
+					if old.graphics[l] != [None]:
+						tile.set_graphics(l, old.graphics[l])
+				for n in range(8):
+					tile.set_dir(n, old.enterDir[n])
+				tile.stepCost = old.stepCost
+				if old.terrainType != None:
+					tile.terrainType = old.terrainType
+				tile.set_trigger(old.trigger)
+				tile.set_occupant(old.occupant)
+	return mapFile
+
+def convert_legacy_map(path, newPath = None):
+	# Rewrites a pickled map in the binary format, in place unless newPath is given.
+	mapFile = load_legacy_map(path)
+	save_map(mapFile, newPath if newPath != None else path)
+	return mapFile
\ No newline at end of file
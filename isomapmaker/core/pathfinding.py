@@ -0,0 +1,245 @@
+# Fundamental imports
+import heapq
+import numpy
+
+# Pathfinding:
+# Movement works on the planes of the stories. Each tile costs its stepCost for the kind of movement to enter, and may
+# only be entered from the directions set in its enterDir. Occupied tiles can be passed only if the unit moving allows
+# it, for instance for its allies, and never be stopped on. Stories are joined by transitions, such as stairs, which
+# lead from one tile to another for a cost.
+# A PathGrid is built once from the map, for instance once per turn, and answers any number of queries until the map
+# changes: find_path runs A* for a single route, and reachable runs Dijkstra from a tile until the movement budget is
+# spent, giving every tile a unit can reach and the route to it.
+# The grid stores, for each of the 8 directions, the cost of moving from every tile to its neighbour in that direction,
+# or 0 if the move is not allowed, in flat arrays. Tiles are numbered (s * iCount + i) * jCount + j, so that the
+# neighbour in a direction is always a fixed offset away, and the searches only look up numbers and push them on a heap.
+
+# Kinds of movement, the first index of stepCost:
+WALKING = 0
+RIDING = 1
+FLYING = 2
+# A step cost of 0 is that of a tile whose cost was never set, and counts as 1. Tiles costing IMPASSABLE can not be entered.
+IMPASSABLE = 255
+# The neighbours (di, dj) in the order of the bits of enterDir:
+# [left, top-left, top, top-right, right, bottom-right, bottom, bottom-left]
+DIRECTIONS = [(-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0)]
+# Left, top, right and bottom only touch the tile at a corner:
+CORNERS = [0, 2, 4, 6]
+
+class PathGrid():
+	def __init__(self, mapFile, kind = WALKING, corners = True, transitions = None):
+		# corners allows moving to the tiles touching at a corner, without cutting past a corner that can not be entered.
+		# transitions is a list of ((s, i, j), (s2, i2, j2), cost), each leading one way from a tile to another, with
+		# cost None for the step cost of the tile entered. See transitions_from_triggers.
+		self.mapFile = mapFile
+		self.kind = kind
+		self.corners = corners
+		self.transitions = transitions if transitions != None else []
+		self.refresh()
+
+	def refresh(self):
+		# Builds the arrays from the map again, after it was changed.
+		stories = self.mapFile.stories
+		self.storyCount = len(stories)
+		self.iCount = stories[0].iCount
+		self.jCount = stories[0].jCount
+		if any(story.iCount != self.iCount or story.jCount != self.jCount for story in stories):
+			raise ValueError("All stories must have the same size to find paths across them")
+		S, I, J = self.storyCount, self.iCount, self.jCount
+		cost = numpy.stack([story.stepCost[self.kind] for story in stories])
+		cost[cost == 0] = 1
+		passable = cost != IMPASSABLE
+		enterDir = numpy.stack([story.enterDir for story in stories])
+		self.minCost = int(cost[passable].min()) if passable.any() else 1
+		# Step costs fit in a byte, so the moves take 8 bytes per tile.
+		moves = numpy.zeros((8, S, I, J), dtype = numpy.uint8)
+		for d, (di, dj) in enumerate(DIRECTIONS):
+			if d in CORNERS and not self.corners:
+				continue
+			# The tile entered must allow entering from the opposite direction, the one the move comes from.
+			allowed = neighbours(passable, di, dj, False) & (neighbours(enterDir, di, dj, 0) >> ((d + 4) % 8) & 1 != 0)
+			if d in CORNERS:
+				# Both tiles next to the corner passed must be passable.
+				allowed &= neighbours(passable, di, 0, False) & neighbours(passable, 0, dj, False)
+			moves[d] = numpy.where(allowed, neighbours(cost, di, dj, 0), 0)
+		self.passable = passable.ravel()
+		self.cost = cost.ravel()
+		# The searches index memoryviews, which give plain ints much faster than numpy arrays do.
+		self.moves = [memoryview(row) for row in moves.reshape(8, -1)]
+		self.offsets = [di * J + dj for di, dj in DIRECTIONS]
+		self.links = {}
+		jumps = False
+		for a, b, linkCost in self.transitions:
+			n, m = self.index(a), self.index(b)
+			if self.passable[m]:
+				self.links.setdefault(n, []).append((m, int(self.cost[m]) if linkCost == None else linkCost))
+				jumps = jumps or tuple(a[1:]) != tuple(b[1:])
+		# The A* estimate is the fewest steps to the goal times the cheapest step. Transitions between different (i, j)
+		# could beat it, in which case A* falls back to Dijkstra.
+		self.estimateScale = 0 if jumps else self.minCost
+		self.refresh_occupants()
+
+	def refresh_occupants(self):
+		# Reads the occupants again, after units moved. This is much cheaper than refresh.
+		self.occupants = {}
+		for s, story in enumerate(self.mapFile.stories):
+			for (i, j), occupant in story.occupants.items():
+				self.occupants[self.index((s, i, j))] = occupant
+
+	def index(self, tile):
+		s, i, j = tile
+		if not (0 <= s < self.storyCount and 0 <= i < self.iCount and 0 <= j < self.jCount):
+			raise IndexError("Tile %s lies outside the map" % (tile,))
+		return (s * self.iCount + i) * self.jCount + j
+
+	def tile(self, n):
+		sn, j = divmod(n, self.jCount)
+		s, i = divmod(sn, self.iCount)
+		return (s, i, j)
+
+	def blocked(self, start, canPass):
+		# The tiles that can not be moved through by a unit starting on start, which it occupies itself.
+		return set(n for n, occupant in self.occupants.items() if n != start and (canPass == None or not canPass(occupant)))
+
+	def reachable(self, start, budget = None, canPass = None):
+		# Returns the Reach of a unit on the tile start = (s, i, j), spending at most budget, or any amount if None.
+		# canPass(occupant) tells whether the unit may move through a tile occupied by occupant.
+		n0 = self.index(start)
+		blocked = self.blocked(n0, canPass)
+		moves, offsets, links = self.moves, self.offsets, self.links
+		best = {n0: 0}
+		parents = {n0: None}
+		heap = [(0, n0)]
+		while len(heap) != 0:
+			c, n = heapq.heappop(heap)
+			if c > best[n]:
+				continue
+			steps = [(n + offsets[d], moves[d][n]) for d in range(8) if moves[d][n]]
+			if n in links:
+				steps += links[n]
+			for m, k in steps:
+				mc = c + k
+				if (budget == None or mc <= budget) and mc < best.get(m, mc + 1) and not m in blocked:
+					best[m] = mc
+					parents[m] = n
+					heapq.heappush(heap, (mc, m))
+		return Reach(self, n0, best, parents)
+
+	def reachable_batch(self, queries):
+		# Answers many range queries at once, as for every unit of a side at the start of its turn. Each query is
+		# (start, budget) or (start, budget, canPass). Queries asked more than once are answered once.
+		answers = {}
+		reaches = []
+		for query in queries:
+			key = (tuple(query[0]), query[1], query[2] if len(query) > 2 else None)
+			if not key in answers:
+				answers[key] = self.reachable(*key)
+			reaches.append(answers[key])
+		return reaches
+
+	def estimate(self, n, goal):
+		# The fewest steps from n to goal, on any story, times the cheapest step.
+		(s, i, j), (gs, gi, gj) = self.tile(n), goal
+		if self.corners:
+			steps = max(abs(i - gi), abs(j - gj))
+		else:
+			steps = abs(i - gi) + abs(j - gj)
+		return steps * self.estimateScale
+
+	def find_path(self, start, goal, budget = None, canPass = None):
+		# Returns [cost, [start, ..., goal]] for the cheapest route from start to goal, found by A*, or None if goal
+		# can not be reached within budget. Like any tile stopped on, goal must not be occupied.
+		n0, g = self.index(start), self.index(goal)
+		blocked = self.blocked(n0, canPass)
+		if (g in self.occupants or not self.passable[g]) and g != n0:
+			return None
+		goalTile = self.tile(g)
+		moves, offsets, links = self.moves, self.offsets, self.links
+		best = {n0: 0}
+		parents = {n0: None}
+		heap = [(self.estimate(n0, goalTile), 0, n0)]
+		while len(heap) != 0:
+			f, c, n = heapq.heappop(heap)
+			if n == g:
+				return [c, path_from(self, parents, g)]
+			if c > best[n]:
+				continue
+			steps = [(n + offsets[d], moves[d][n]) for d in range(8) if moves[d][n]]
+			if n in links:
+				steps += links[n]
+			for m, k in steps:
+				mc = c + k
+				if (budget == None or mc <= budget) and mc < best.get(m, mc + 1) and not m in blocked:
+					best[m] = mc
+					parents[m] = n
+					heapq.heappush(heap, (mc + self.estimate(m, goalTile), mc, m))
+		return None
+
+class Reach():
+	def __init__(self, grid, start, costs, parents):
+		# The cost of reaching each tile, and the tile it is reached from, by tile number.
+		self.grid = grid
+		self.start = start
+		self.costs = costs
+		self.parents = parents
+
+	def __contains__(self, tile):
+		return self.grid.index(tile) in self.costs
+
+	def __len__(self):
+		return len(self.costs)
+
+	def cost(self, tile):
+		return self.costs.get(self.grid.index(tile))
+
+	def tiles(self, stops = True):
+		# Returns the tiles reached, by default only those that can be stopped on, that is not occupied by others.
+		occupants = self.grid.occupants
+		return [self.grid.tile(n) for n in self.costs if not (stops and n in occupants and n != self.start)]
+
+	def path_to(self, tile):
+		# Returns the cheapest route [start, ..., tile], or None if tile was not reached.
+		n = self.grid.index(tile)
+		return path_from(self.grid, self.parents, n) if n in self.costs else None
+
+	def mask(self, s, stops = True):
+		# Returns a boolean mask over story s of the tiles reached.
+		grid = self.grid
+		numbers = numpy.fromiter(self.costs.keys(), dtype = numpy.int64, count = len(self.costs))
+		if stops:
+			numbers = numbers[[n == self.start or not n in grid.occupants for n in numbers.tolist()]]
+		mask = numpy.zeros(grid.storyCount * grid.iCount * grid.jCount, dtype = bool)
+		mask[numbers] = True
+		return mask.reshape(grid.storyCount, grid.iCount, grid.jCount)[s]
+
+def path_from(grid, parents, n):
+	path = []
+	while n != None:
+		path.append(grid.tile(n))
+		n = parents[n]
+	path.reverse()
+	return path
+
+def neighbours(plane, di, dj, fill):
+	# Returns plane[..., i + di, j + dj] at every (i, j) of a [..., I, J] plane, and fill where that lies outside of it.
+	I, J = plane.shape[-2:]
+	shifted = numpy.full(plane.shape, fill, dtype = plane.dtype)
+	shifted[..., max(0, -di):I - max(0, di), max(0, -dj):J - max(0, dj)] = plane[..., max(0, di):I + min(0, di), max(0, dj):J + min(0, dj)]
+	return shifted
+
+def transitions_from_triggers(mapFile):
+	# Reads transitions from the triggers of a map. A trigger that is a dict with a "story" entry, such as stairs,
+	# leads to the tile ("i", "j") of that story, by default the same (i, j), for its "cost", by default the step cost
+	# of the tile entered.
+	transitions = []
+	for s, story in enumerate(mapFile.stories):
+		for (i, j), trigger in story.triggers.items():
+			if isinstance(trigger, dict) and "story" in trigger:
+				transitions.append(((s, i, j), (trigger["story"], trigger.get("i", i), trigger.get("j", j)), trigger.get("cost")))
+	return transitions
+
+def reachable_ranges(mapFile, queries, kind = WALKING, corners = True, transitions = None):
+	# Builds a grid of the map and answers the range queries of PathGrid.reachable_batch with it.
+	if transitions == None:
+		transitions = transitions_from_triggers(mapFile)
+	return PathGrid(mapFile, kind, corners, transitions).reachable_batch(queries)
\ No newline at end of file
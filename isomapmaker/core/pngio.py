@@ -0,0 +1,149 @@
+# Fundamental imports
+import struct, zlib
+import numpy
+
+# PNG reading and writing with only zlib and numpy, so that maps can be rendered and exported without Kivy or a display.
+# Reading supports the non-interlaced 8-bit greyscale, RGB, palette, greyscale-alpha and RGBA images that tilesets are
+# saved as. Writing streams the rows through zlib, so that images larger than memory can be written strip by strip.
+
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Channels per colour type:
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+class PNGError(Exception):
+	pass
+
+def read_chunks(data):
+	# Yields the (type, body) of every chunk of a PNG file.
+	if data[:len(SIGNATURE)] != SIGNATURE:
+		raise PNGError("not a PNG file")
+	offset = len(SIGNATURE)
+	while offset + 8 <= len(data):
+		length, type = struct.unpack(">I4s", data[offset:offset + 8])
+		yield type, data[offset + 8:offset + 8 + length]
+		offset += 12 + length
+
+def unfilter(raw, height, width, channels):
+	# Undoes the filter of every row, returning [height, width * channels] bytes. None and Up rows are done as whole
+	# rows, Sub as a running sum per channel, while Average and Paeth depend on the byte before and go byte by byte.
+	stride = width * channels
+	rows = numpy.frombuffer(raw, dtype = numpy.uint8).reshape(height, stride + 1)
+	out = numpy.zeros((height, stride), dtype = numpy.uint8)
+	previous = numpy.zeros(stride, dtype = numpy.uint8)
+	for y in range(height):
+		kind = rows[y, 0]
+		line = rows[y, 1:]
+		if kind == 0:
+			out[y] = line
+		elif kind == 1:
+			out[y] = numpy.cumsum(line.reshape(width, channels), axis = 0, dtype = numpy.uint8).ravel()
+		elif kind == 2:
+			out[y] = line + previous
+		elif kind == 3 or kind == 4:
+			current = bytearray(line.tobytes())
+			above = previous.tobytes()
+			for x in range(stride):
+				a = current[x - channels] if x >= channels else 0
+				b = above[x]
+				if kind == 3:
+					current[x] = (current[x] + ((a + b) >> 1)) & 0xFF
+				else:
+					c = above[x - channels] if x >= channels else 0
+					p = a + b - c
+					pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+					current[x] = (current[x] + (a if pa <= pb and pa <= pc else (b if pb <= pc else c))) & 0xFF
+			out[y] = numpy.frombuffer(bytes(current), dtype = numpy.uint8)
+		else:
+			raise PNGError("unknown filter " + str(kind))
+		previous = out[y]
+	return out
+
+def read_size(path):
+	# Returns [width, height] of a PNG file, reading only its header.
+	with open(path, "rb") as file:
+		data = file.read(len(SIGNATURE) + 16)
+	if data[:len(SIGNATURE)] != SIGNATURE or data[len(SIGNATURE) + 4:len(SIGNATURE) + 8] != b"IHDR":
+		raise PNGError(path + " is not a PNG file")
+	return list(struct.unpack(">II", data[len(SIGNATURE) + 8:len(SIGNATURE) + 16]))
+
+def read_png(path):
+	# Returns the pixels of a PNG file as a [height, width, 4] RGBA array, top row first.
+	with open(path, "rb") as file:
+		data = file.read()
+	header = None
+	palette = None
+	transparency = None
+	compressed = []
+	for type, body in read_chunks(data):
+		if type == b"IHDR":
+			header = struct.unpack(">IIBBBBB", body)
+		elif type == b"PLTE":
+			palette = numpy.frombuffer(body, dtype = numpy.uint8).reshape(-1, 3)
+		elif type == b"tRNS":
+			transparency = numpy.frombuffer(body, dtype = numpy.uint8)
+		elif type == b"IDAT":
+			compressed.append(body)
+		elif type == b"IEND":
+			break
+	if header == None:
+		raise PNGError(path + " has no header")
+	width, height, depth, colorType, compression, filter, interlace = header
+	if depth != 8 or interlace != 0 or not colorType in CHANNELS:
+		raise PNGError(path + " is not an 8-bit, non-interlaced PNG")
+	channels = CHANNELS[colorType]
+	pixels = unfilter(zlib.decompress(b"".join(compressed)), height, width, channels).reshape(height, width, channels)
+	rgba = numpy.full((height, width, 4), 255, dtype = numpy.uint8)
+	if colorType == 3:
+		if palette is None:
+			raise PNGError(path + " has no palette")
+		rgba[:, :, :3] = palette[pixels[:, :, 0]]
+		if transparency is not None:
+			alpha = numpy.full(256, 255, dtype = numpy.uint8)
+			alpha[:len(transparency)] = transparency
+			rgba[:, :, 3] = alpha[pixels[:, :, 0]]
+	elif colorType == 0 or colorType == 4:
+		rgba[:, :, :3] = pixels[:, :, :1]
+		if colorType == 4:
+			rgba[:, :, 3] = pixels[:, :, 1]
+	else:
+		rgba[:, :, :channels] = pixels
+	return rgba
+
+def make_chunk(type, body):
+	return struct.pack(">I", len(body)) + type + body + struct.pack(">I", zlib.crc32(type + body) & 0xFFFFFFFF)
+
+class PNGWriter():
+	def __init__(self, file, width, height, level = 6):
+		# Writes an RGBA PNG of width x height pixels to an open, binary file object. Rows are added top row first with
+		# write_rows, in as many calls as needed, and the image is finished with close.
+		self.file = file
+		self.width = width
+		self.height = height
+		self.rows = 0
+		self.compressor = zlib.compressobj(level)
+		file.write(SIGNATURE)
+		file.write(make_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+
+	def write_rows(self, pixels):
+		# Adds [rows, width, 4] RGBA pixels.
+		pixels = numpy.ascontiguousarray(pixels, dtype = numpy.uint8).reshape(-1, self.width * 4)
+		# Every row starts with its filter type, 0 for none.
+		raw = numpy.zeros((len(pixels), self.width * 4 + 1), dtype = numpy.uint8)
+		raw[:, 1:] = pixels
+		data = self.compressor.compress(raw.tobytes())
+		if len(data) != 0:
+			self.file.write(make_chunk(b"IDAT", data))
+		self.rows += len(pixels)
+
+	def close(self):
+		if self.rows != self.height:
+			raise PNGError("wrote " + str(self.rows) + " rows of " + str(self.height))
+		self.file.write(make_chunk(b"IDAT", self.compressor.flush()))
+		self.file.write(make_chunk(b"IEND", b""))
+
+def write_png(path, pixels):
+	# Writes [height, width, 4] RGBA pixels, top row first, to a PNG file.
+	with open(path, "wb") as file:
+		writer = PNGWriter(file, pixels.shape[1], pixels.shape[0])
+		writer.write_rows(pixels)
+		writer.close()
\ No newline at end of file
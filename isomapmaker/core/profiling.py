@@ -0,0 +1,118 @@
+# Fundamental imports
+import os, time, json, logging, threading, cProfile, functools
+
+# Profiling:
+# Timers and counters for the hot paths of the editor, read by the profiling overlay, and a cProfile or trace file per
+# session. All of it is off by default, when a timed function costs one attribute check more and a counter one call.
+# Messages go through the "isomapmaker" logger instead of print. Importing the package leaves its level alone, so that
+# an application using the package keeps its own logging set up. configure sets it to WARNING, unless set otherwise,
+# so that debug messages are dropped by the level check before they are formatted.
+# A session is set up from the environment by configure:
+#	ISOMAP_LOG=debug			log level of the "isomapmaker" logger
+#	ISOMAP_PROFILE=<path>		cProfile statistics of the main thread, written when the session finishes
+#	ISOMAP_TRACE=<path>			every timed call, as a Chrome trace event file (chrome://tracing, Perfetto)
+#	ISOMAP_OVERLAY=1			the editor starts with the profiling overlay shown
+# A path naming a directory gets a file named after the time the session started.
+
+log = logging.getLogger("isomapmaker")
+
+class Instruments():
+	def __init__(self):
+		# Timing is on while the overlay is shown or a trace is written.
+		self.enabled = False
+		# [calls, total seconds, longest seconds] by timer name, and counts by counter name, since they were last taken:
+		self.timers = {}
+		self.counters = {}
+		# Trace events, while tracing:
+		self.trace = None
+		self.tracePath = None
+		self.profile = None
+		self.profilePath = None
+		self.started = time.perf_counter()
+		self.lock = threading.Lock()
+
+	def add_time(self, name, start, end):
+		with self.lock:
+			timer = self.timers.get(name)
+			if timer == None:
+				timer = self.timers[name] = [0, 0.0, 0.0]
+			timer[0] += 1
+			timer[1] += end - start
+			timer[2] = max(timer[2], end - start)
+			if self.trace != None:
+				self.trace.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+								"ts": (start - self.started) * 1e6, "dur": (end - start) * 1e6})
+
+	def count(self, name, amount = 1):
+		if self.enabled:
+			with self.lock:
+				self.counters[name] = self.counters.get(name, 0) + amount
+
+	def take(self):
+		# Returns the timers and counters gathered since the last call, and starts over.
+		with self.lock:
+			timers, counters = self.timers, self.counters
+			self.timers, self.counters = {}, {}
+		return timers, counters
+
+	def start_trace(self, path):
+		self.trace = []
+		self.tracePath = session_path(path, ".trace.json")
+		self.enabled = True
+
+	def start_profile(self, path):
+		self.profilePath = session_path(path, ".prof")
+		self.profile = cProfile.Profile()
+		self.profile.enable()
+
+	def finish(self):
+		# Writes the trace and profile of the session, if any.
+		if self.profile != None:
+			self.profile.disable()
+			self.profile.dump_stats(self.profilePath)
+			log.info("Profile written to %s", self.profilePath)
+			self.profile = None
+		if self.trace != None:
+			with open(self.tracePath, "w") as file:
+				json.dump({"traceEvents": self.trace, "displayTimeUnit": "ms"}, file)
+			log.info("Trace of %d calls written to %s", len(self.trace), self.tracePath)
+			self.trace = None
+
+# The instruments of the process:
+instruments = Instruments()
+
+def timed(name):
+	# Decorator timing every call of a function under name, while the instruments are enabled.
+	def decorate(function):
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			if not instruments.enabled:
+				return function(*args, **kwargs)
+			start = time.perf_counter()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				instruments.add_time(name, start, time.perf_counter())
+		return wrapper
+	return decorate
+
+def session_path(path, extension):
+	if os.path.isdir(path):
+		return os.path.join(path, "session-" + time.strftime("%Y%m%d-%H%M%S") + extension)
+	return path
+
+def configure(environment = None):
+	# Sets up logging, profiling and tracing for a session from the ISOMAP_ variables of environment, os.environ by default.
+	environment = environment if environment != None else os.environ
+	level = environment.get("ISOMAP_LOG")
+	if not level and log.level == logging.NOTSET:
+		log.setLevel(logging.WARNING)
+	if level:
+		log.setLevel(level.upper())
+		# Without Kivy, or anything else configuring logging, messages would only reach the last resort handler.
+		if len(logging.root.handlers) == 0:
+			logging.basicConfig(format = "%(asctime)s %(levelname)s %(name)s: %(message)s")
+	if environment.get("ISOMAP_TRACE"):
+		instruments.start_trace(environment["ISOMAP_TRACE"])
+	if environment.get("ISOMAP_PROFILE"):
+		instruments.start_profile(environment["ISOMAP_PROFILE"])
@@ -0,0 +1,93 @@
+# Fundamental imports
+import numpy
+
+# Isometric projection:
+# Tile (i, j) on story s is a diamond whose bottom corner lies at
+#	x = (i - j) * tileWidth / 2 + offset[0] + jCount * tileWidth / 2
+#	y = (i + j) * tileHeight / 2 + offset[1] + s * storyHeight * tileHeight
+# with the left, top and right corners half a tile further along. Going back, with
+#	u = (X + Y) / 2, v = (Y - X) / 2, where X = (x - offset[0] - jCount * tileWidth / 2) / (tileWidth / 2) and Y = (y - offset[1] - s * storyHeight * tileHeight) / (tileHeight / 2)
+# the point (x, y) lies in tile (floor(u), floor(v)).
+# Every function takes whole arrays of tiles or points, so that a chunk, a selection or a whole map is converted at once.
+
+class Projection():
+	def __init__(self, tileWidth = 64, tileHeight = 32, offset = [50, 50], jCount = 14, storyHeight = 3, **kwargs):
+		self.tileWidth = tileWidth
+		self.tileHeight = tileHeight
+		self.offset = offset
+		self.jCount = jCount
+		# Height of a story, in tile heights:
+		self.storyHeight = storyHeight
+
+	def story_offset(self, s):
+		return numpy.asarray(s, dtype = numpy.float64) * self.storyHeight * self.tileHeight
+
+	def to_screen(self, i, j, s = 0):
+		# Returns the screen positions (x, y) of the bottom corners of tiles (i, j) on stories s.
+		i = numpy.asarray(i, dtype = numpy.float64)
+		j = numpy.asarray(j, dtype = numpy.float64)
+		x = (i - j) * self.tileWidth / 2 + self.offset[0] + self.jCount * self.tileWidth / 2
+		y = (i + j) * self.tileHeight / 2 + self.offset[1] + self.story_offset(s)
+		return x, y
+
+	def to_tile(self, x, y, s = 0):
+		# Returns the tiles (i, j) on stories s that contain the screen positions (x, y). They may lie outside the map.
+		X = (numpy.asarray(x, dtype = numpy.float64) - self.offset[0] - self.jCount * self.tileWidth / 2) / (self.tileWidth / 2)
+		Y = (numpy.asarray(y, dtype = numpy.float64) - self.offset[1] - self.story_offset(s)) / (self.tileHeight / 2)
+		i = numpy.floor((X + Y) / 2).astype(numpy.int64)
+		j = numpy.floor((Y - X) / 2).astype(numpy.int64)
+		return i, j
+
+	def diamond_vertices(self, i, j, s = 0):
+		# Returns [count, 4, 4] vertices (x, y, u, v) of the diamonds of tiles (i, j), in the order bottom, left, top, right.
+		x, y = self.to_screen(i, j, s)
+		x = numpy.atleast_1d(x)
+		y = numpy.atleast_1d(y) + numpy.zeros_like(x)
+		vertices = numpy.zeros((len(x), 4, 4), dtype = numpy.float32)
+		vertices[:, :, 0] = x[:, None] + numpy.array([0, -self.tileWidth / 2, 0, self.tileWidth / 2])
+		vertices[:, :, 1] = y[:, None] + numpy.array([0, self.tileHeight / 2, self.tileHeight, self.tileHeight / 2])
+		return vertices
+
+	def rect_vertices(self, rects, s = 0):
+		# Returns [count, 4, 4] vertices of the outlines of rectangles of tiles [i0, i1, j0, j1], in the same order as
+		# diamond_vertices. A rectangle of tiles is one big diamond on screen, whatever its size.
+		rects = numpy.asarray(rects, dtype = numpy.float64).reshape(-1, 4)
+		i = numpy.stack([rects[:, 0], rects[:, 0], rects[:, 1], rects[:, 1]], axis = 1)
+		j = numpy.stack([rects[:, 2], rects[:, 3], rects[:, 3], rects[:, 2]], axis = 1)
+		x, y = self.to_screen(i, j, s)
+		vertices = numpy.zeros((len(rects), 4, 4), dtype = numpy.float32)
+		vertices[:, :, 0] = x
+		vertices[:, :, 1] = y
+		return vertices
+
+	def sprite_vertices(self, i, j, s, texCoords, aspect):
+		# Returns [count, 4, 4] vertices of the sprites standing on tiles (i, j), in the order bottom-left, bottom-right,
+		# top-right, top-left. texCoords holds the 8 texture coordinates of each sprite in the same order, and aspect its
+		# height over its width. Sprites are a tile wide and stand on the bottom corner of their tile.
+		x, y = self.to_screen(i, j, s)
+		x = numpy.atleast_1d(x)
+		y = numpy.atleast_1d(y) + numpy.zeros_like(x)
+		height = self.tileWidth * numpy.asarray(aspect, dtype = numpy.float64)
+		vertices = numpy.zeros((len(x), 4, 4), dtype = numpy.float32)
+		vertices[:, :, 0] = x[:, None] + numpy.array([-self.tileWidth / 2, self.tileWidth / 2, self.tileWidth / 2, -self.tileWidth / 2])
+		vertices[:, :, 1] = y[:, None] + numpy.array([0, 0, 1, 1]) * height[:, None]
+		vertices[:, :, 2:] = numpy.asarray(texCoords, dtype = numpy.float32).reshape(-1, 4, 2)
+		return vertices
+
+	def screen_bounds(self, i0, i1, j0, j1, s = 0, spriteHeight = 2):
+		# Returns [left, bottom, right, top] of the tiles i0 <= i < i1, j0 <= j < j1, with room above for sprites
+		# up to spriteHeight tile widths tall.
+		left = (i0 - j1) * self.tileWidth / 2 + self.offset[0] + self.jCount * self.tileWidth / 2
+		right = (i1 - j0) * self.tileWidth / 2 + self.offset[0] + self.jCount * self.tileWidth / 2
+		bottom = (i0 + j0) * self.tileHeight / 2 + self.offset[1] + s * self.storyHeight * self.tileHeight
+		top = (i1 + j1) * self.tileHeight / 2 + self.offset[1] + s * self.storyHeight * self.tileHeight + spriteHeight * self.tileWidth
+		return [left, bottom, right, top]
+
+	def visible_range(self, viewport, iCount, jCount, s = 0, margin = 0, spriteHeight = 2):
+		# Returns [i0, i1, j0, j1], the range of tiles of story s shown in viewport = [x0, y0, x1, y1], plus margin tiles.
+		# As i and j are linear in x and y, the tiles in view lie between those under the corners of the viewport.
+		# The viewport is stretched down by spriteHeight tile widths, for tall sprites reaching into view from below.
+		x0, y0, x1, y1 = viewport
+		i, j = self.to_tile([x0, x0, x1, x1], [y0 - spriteHeight * self.tileWidth, y1, y0 - spriteHeight * self.tileWidth, y1], s)
+		return [max(0, int(i.min()) - margin), min(iCount, int(i.max()) + margin + 1),
+				max(0, int(j.min()) - margin), min(jCount, int(j.max()) + margin + 1)]
\ No newline at end of file
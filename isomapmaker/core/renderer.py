@@ -0,0 +1,209 @@
+# Fundamental imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+# Elements from subdirectories
+from . import msfformat, pngio
+from .projection import Projection
+
+# Headless rendering:
+# Draws a map into an RGBA array with numpy alone, for previews and baked level images on machines without a display.
+# Tiles are placed by the same Projection as on the canvas, with the same offset, and drawn in the same order as
+# MapCanvas.render_map: story by story, layer by layer, and back to front within a layer. Sprites are cut from the
+# tileset PNGs, scaled to a tile's width and alpha blended over what is below them. Like the mipmaps of the canvas,
+# sprites are first halved by averaging until less than twice a tile wide, so that small thumbnails do not alias.
+# The image can be rendered in windows, so that a map larger than memory is exported strip by strip into one PNG, or
+# as separate tile images, with the windows spread over a process pool.
+# Unlike the canvas, the grid is not drawn, and animated sprites are drawn with their first frame. Autotiles are not
+# drawn, as on the canvas.
+
+# Offset of the map in the image, as on the canvas:
+OFFSET = [50, 50]
+
+class TilesetCache():
+	def __init__(self, searchPaths = None):
+		# Tilesets by path, as premultiplied float RGBA arrays, top row first. A path that does not exist, for instance
+		# one saved on another machine, is looked up by its file name in searchPaths.
+		self.searchPaths = searchPaths if searchPaths != None else []
+		self.tilesets = {}
+
+	def resolve(self, path):
+		if os.path.isfile(path):
+			return path
+		for directory in self.searchPaths:
+			candidate = os.path.join(directory, os.path.basename(path.replace("\\", "/")))
+			if os.path.isfile(candidate):
+				return candidate
+		return None
+
+	def get(self, path):
+		# Returns the pixels of a tileset, or None if it cannot be found.
+		if not path in self.tilesets:
+			resolved = self.resolve(path)
+			pixels = None
+			if resolved != None:
+				pixels = pngio.read_png(resolved).astype(numpy.float32) / 255
+				pixels[:, :, :3] *= pixels[:, :, 3:]
+			self.tilesets[path] = pixels
+		return self.tilesets[path]
+
+class MapRenderer():
+	def __init__(self, mapFile, tileWidth = 64, tileHeight = 32, searchPaths = None, storyCount = None, **kwargs):
+		# Renders the stories below storyCount, all of them by default.
+		self.mapFile = mapFile
+		self.tileWidth = tileWidth
+		self.tileHeight = tileHeight
+		self.storyCount = storyCount if storyCount != None else len(mapFile.stories)
+		self.iCount = mapFile.stories[0].iCount
+		self.jCount = mapFile.stories[0].jCount
+		self.projection = Projection(tileWidth = tileWidth, tileHeight = tileHeight, offset = OFFSET, jCount = self.jCount)
+		self.tilesets = TilesetCache(searchPaths)
+		# Scaled sprite pixels by sprite index, None for sprites that are not drawn:
+		self.sprites = {}
+		# Tallest sprite drawn, in tile widths, for finding the tiles reaching into a window:
+		self.spriteHeight = 2
+		for index in range(1, len(mapFile.spriteTable.definitions)):
+			definition = mapFile.spriteTable.get(index)
+			self.spriteHeight = max(self.spriteHeight, definition[2][1] / definition[2][0])
+		# The image spans the map as on the canvas, and reaches up far enough for the tallest sprite on the top story.
+		self.width = int((self.iCount + self.jCount) * tileWidth / 2 + 2 * OFFSET[0])
+		self.height = int(self.projection.screen_bounds(0, self.iCount, 0, self.jCount, max(0, self.storyCount - 1), self.spriteHeight)[3] + OFFSET[1])
+
+	def get_size(self):
+		return [self.width, self.height]
+
+	def get_sprite(self, index):
+		# Returns the premultiplied pixels of a sprite, scaled to a tile's width, or None if it is not drawn.
+		if not index in self.sprites:
+			pixels = None
+			definition = self.mapFile.spriteTable.get(index)
+			type = self.mapFile.spriteTable.get_type(index)
+			tileset = self.tilesets.get(definition[0]) if type[0] == 'object' or type[0] == 'wall' else None
+			if tileset is not None:
+				# Regions are given from the lower-left corner of the tileset, whose rows are stored top row first.
+				# Palettes store sizes as floats.
+				x, y = [int(v) for v in definition[1][0][0]]
+				w, h = [int(v) for v in definition[2]]
+				region = tileset[tileset.shape[0] - y - h:tileset.shape[0] - y, x:x + w]
+				if region.shape[0] == h and region.shape[1] == w and w > 0 and h > 0:
+					width = self.tileWidth
+					height = max(1, int(round(self.tileWidth * h / w)))
+					while region.shape[1] >= 2 * width and region.shape[0] >= 2 * height:
+						region = halve(region)
+					rows = (numpy.arange(height) * region.shape[0] // height)
+					columns = (numpy.arange(width) * region.shape[1] // width)
+					pixels = region[rows][:, columns]
+			self.sprites[index] = pixels
+		return self.sprites[index]
+
+	def get_tiles(self, s, window):
+		# Returns the arrays (layer, i, j, sprite) of the painted tiles of story s that reach into the window
+		# [x0, y0, x1, y1] of the image, in drawing order.
+		x0, y0, x1, y1 = window
+		# The image has its first row at the top, the projection at the bottom.
+		i0, i1, j0, j1 = self.projection.visible_range([x0, self.height - y1, x1, self.height - y0], self.iCount, self.jCount, s, 1, self.spriteHeight)
+		story = self.mapFile.stories[s]
+		result = []
+		for l in range(story.layerCount):
+			ids = numpy.asarray(story.sprites[l, i0:i1, j0:j1])
+			di, dj = ids.nonzero()
+			# Back to front: the further a tile is up the screen, the earlier it is drawn.
+			order = numpy.lexsort((-di, -(di + dj)))
+			di, dj = di[order], dj[order]
+			result.append((numpy.full(len(di), l), di + i0, dj + j0, ids[di, dj]))
+		if len(result) == 0:
+			return [numpy.zeros(0, dtype = numpy.int64)] * 4
+		return [numpy.concatenate([r[n] for r in result]) for n in range(4)]
+
+	def render(self, window = None):
+		# Returns the [y1 - y0, x1 - x0, 4] RGBA pixels of the window [x0, y0, x1, y1] of the image, the whole image by default.
+		if window == None:
+			window = [0, 0, self.width, self.height]
+		x0, y0, x1, y1 = window
+		image = numpy.zeros((y1 - y0, x1 - x0, 4), dtype = numpy.float32)
+		for s in range(self.storyCount):
+			layers, i, j, ids = self.get_tiles(s, window)
+			if len(ids) == 0:
+				continue
+			x, y = self.projection.to_screen(i, j, s)
+			for n in range(len(ids)):
+				sprite = self.get_sprite(int(ids[n]))
+				if sprite is None:
+					continue
+				# Sprites stand on the bottom corner of their tile, and are a tile wide.
+				left = int(round(x[n] - self.tileWidth / 2)) - x0
+				top = self.height - int(round(y[n])) - sprite.shape[0] - y0
+				self.blend(image, sprite, left, top)
+		# Back from premultiplied alpha to 8-bit RGBA:
+		alpha = image[:, :, 3:]
+		image[:, :, :3] = numpy.where(alpha > 0, image[:, :, :3] / numpy.maximum(alpha, 1e-6), 0)
+		return numpy.clip(image * 255 + 0.5, 0, 255).astype(numpy.uint8)
+
+	def blend(self, image, sprite, left, top):
+		# Draws premultiplied sprite pixels over image with their top-left corner at (left, top), clipped to the image.
+		h, w = sprite.shape[:2]
+		a0, b0 = max(0, top), max(0, left)
+		a1, b1 = min(image.shape[0], top + h), min(image.shape[1], left + w)
+		if a0 >= a1 or b0 >= b1:
+			return
+		source = sprite[a0 - top:a1 - top, b0 - left:b1 - left]
+		target = image[a0:a1, b0:b1]
+		target *= 1 - source[:, :, 3:]
+		target += source
+
+def halve(pixels):
+	# Averages 2 x 2 blocks of premultiplied pixels, dropping an odd last row or column: the next mipmap level.
+	h, w = pixels.shape[0] // 2 * 2, pixels.shape[1] // 2 * 2
+	pixels = pixels[:h, :w]
+	return (pixels[0::2, 0::2] + pixels[1::2, 0::2] + pixels[0::2, 1::2] + pixels[1::2, 1::2]) / 4
+
+# Rendering with a process pool:
+# Every worker loads the map once, from its path or from a pickled MapFile, and then renders the windows it is given.
+workerRenderer = None
+
+def start_worker(source, options):
+	global workerRenderer
+	mapFile = msfformat.load_map(source) if isinstance(source, str) else source
+	workerRenderer = MapRenderer(mapFile, **options)
+
+def render_window(window):
+	return workerRenderer.render(window)
+
+def render_tile_file(job):
+	window, path = job
+	pngio.write_png(path, workerRenderer.render(window))
+	return path
+
+def render_windows(source, options, windows, function, processes):
+	# Yields function(window) for each window, in order, from a process pool, or in this process if processes is 1.
+	if processes == 1:
+		start_worker(source, options)
+		for window in windows:
+			yield function(window)
+		return
+	with ProcessPoolExecutor(max_workers = processes, initializer = start_worker, initargs = (source, options)) as pool:
+		for result in pool.map(function, windows):
+			yield result
+
+def export_png(source, path, stripHeight = 512, processes = None, **options):
+	# Renders a map, given as a map file path or a MapFile, into one PNG file. The image is rendered in horizontal strips
+	# that are written as they arrive, so only a few strips are in memory at any time. options go to MapRenderer.
+	mapFile = msfformat.load_map(source) if isinstance(source, str) else source
+	width, height = MapRenderer(mapFile, **options).get_size()
+	windows = [[0, y, width, min(height, y + stripHeight)] for y in range(0, height, stripHeight)]
+	with open(path, "wb") as file:
+		writer = pngio.PNGWriter(file, width, height)
+		for pixels in render_windows(source, options, windows, render_window, processes):
+			writer.write_rows(pixels)
+		writer.close()
+	return [width, height]
+
+def export_tiles(source, prefix, tileSize = 1024, processes = None, **options):
+	# Renders a map into tileSize x tileSize images named prefix_<column>_<row>.png, and returns their paths.
+	mapFile = msfformat.load_map(source) if isinstance(source, str) else source
+	width, height = MapRenderer(mapFile, **options).get_size()
+	jobs = []
+	for row, y in enumerate(range(0, height, tileSize)):
+		for column, x in enumerate(range(0, width, tileSize)):
+			jobs.append(([x, y, min(width, x + tileSize), min(height, y + tileSize)], prefix + "_" + str(column) + "_" + str(row) + ".png"))
+	return list(render_windows(source, options, jobs, render_tile_file, processes))
\ No newline at end of file
@@ -0,0 +1,103 @@
+# Fundamental imports
+import numpy
+
+def rect_between(a, b):
+	# Returns the rectangle [i0, i1, j0, j1] spanned by the tiles a = [i, j] and b = [i, j], both included.
+	return [min(a[0], b[0]), max(a[0], b[0]) + 1, min(a[1], b[1]), max(a[1], b[1]) + 1]
+
+class Selection():
+	def __init__(self, iCount, jCount, **kwargs):
+		# A set of tiles, kept as a boolean mask over the map, so that membership is a single lookup and union and
+		# difference with rectangles or other selections are single array operations.
+		# For drawing, the mask is compressed into rectangles, each of which is one quad on screen.
+		self.iCount = iCount
+		self.jCount = jCount
+		self.mask = numpy.zeros((iCount, jCount), dtype = bool)
+		# Rectangles of the mask, worked out when first asked for after a change:
+		self.rects = []
+		self.changed = False
+
+	def __contains__(self, coords):
+		i, j = coords
+		return 0 <= i < self.iCount and 0 <= j < self.jCount and bool(self.mask[i, j])
+
+	def __len__(self):
+		return int(numpy.count_nonzero(self.mask))
+
+	def is_empty(self):
+		return not self.mask.any()
+
+	def clip(self, rect):
+		i0, i1, j0, j1 = rect
+		return [max(0, i0), min(self.iCount, i1), max(0, j0), min(self.jCount, j1)]
+
+	def set_rect(self, rect, value):
+		i0, i1, j0, j1 = self.clip(rect)
+		if i0 < i1 and j0 < j1:
+			self.mask[i0:i1, j0:j1] = value
+			self.changed = True
+
+	def add_rect(self, rect):
+		self.set_rect(rect, True)
+
+	def remove_rect(self, rect):
+		self.set_rect(rect, False)
+
+	def add(self, i, j):
+		self.add_rect([i, i + 1, j, j + 1])
+
+	def remove(self, i, j):
+		self.remove_rect([i, i + 1, j, j + 1])
+
+	def union(self, other):
+		self.mask |= other.mask
+		self.changed = True
+
+	def difference(self, other):
+		self.mask &= ~other.mask
+		self.changed = True
+
+	def clear(self):
+		self.mask[:] = False
+		self.changed = True
+
+	def tiles(self):
+		# Returns the arrays (i, j) of the selected tiles.
+		return self.mask.nonzero()
+
+	def get_bounds(self):
+		# Returns the smallest rectangle [i0, i1, j0, j1] holding the selection, or None if it is empty.
+		rows = self.mask.any(axis = 1).nonzero()[0]
+		if len(rows) == 0:
+			return None
+		columns = self.mask.any(axis = 0).nonzero()[0]
+		return [int(rows[0]), int(rows[-1]) + 1, int(columns[0]), int(columns[-1]) + 1]
+
+	def get_rects(self):
+		# Returns the selection as a list of disjoint rectangles [i0, i1, j0, j1]. Runs of selected tiles are found in
+		# each row, and a run continues a rectangle from the row before when it spans the same columns.
+		if not self.changed:
+			return self.rects
+		self.rects = []
+		bounds = self.get_bounds()
+		if bounds != None:
+			i0, i1, j0, j1 = bounds
+			padded = numpy.zeros((i1 - i0, j1 - j0 + 2), dtype = numpy.int8)
+			padded[:, 1:-1] = self.mask[i0:i1, j0:j1]
+			edges = numpy.diff(padded, axis = 1)
+			opened = {}
+			for n in range(i1 - i0 + 1):
+				if n < i1 - i0:
+					starts = (edges[n] == 1).nonzero()[0]
+					ends = (edges[n] == -1).nonzero()[0]
+					runs = set(zip((starts + j0).tolist(), (ends + j0).tolist()))
+				else:
+					runs = set()
+				for run in list(opened.keys()):
+					if not run in runs:
+						self.rects.append([opened.pop(run), i0 + n, run[0], run[1]])
+				for run in runs:
+					if not run in opened:
+						opened[run] = i0 + n
+		self.changed = False
+		return self.rects
\ No newline at end of file
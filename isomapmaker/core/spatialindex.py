@@ -0,0 +1,250 @@
+# Fundamental imports
+import numpy
+
+# Spatial index:
+# Occupants, triggers and terrain are looked up by place, such as every trigger in view, the nearest occupant of a kind,
+# or every tile of a terrain. Rather than going through every entry or tile, they are grouped into square buckets of
+# BUCKET_SIZE x BUCKET_SIZE tiles, and a query only looks into the buckets it overlaps.
+# Occupants and triggers are kept in a TileIndex, which takes the place of the dicts keyed by (i, j) they were stored in
+# and keeps its buckets up to date on every change, whoever makes it. Terrain is a plane like the others, and a
+# TerrainIndex counts the tiles of every terrain type in every bucket, as long as terrain is set through it.
+# Distances are counted in tiles, along i, j or both at once, so that the tiles at distance 1 are the 8 neighbours.
+
+BUCKET_SIZE = 16
+
+def kind_of(value):
+	# The kind of an occupant or trigger: the "type" entry of a dict, the value itself if it is a string, or None.
+	if isinstance(value, dict):
+		return value.get("type")
+	if isinstance(value, str):
+		return value
+	return None
+
+def distance(i, j, i2, j2):
+	return max(abs(i - i2), abs(j - j2))
+
+def rect_buckets(rect, bucketSize):
+	# Returns the range [bi0, bi1, bj0, bj1] of the buckets overlapping the rectangle of tiles [i0, i1, j0, j1].
+	i0, i1, j0, j1 = rect
+	return [i0 // bucketSize, (i1 - 1) // bucketSize + 1, j0 // bucketSize, (j1 - 1) // bucketSize + 1]
+
+def ring(bi, bj, r):
+	# Returns the buckets r buckets away from (bi, bj).
+	if r == 0:
+		return [(bi, bj)]
+	return [(bi + di, bj + dj) for di in range(-r, r + 1) for dj in range(-r, r + 1) if max(abs(di), abs(dj)) == r]
+
+class TileIndex():
+	def __init__(self, items = None, bucketSize = BUCKET_SIZE):
+		# Maps (i, j) to an occupant or trigger, like a dict.
+		self.bucketSize = bucketSize
+		self.values = {}
+		# The keys in each bucket (bi, bj), and of each kind:
+		self.buckets = {}
+		self.kinds = {}
+		# [bi0, bi1, bj0, bj1], bounding every bucket that held a key since the index was last cleared:
+		self.extent = None
+		# Number of changes made, so that drawings of the index can tell when to be redone.
+		self.version = 0
+		if items != None:
+			self.update(items)
+
+	def __len__(self):
+		return len(self.values)
+
+	def __iter__(self):
+		return iter(self.values)
+
+	def __contains__(self, key):
+		return key in self.values
+
+	def __getitem__(self, key):
+		return self.values[key]
+
+	def __setitem__(self, key, value):
+		key = (int(key[0]), int(key[1]))
+		if key in self.values:
+			self.discard(key)
+		self.values[key] = value
+		bi, bj = self.bucket(*key)
+		self.buckets.setdefault((bi, bj), set()).add(key)
+		if self.extent == None:
+			self.extent = [bi, bi + 1, bj, bj + 1]
+		else:
+			self.extent = [min(self.extent[0], bi), max(self.extent[1], bi + 1), min(self.extent[2], bj), max(self.extent[3], bj + 1)]
+		self.kinds.setdefault(kind_of(value), set()).add(key)
+		self.version += 1
+
+	def __delitem__(self, key):
+		if not key in self.values:
+			raise KeyError(key)
+		self.discard(key)
+		self.version += 1
+
+	def __eq__(self, other):
+		if isinstance(other, TileIndex):
+			other = other.values
+		return self.values == other
+
+	def __repr__(self):
+		return "TileIndex(%r)" % self.values
+
+	def bucket(self, i, j):
+		return (i // self.bucketSize, j // self.bucketSize)
+
+	def discard(self, key):
+		# Takes key out of the dict and the buckets.
+		value = self.values.pop(key)
+		for groups, group in [(self.buckets, self.bucket(*key)), (self.kinds, kind_of(value))]:
+			groups[group].discard(key)
+			if len(groups[group]) == 0:
+				del groups[group]
+
+	def get(self, key, default = None):
+		return self.values.get(key, default)
+
+	def pop(self, key, *default):
+		if key in self.values:
+			value = self.values[key]
+			del self[key]
+			return value
+		return self.values.pop(key, *default)
+
+	def keys(self):
+		return self.values.keys()
+
+	def items(self):
+		return self.values.items()
+
+	def update(self, items):
+		for key, value in (items.items() if hasattr(items, "items") else items):
+			self[key] = value
+
+	def clear(self):
+		self.values.clear()
+		self.buckets.clear()
+		self.kinds.clear()
+		self.extent = None
+		self.version += 1
+
+	def items_in(self, rect, kind = None):
+		# Returns [((i, j), value), ...] of the entries in the rectangle of tiles [i0, i1, j0, j1], or only of those of
+		# kind if given.
+		i0, i1, j0, j1 = rect
+		if i0 >= i1 or j0 >= j1:
+			return []
+		bi0, bi1, bj0, bj1 = rect_buckets(rect, self.bucketSize)
+		if (bi1 - bi0) * (bj1 - bj0) > len(self.buckets):
+			# A rectangle larger than the entries are spread over is quicker to check bucket by bucket.
+			buckets = [key for key in self.buckets if bi0 <= key[0] < bi1 and bj0 <= key[1] < bj1]
+		else:
+			buckets = [(bi, bj) for bi in range(bi0, bi1) for bj in range(bj0, bj1) if (bi, bj) in self.buckets]
+		ofKind = self.kinds.get(kind, set()) if kind != None else None
+		return [((i, j), self.values[(i, j)]) for b in buckets for (i, j) in self.buckets[b]
+				if i0 <= i < i1 and j0 <= j < j1 and (ofKind == None or (i, j) in ofKind)]
+
+	def items_of_kind(self, kind):
+		return [(key, self.values[key]) for key in self.kinds.get(kind, set())]
+
+	def nearest(self, i, j, count = 1, kind = None):
+		# Returns [((i, j), value), ...] of the count entries nearest to (i, j), or only of those of kind if given, nearest
+		# first. Buckets are searched in rings around the bucket of (i, j), until no bucket left can hold anything nearer.
+		ofKind = self.kinds.get(kind, set()) if kind != None else None
+		if len(self.values) == 0 or ofKind != None and len(ofKind) == 0:
+			return []
+		if ofKind != None and len(ofKind) <= count:
+			found = [(distance(i, j, *key), key) for key in ofKind]
+		else:
+			bi, bj = self.bucket(i, j)
+			bi0, bi1, bj0, bj1 = self.extent
+			last = max(bi - bi0, bi1 - 1 - bi, bj - bj0, bj1 - 1 - bj)
+			found = []
+			for r in range(last + 1):
+				for b in ring(bi, bj, r):
+					if b in self.buckets:
+						found += [(distance(i, j, *key), key) for key in self.buckets[b] if ofKind == None or key in ofKind]
+				# Tiles in the buckets further out lie more than r buckets away.
+				if len(found) >= count:
+					found.sort()
+					if found[count - 1][0] <= r * self.bucketSize:
+						break
+		found.sort()
+		return [(key, self.values[key]) for d, key in found[:count]]
+
+class TerrainIndex():
+	def __init__(self, story, bucketSize = BUCKET_SIZE):
+		# Counts the tiles of each terrain type in each bucket of the terrain plane of story. The counts are made when
+		# first needed, so that a map loaded without looking at its terrain does not read the plane.
+		self.story = story
+		self.bucketSize = bucketSize
+		self.counts = None
+
+	def rebuild(self):
+		# Counts the plane again, after it was written to without going through set, as by resizing or undoing that.
+		self.counts = None
+
+	def get_counts(self):
+		# {terrain index: [bi, bj] counts}
+		if self.counts == None:
+			plane = self.story.terrain
+			size = self.bucketSize
+			bi, bj = -(-plane.shape[0] // size), -(-plane.shape[1] // size)
+			buckets = (numpy.arange(plane.shape[0]) // size)[:, None] * bj + (numpy.arange(plane.shape[1]) // size)[None, :]
+			self.counts = {}
+			for t in numpy.unique(plane).tolist():
+				self.counts[t] = numpy.bincount(buckets[plane == t], minlength = bi * bj).reshape(bi, bj)
+		return self.counts
+
+	def set(self, i, j, t):
+		plane = self.story.terrain
+		old = int(plane[i, j])
+		plane[i, j] = t
+		if self.counts != None and old != t:
+			b = (i // self.bucketSize, j // self.bucketSize)
+			self.counts[old][b] -= 1
+			if not t in self.counts:
+				self.counts[t] = numpy.zeros_like(self.counts[old])
+			self.counts[t][b] += 1
+
+	def tiles(self, t, rect = None):
+		# Returns the arrays (i, j) of the tiles of terrain t, in the rectangle [i0, i1, j0, j1] if given.
+		plane = self.story.terrain
+		counts = self.get_counts().get(t)
+		if rect == None:
+			rect = [0, plane.shape[0], 0, plane.shape[1]]
+		i0, i1, j0, j1 = max(0, rect[0]), min(plane.shape[0], rect[1]), max(0, rect[2]), min(plane.shape[1], rect[3])
+		if counts is None or i0 >= i1 or j0 >= j1:
+			return numpy.zeros(0, dtype = numpy.int64), numpy.zeros(0, dtype = numpy.int64)
+		bi0, bi1, bj0, bj1 = rect_buckets([i0, i1, j0, j1], self.bucketSize)
+		found = [[], []]
+		size = self.bucketSize
+		for bi, bj in zip(*(counts[bi0:bi1, bj0:bj1] != 0).nonzero()):
+			bi, bj = int(bi) + bi0, int(bj) + bj0
+			ti0, ti1, tj0, tj1 = max(i0, bi * size), min(i1, bi * size + size), max(j0, bj * size), min(j1, bj * size + size)
+			i, j = (plane[ti0:ti1, tj0:tj1] == t).nonzero()
+			found[0].append(i + ti0)
+			found[1].append(j + tj0)
+		if len(found[0]) == 0:
+			return numpy.zeros(0, dtype = numpy.int64), numpy.zeros(0, dtype = numpy.int64)
+		return numpy.concatenate(found[0]), numpy.concatenate(found[1])
+
+	def nearest(self, t, i, j):
+		# Returns the tile (i, j) of terrain t nearest to (i, j), or None if there is none.
+		counts = self.get_counts().get(t)
+		if counts is None or not counts.any():
+			return None
+		size = self.bucketSize
+		bi, bj = i // size, j // size
+		last = max(bi, bj, counts.shape[0] - 1 - bi, counts.shape[1] - 1 - bj)
+		best = None
+		for r in range(last + 1):
+			for b in ring(bi, bj, r):
+				if 0 <= b[0] < counts.shape[0] and 0 <= b[1] < counts.shape[1] and counts[b] != 0:
+					ti, tj = self.tiles(t, [b[0] * size, b[0] * size + size, b[1] * size, b[1] * size + size])
+					d = numpy.maximum(numpy.abs(ti - i), numpy.abs(tj - j))
+					n = int(d.argmin())
+					if best == None or int(d[n]) < best[0]:
+						best = (int(d[n]), int(ti[n]), int(tj[n]))
+			if best != None and best[0] <= r * size:
+				break
+		return (best[1], best[2])
\ No newline at end of file
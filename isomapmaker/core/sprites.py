@@ -0,0 +1,87 @@
+# Frames per second of animated sprites whose definition does not give its own:
+DEFAULT_FRAME_RATE = 4
+# The stories store sprite indices as uint16, see story.py, so the highest index a table can hand out is:
+MAX_SPRITE_INDEX = 0xFFFF
+
+# Sprite table:
+class SpriteTable():
+	def __init__(self, **kwargs):
+		# Every unique sprite definition painted on a map is stored here exactly once, and the stories only store its index.
+		# Definitions have the same form as before:
+		# ['filename', [ [ [x, y] ] ], [sizex, sizey] ]
+		# Animated definitions, with several [x, y], may add a fourth entry, their frames per second.
+		# Index 0 is reserved for "no sprite", so that an empty layer is simply a 0 in the story arrays.
+		self.definitions = [None]
+		# The type of each definition, on the form [base object, animated] from get_graphics_type, worked out once when it is added.
+		self.types = [[None, False]]
+		# Lookup from a hashable key of a definition to its index.
+		self.lookup = {}
+
+	def __len__(self):
+		return len(self.definitions)
+
+	def make_key(self, graphics):
+		# Nested lists are not hashable, so they are turned into nested tuples.
+		if isinstance(graphics, (list, tuple)):
+			return tuple(self.make_key(g) for g in graphics)
+		return graphics
+
+	def intern(self, graphics):
+		# Returns the index of the definition, adding it to the table if it has not been seen before.
+		if graphics is None or graphics == [None]:
+			return 0
+		key = self.make_key(graphics)
+		index = self.lookup.get(key)
+		if index is None:
+			index = len(self.definitions)
+			if index > MAX_SPRITE_INDEX:
+				raise ValueError("The sprite table is full, a map can not hold more than %d different sprites" % MAX_SPRITE_INDEX)
+			self.definitions.append(graphics)
+			self.types.append(get_graphics_type(graphics))
+			self.lookup[key] = index
+		return index
+
+	def get(self, index):
+		# Returns the definition stored at index, with [None] for an empty layer just like the old Tile.graphics did.
+		if index == 0:
+			return [None]
+		return self.definitions[index]
+
+	def get_type(self, index):
+		return self.types[index]
+
+	def find(self, kind = None, animated = None):
+		# Returns the indices of the definitions of a base object kind and/or animation state.
+		return [n for n in range(1, len(self.types)) if (kind == None or self.types[n][0] == kind) and (animated == None or self.types[n][1] == animated)]
+
+	def __getstate__(self):
+		# Types are not saved, as they follow from the definitions.
+		state = self.__dict__.copy()
+		del state['types']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.types = [get_graphics_type(graphics) for graphics in self.definitions]
+
+def get_frame_rate(graphics):
+	# Frames per second of an animated sprite definition.
+	return graphics[3] if len(graphics) > 3 else DEFAULT_FRAME_RATE
+
+def get_graphics_type(graphics):
+	# Determines whether a sprite definition is a static object, animated-object, autotile object or animated autotile object.
+	# Returns on the form [base object, animated] with base object = object, wall, autotile, and animated = True, False.
+	baseobject = None
+	animated = False
+	if graphics == None or graphics == [None]:
+		return [baseobject, animated]
+	# More than one [x, y] in the innermost brackets means the sprite has several frames, and is animated.
+	animated = len(graphics[1][0]) > 1
+	if len(graphics[1]) == 4:
+		# Four innermost brackets make an autotile.
+		baseobject = 'autotile'
+	elif len(graphics[1]) == 1 and graphics[2][1] == graphics[2][0] / 2:
+		baseobject = 'object'
+	elif len(graphics[1]) == 1 and graphics[2][1] == graphics[2][0] * 1.5:
+		baseobject = 'wall'
+	return [baseobject, animated]
\ No newline at end of file
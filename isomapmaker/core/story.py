@@ -0,0 +1,114 @@
+# Fundamental imports
+import numpy
+# Elements from subdirectories
+from .tile import Tile
+from .sprites import SpriteTable
+from .spatialindex import TileIndex, TerrainIndex
+
+# Dtypes of the story planes:
+SPRITE_DTYPE = numpy.uint16
+ENTERDIR_DTYPE = numpy.uint8
+STEPCOST_DTYPE = numpy.uint8
+TERRAIN_DTYPE = numpy.uint16
+
+class Story():
+	def __init__(self, i = 14, j = 14, layerCount = 6, spriteTable = None, terrainTypes = None, sprites = None, enterDir = None, stepCost = None, terrain = None, **kwargs):
+		# Stories used to contain a matrix holding one Tile object for each tile in the map.
+		# Instead, every property of the tiles is now stored in a typed array ("plane") indexed by [i, j],
+		# and Tile objects are only created on demand as views into these planes.
+		self.iCount = i
+		self.jCount = j
+		self.layerCount = layerCount
+		# Sprite definitions are shared by all stories of a map, and the planes only hold indices into them.
+		self.spriteTable = spriteTable if spriteTable != None else SpriteTable()
+		# Terrain types are stored the same way, with index 0 meaning no terrain.
+		self.terrainTypes = terrainTypes if terrainTypes != None else [None]
+		# The planes can be handed in ready-made, for instance memory-mapped from a map file.
+		# Sprite index per layer, on the form [layer, i, j]. 0 means nothing is painted there.
+		self.sprites = sprites if sprites is not None else numpy.zeros((layerCount, i, j), dtype = SPRITE_DTYPE)
+		# Directions from which a tile can be entered, packed as bits in the order
+		# [left, top-left, top, top-right, right, bottom-right, bottom, bottom-left], left being bit 0.
+		self.enterDir = enterDir if enterDir is not None else numpy.full((i, j), 0xFF, dtype = ENTERDIR_DTYPE)
+		# Step cost for [walking, riding, flying], on the form [kind, i, j].
+		self.stepCost = stepCost if stepCost is not None else numpy.zeros((3, i, j), dtype = STEPCOST_DTYPE)
+		# Terrain type index.
+		self.terrain = terrain if terrain is not None else numpy.zeros((i, j), dtype = TERRAIN_DTYPE)
+		# Occupants and triggers are arbitrary objects and are rare, so they are stored sparsely, keyed by (i, j), in
+		# spatial indexes that answer queries by region, distance and kind. See spatialindex.py.
+		self.occupants = TileIndex()
+		self.triggers = TileIndex()
+		# Number of changes made through the tiles of this story. The map counts them together with its own, see MapFile.get_revisions.
+		self.changes = 0
+		# Terrain is set through the terrain index, which counts the tiles of each terrain type by region.
+		self.terrainIndex = TerrainIndex(self)
+		# The matrix is kept for code that looks tiles up as matrix[i][j].
+		self.matrix = TileMatrix(self)
+
+	def get_tile(self, i, j):
+		return Tile(story = self, i = int(i), j = int(j))
+
+	def set_terrain(self, i, j, index):
+		self.terrainIndex.set(int(i), int(j), index)
+		self.mark_changed()
+
+	def mark_changed(self):
+		self.changes += 1
+
+	def nbytes(self):
+		# Memory used by the planes of this story.
+		return self.sprites.nbytes + self.enterDir.nbytes + self.stepCost.nbytes + self.terrain.nbytes
+
+	def resize(self, i, j):
+		# Crops or extends the planes to i x j tiles. Tiles kept keep their data, and new tiles get the defaults.
+		# Occupants and triggers on tiles that are cut off are dropped.
+		def resized(plane, value):
+			new = numpy.full(plane.shape[:-2] + (i, j), value, dtype = plane.dtype)
+			new[..., :min(i, self.iCount), :min(j, self.jCount)] = plane[..., :min(i, self.iCount), :min(j, self.jCount)]
+			return new
+		self.sprites = resized(self.sprites, 0)
+		self.enterDir = resized(self.enterDir, 0xFF)
+		self.stepCost = resized(self.stepCost, 0)
+		self.terrain = resized(self.terrain, 0)
+		self.occupants = TileIndex((k, v) for k, v in self.occupants.items() if k[0] < i and k[1] < j)
+		self.triggers = TileIndex((k, v) for k, v in self.triggers.items() if k[0] < i and k[1] < j)
+		self.iCount = i
+		self.jCount = j
+		self.terrainIndex.rebuild()
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		# The matrix and the terrain index only refer back to the story and are rebuilt when loading.
+		del state['matrix']
+		del state['terrainIndex']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		# Stories pickled before the spatial indexes held plain dicts.
+		self.occupants = TileIndex(self.occupants) if isinstance(self.occupants, dict) else self.occupants
+		self.triggers = TileIndex(self.triggers) if isinstance(self.triggers, dict) else self.triggers
+		self.changes = state.get('changes', 0)
+		self.terrainIndex = TerrainIndex(self)
+		self.matrix = TileMatrix(self)
+
+class TileMatrix():
+	def __init__(self, story):
+		# Makes story.matrix[i][j] return a Tile view, so that code written for the old matrix of Tiles keeps working.
+		self.story = story
+
+	def __len__(self):
+		return self.story.iCount
+
+	def __getitem__(self, i):
+		return TileRow(self.story, int(i))
+
+class TileRow():
+	def __init__(self, story, i):
+		self.story = story
+		self.i = i
+
+	def __len__(self):
+		return self.story.jCount
+
+	def __getitem__(self, j):
+		return Tile(story = self.story, i = self.i, j = int(j))
\ No newline at end of file
@@ -0,0 +1,121 @@
+# Tile view:
+# Tiles are no longer stored one object per cell. A Tile is a lightweight view of the cell (i, j) in the planes of a Story,
+# created when needed and thrown away afterwards. All reads and writes go straight to the story's arrays.
+
+class Tile():
+	__slots__ = ['story', 'i', 'j']
+
+	def __init__(self, story = None, i = 0, j = 0, **kwargs):
+		self.story = story
+		self.i = i
+		self.j = j
+
+	@property
+	def layerCount(self):
+		# Layers, per story
+		return self.story.layerCount
+
+	@property
+	def coords(self):
+		# Isometric coordinates
+		return [self.i, self.j]
+
+	@property
+	def occupant(self):
+		# Is this tile blocked by something on this story?
+		return self.story.occupants.get((self.i, self.j))
+
+	@property
+	def enterDir(self):
+		# When not blocked, from which directions can one enter? This is important to ensure that one cannot walk across certain ledges:
+		# This bears the form of [left, top-left, top, top-right, right, bottom-right, bottom, bottom-left]
+		# The list is unpacked from the bitmask in the story, so changes must go through set_dir.
+		mask = int(self.story.enterDir[self.i, self.j])
+		return [bool(mask >> n & 1) for n in range(8)]
+
+	@property
+	def stepCost(self):
+		# If in a battle, how many steps does it cost to pass this tile?
+		# This bears the form of cost for [walking, riding, flying].
+		return [int(c) for c in self.story.stepCost[:, self.i, self.j]]
+
+	@stepCost.setter
+	def stepCost(self, cost):
+		self.story.stepCost[:, self.i, self.j] = cost
+		self.story.mark_changed()
+
+	@property
+	def terrainType(self):
+		# Which terrain does this tile count as?
+		return self.story.terrainTypes[self.story.terrain[self.i, self.j]]
+
+	@terrainType.setter
+	def terrainType(self, terrainType):
+		if not terrainType in self.story.terrainTypes:
+			self.story.terrainTypes.append(terrainType)
+		self.story.set_terrain(self.i, self.j, self.story.terrainTypes.index(terrainType))
+
+	@property
+	def trigger(self):
+		# When a unit steps over this tile, is anything triggered?
+		return self.story.triggers.get((self.i, self.j))
+
+	@property
+	def graphics(self):
+		# The sprites painted on this tile, looked up from the sprite table of the story.
+		# The list has the form of [ [graphics for layer 0], [graphics for layer 1], ...] with sprite containing information on:
+		# - filename: to find the .png file.
+		# - [ [ [x, y] ] ] where (x, y) marks the lower-left corner in the texture from the filename from which a rectangle is to be drawn.
+		#				If there is more than 1 [x,y] in the innermost brackets, it means it's animated.
+		#				If there is more than 1 innermost bracket, it means it's an autotile.
+		# - [sizex, sizey], indicating the size for the get_region command.
+		# Empty layers are [None].
+		table = self.story.spriteTable
+		return [table.get(int(index)) for index in self.story.sprites[:, self.i, self.j]]
+
+	def get_sprite_id(self, layer):
+		return int(self.story.sprites[layer, self.i, self.j])
+
+	def set_graphics(self, layer, object):
+		self.story.sprites[layer, self.i, self.j] = self.story.spriteTable.intern(object)
+		self.story.mark_changed()
+
+	def set_sprite_id(self, layer, index):
+		self.story.sprites[layer, self.i, self.j] = index
+		self.story.mark_changed()
+
+	def get_graphics_type(self, layer):
+		# Determines whether the sprite on this layer is a static object, animated-object, autotile object or animated autotile object.
+		# Returns on the form [base object, animated] with base object = object, autotile, and animated = True, False.
+		return self.story.spriteTable.get_type(self.get_sprite_id(layer))
+
+	def set_trigger(self, trigger):
+		if trigger == None:
+			self.story.triggers.pop((self.i, self.j), None)
+		else:
+			self.story.triggers[(self.i, self.j)] = trigger
+		self.story.mark_changed()
+
+	def set_dir(self, dirNo, dirVal):
+		if dirNo == 'All':
+			self.story.enterDir[self.i, self.j] = 0xFF if dirVal else 0
+		elif dirVal:
+			self.story.enterDir[self.i, self.j] |= 1 << dirNo
+		else:
+			self.story.enterDir[self.i, self.j] &= ~(1 << dirNo) & 0xFF
+		self.story.mark_changed()
+
+	def set_occupant(self, occupant):
+		if occupant == None:
+			self.story.occupants.pop((self.i, self.j), None)
+		else:
+			self.story.occupants[(self.i, self.j)] = occupant
+		self.story.mark_changed()
+
+	def get_occupant(self):
+		if self.occupant != None:
+			return self.occupant
+
+	def get_graphics(self, layer):
+		# This calls the sprite stored on a layer
+		return self.story.spriteTable.get(self.get_sprite_id(layer))
\ No newline at end of file
@@ -0,0 +1,28 @@
+# The Kivy editor. Kivy is imported the first time one of the names below is used, so that importing the package, for
+# instance to reach isomapmaker.core through it, neither loads Kivy nor opens a window.
+import importlib
+
+# Modules of the names this package gives access to:
+lazyNames = {
+	'MapMaker': 'app',
+	'RootWidget': 'app',
+	'MapCanvas': 'canvas',
+	'Palette': 'palettes',
+	'MapBrowser': 'mapbrowser',
+	'KeyboardListener': 'keyboard',
+	'BackgroundSaver': 'saving',
+	'BackgroundLoader': 'loading',
+}
+
+def __getattr__(name):
+	if name in lazyNames:
+		value = getattr(importlib.import_module("." + lazyNames[name], __name__), name)
+		globals()[name] = value
+		return value
+	raise AttributeError("module " + __name__ + " has no attribute " + name)
+
+def __dir__():
+	return sorted(list(globals().keys()) + list(lazyNames.keys()))
+
+def run():
+	__getattr__('MapMaker')().run()
\ No newline at end of file
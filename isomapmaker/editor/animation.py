@@ -0,0 +1,86 @@
+# Fundamental imports
+from functools import partial
+from kivy.clock import Clock
+# Elements from subdirectories
+from ..core.profiling import instruments
+
+# Animation:
+# Animated sprites are drawn in the sprite runs of their chunks like any other, and are advanced by the Animator. There
+# is one Clock event per frame rate in use, rather than one per sprite. The frame shown follows from the time, so that
+# every sprite of a frame rate changes frame at once, whenever its chunk was built.
+# On each tick, only the runs of the chunks in view are advanced: the frame of every animated sprite of the run is
+# written into its vertex array at once, and the array is handed to its Mesh. Chunks out of view are left alone, and
+# catch up on the first tick after they come into view again.
+# A layer with animated sprites in view changes at their frame rate, which is more often than is worth rendering it
+# into an Fbo. The canvas therefore draws such layers directly rather than from the layer cache.
+
+class Animator():
+	def __init__(self):
+		# The runs with animated sprites of each frame rate, by chunk key:
+		self.runs = {}
+		# The layers with animated sprites, by chunk key:
+		self.layers = {}
+		# The Clock event of each frame rate:
+		self.events = {}
+		# Keys of the chunks in view:
+		self.visible = set()
+
+	def get_frame(self, rate):
+		return int(Clock.get_boottime() * rate)
+
+	def add_chunk(self, key, meshes):
+		# Takes over the animated runs of a chunk, just built or changed, and shows their current frame.
+		self.remove_chunk(key)
+		for l in range(len(meshes.runs)):
+			for run in meshes.runs[l]:
+				if len(run.animations) != 0:
+					self.layers.setdefault(key, set()).add(l)
+				for rate in run.animations:
+					self.runs.setdefault(rate, {}).setdefault(key, []).append(run)
+					if run.animate(rate, self.get_frame(rate)) != 0:
+						run.upload()
+		for rate in self.runs:
+			if not rate in self.events:
+				self.events[rate] = Clock.schedule_interval(partial(self.tick, rate), 1 / rate)
+
+	def remove_chunk(self, key):
+		self.layers.pop(key, None)
+		for rate in list(self.runs.keys()):
+			self.runs[rate].pop(key, None)
+			if len(self.runs[rate]) == 0:
+				del self.runs[rate]
+				self.events.pop(rate).cancel()
+
+	def set_visible(self, keys):
+		self.visible = set(keys)
+
+	def get_animated_layers(self):
+		# Returns the (story, layer) with animated sprites in view.
+		return set((key[0], l) for key in self.visible if key in self.layers for l in self.layers[key])
+
+	def tick(self, rate, dt):
+		self.advance(rate, self.get_frame(rate))
+
+	def advance(self, rate, frame):
+		# Shows frame number frame of the animated sprites of rate in view.
+		chunks = self.runs.get(rate, {})
+		# Whichever is fewer is gone through: the chunks in view, or those with animations of this rate.
+		keys = [key for key in self.visible if key in chunks] if len(self.visible) < len(chunks) else [key for key in chunks if key in self.visible]
+		for key in keys:
+			for run in chunks[key]:
+				count = run.animate(rate, frame)
+				if count != 0:
+					run.upload()
+					instruments.count("sprites animated", count)
+
+	def get_count(self):
+		# Number of runs with animated sprites, in view or not.
+		return sum(len(runs) for chunks in self.runs.values() for runs in chunks.values())
+
+	def clear(self):
+		for event in self.events.values():
+			event.cancel()
+		self.runs = {}
+		self.layers = {}
+		self.events = {}
+		self.visible = set()
\ No newline at end of file
@@ -0,0 +1,529 @@
+import kivy
+kivy.require('1.9.0')
+# Fundamental imports
+import os, sys, inspect
+from os import listdir
+from os.path import dirname, isfile, join, split
+from kivy.app import App
+from kivy.config import Config
+from kivy.core.window import Window
+from kivy.clock import Clock
+# Disable multitouch
+Config.set('input', 'mouse', 'mouse,disable_multitouch')
+# UI Elements
+from kivy.uix.button import Button
+from kivy.uix.togglebutton import ToggleButton
+from kivy.uix.label import Label
+from kivy.uix.textinput import TextInput
+from kivy.uix.popup import Popup
+# Layouts
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.dropdown import DropDown
+# Graphics Elements
+from kivy.core.image import Image
+from kivy.graphics import Color, Quad, Rectangle, Line
+# Directories of the assets and maps
+from .. import paths
+# Elements from subdirectories
+from .canvas import MapCanvas, MIN_ZOOM, MAX_ZOOM, ZOOM_STEP
+from ..core.mapfile import MapFile
+from ..core import msfformat
+from .saving import BackgroundSaver
+from .loading import BackgroundLoader
+from .mapbrowser import MapBrowser
+from .palettes import Palette
+from . import textures
+from .keyboard import KeyboardListener
+from ..core.graphicsobject import GraphicsObject, FloorObject
+from ..core import profiling
+from ..core.profiling import log
+from .overlay import ProfilerOverlay
+
+
+# Seconds between autosaves:
+AUTOSAVE_INTERVAL = 120
+
+class RootWidget(GridLayout):
+	def __init__(self, useAtlas = False, **kwargs):
+		super(RootWidget, self).__init__(**kwargs)
+		self.rows = 2
+		self.keyboard = KeyboardListener()
+		self.paletteRes = [64, 32]
+		# Optionally pack the tilesets into one texture, so that sprites of different tilesets are drawn together.
+		if useAtlas:
+			textures.manager.pack_directory(paths.subDirectory['graphics'])
+		
+		# # # # # # # # # # #
+		# MENU BAR:
+		# # # # # # # # # # #
+		menu = GridLayout(size_hint_y = None, height = 20, rows = 1)
+		# Parts of the Menu Bar
+		# NEW MAP
+		# Button to open the popup:
+		newMapButton = Button(text = "New Map")
+		# Layout of the popup
+		newMapContent = GridLayout(rows = 2, cols = 2)
+		newMapContentInputs = GridLayout(rows = 2, cols = 3)
+		newMapContent.add_widget(newMapContentInputs)
+		newMapContent.add_widget(Label(text = ("Define width (I) and \n height (J) and \n no. stories to create \n a new map.")))
+		# Actual popup window
+		self.newMapPopup = Popup(title = "New Map", content = newMapContent, size_hint = (None, None), height = 200, width = 320, auto_dismiss = False)
+		# Width / Height / Stories inputs -- very important!
+		self.newMapWidthInput = TextInput(input_filter = 'int', multiline = False, size_hint = (1, None), height = 28, text = "12")
+		self.newMapHeightInput = TextInput(input_filter = 'int', multiline = False, size_hint = (1, None), height = 28, text = "14")
+		self.newMapStoriesInput = TextInput(input_filter = "int", multiline = False, size_hint = (1, None), height = 28, text = "1")
+		# Confirmation button and cancel button
+		newMapOKButton = Button(text = "OK", size_hint_y = None, height = 25)
+		newMapCancelButton = Button(text = "Cancel", size_hint_y = None, height = 25)
+		# Add inputs, labels and buttons to the content of the popup:
+		newMapContentInputs.add_widget(Label(text = "I", size_hint = (1, None), height = 25))
+		newMapContentInputs.add_widget(Label(text = "J", size_hint = (1, None), height = 25))
+		newMapContentInputs.add_widget(Label(text = "Stories", size_hint = (1, None), height = 25))
+		newMapContentInputs.add_widget(self.newMapWidthInput)
+		newMapContentInputs.add_widget(self.newMapHeightInput)
+		newMapContentInputs.add_widget(self.newMapStoriesInput)
+		newMapContent.add_widget(newMapOKButton)
+		newMapContent.add_widget(newMapCancelButton)
+		# New Map button bindings:
+		newMapButton.bind(on_press = self.newMapPopup.open)
+		newMapOKButton.bind(on_press = self.new_map)
+		newMapCancelButton.bind(on_press = self.newMapPopup.dismiss)
+		
+		# SAVE MAP:
+		saveMapButton = Button(text = "Save Map")
+		# Save Map Button Bindings:
+		saveMapButton.bind(on_press = self.save_map)
+		
+		# LOAD MAP:
+		# Button to open the popup:
+		loadMapButton = Button(text = "Load Map")
+		# Layout for the popup:
+		loadMapContent = GridLayout(rows = 2)
+		loadMapLowerRegion = GridLayout(cols = 3, size_hint = (1, None), height = 35)
+		# Actual Popup window:
+		self.loadMapPopup = Popup(title = "Load Map", content = loadMapContent, size_hint = (None, None), height = 400, width = 500, auto_dismiss = False)
+		# Lower Region Buttons and Label
+		self.loadMapSelectedFileLabel = Label(text = "No map chosen", size_hint = (1, None), height = 35)
+		loadMapOKButton = Button(text = "Load", disabled = True, size_hint = (0.2, None), height = 30)
+		loadMapCancelButton = Button(text = "Cancel", size_hint = (0.2, None), height = 30)
+		# The list of maps comes from the catalog of the maps directory, refreshed whenever the popup opens.
+		def select_map(file):
+			self.loadMapSelectedFileLabel.text = file
+			loadMapOKButton.disabled = False
+		self.mapBrowser = MapBrowser(paths.subDirectory['maps'], keyboard = self.keyboard, onSelect = select_map)
+		loadMapContent.add_widget(self.mapBrowser)
+		loadMapContent.add_widget(loadMapLowerRegion)
+		# Adding labels and buttons to the content of the popup:
+		loadMapLowerRegion.add_widget(self.loadMapSelectedFileLabel)
+		loadMapLowerRegion.add_widget(loadMapOKButton)
+		loadMapLowerRegion.add_widget(loadMapCancelButton)
+		# Load Map Button Bindings:
+		loadMapOKButton.bind(on_press = self.load_map)
+		loadMapOKButton.bind(on_release = lambda x: setattr(loadMapOKButton, "disabled", True))
+		loadMapCancelButton.bind(on_release = lambda x: setattr(loadMapOKButton, "disabled", True))
+		loadMapCancelButton.bind(on_press = self.loadMapPopup.dismiss)
+		
+		loadMapButton.bind(on_press = self.loadMapPopup.open)
+		self.loadMapPopup.bind(on_open = lambda x: self.mapBrowser.refresh())
+		
+		# Structure of the Menu Bar
+		menu.add_widget(newMapButton)
+		menu.add_widget(saveMapButton)
+		menu.add_widget(loadMapButton)
+		
+		self.add_widget(menu)
+		
+		
+		# MAIN
+		main = GridLayout(cols = 3)
+		self.add_widget(main)
+		
+		# # # # # # # # # # #
+		# CENTER side of MAIN
+		# # # # # # # # # # #
+		self.centerSide = GridLayout(rows = 3)
+		# PARTS OF CENTER SIDE
+		# Scroller for the map canvas
+		mapCanvasScroller = ScrollView(scroll_type = ['bars'],
+										bar_width = 8,
+										bar_color = [0, 0, 0, 1], 
+										bar_inactive_color = [0, 0, 0, .1], 
+										scroll_timeout = 0)									
+		self.mapCanvas = MapCanvas(size_hint = (None, None), keyboard = self.keyboard)
+		mapCanvasScroller.add_widget(self.mapCanvas)
+		self.mapCanvas.update_size()
+		
+		# Toolbar
+		toolbar = GridLayout(size_hint = (1, None), 
+									height = 30,
+									rows = 1)
+		# Toolbar part: Eraser
+		self.eraser = Button(text = ("Eraser"))
+		self.eraser.bind(on_press = self.select_eraser)
+		# Toolbar part: Fill Selection
+		self.fillSelection = Button(text = ("Fill Selection"))
+		self.fillSelection.bind(on_press = self.fill_selection)
+		# Toolbar part: Flood Fill
+		self.floodFill = ToggleButton(text = ("Flood Fill"))
+		self.floodFill.bind(state = self.toggle_flood_fill)
+		# Toolbar part: Movement Range, also on ctrl + r
+		self.movementRange = ToggleButton(text = ("Movement Range"))
+		self.movementRange.bind(state = self.toggle_movement_range)
+		self.keyboard.bind_shortcut('r', self.press_movement_range)
+		# Toolbar part: Triggers, also on ctrl + t
+		self.triggers = ToggleButton(text = ("Triggers"))
+		self.triggers.bind(state = self.toggle_triggers)
+		self.keyboard.bind_shortcut('t', self.press_triggers)
+		# Toolbar part: Undo and Redo, also on ctrl + z and ctrl + y
+		self.undo = Button(text = ("Undo"))
+		self.undo.bind(on_press = self.undo_change)
+		self.redo = Button(text = ("Redo"))
+		self.redo.bind(on_press = self.redo_change)
+		self.keyboard.bind_shortcut('z', self.undo_change)
+		self.keyboard.bind_shortcut('y', self.redo_change)
+		# Toolbar part: Zoom In, also on ctrl + = and ctrl + the mouse wheel
+		self.zoomIn = Button(text = ("Zoom In"))
+		self.zoomIn.bind(on_press = self.zoom_in)
+		# Toolbar part: Zoom Out, also on ctrl + - and ctrl + the mouse wheel
+		self.zoomOut = Button(text = ("Zoom Out"))
+		self.zoomOut.bind(on_press = self.zoom_out)
+		self.keyboard.bind_shortcut('=', self.zoom_in)
+		self.keyboard.bind_shortcut('-', self.zoom_out)
+		self.mapCanvas.bind(zoomFactor = self.update_zoom_buttons)
+		
+		toolbar.add_widget(self.eraser)
+		toolbar.add_widget(self.fillSelection)
+		toolbar.add_widget(self.floodFill)
+		toolbar.add_widget(self.movementRange)
+		toolbar.add_widget(self.triggers)
+		toolbar.add_widget(self.undo)
+		toolbar.add_widget(self.redo)
+		toolbar.add_widget(self.zoomIn)
+		toolbar.add_widget(self.zoomOut)		
+		
+		# # # # # # # # # # #
+		# LEFT side of MAIN
+		# # # # # # # # # # #
+		paletteOffset = 4
+		leftSide = GridLayout(cols = 1,
+								width = self.paletteRes[0] * 4 + 2 * paletteOffset,
+								size_hint_x = None)
+						
+		# PARTS OF LEFT SIDE
+		# Scroller for the main object palette:
+		self.objectPaletteScroller = ScrollView(scroll_type = ['bars'],
+										size_hint = (1, None),
+										height = 4 * self.paletteRes[0],
+										bar_width = 8,
+										bar_color = [0, 0, 0, 1],
+										bar_inactive_color = [0, 0, 0, .1],
+										scroll_timeout = 0)
+		self.objectPalette = Palette(size_hint = (None, None), 
+									tileset = join(paths.subDirectory['graphics'], "wall base.png"), 
+									keyboard = self.keyboard, 
+									mapCanvas = self.mapCanvas,
+									offset = paletteOffset)
+		self.objectPaletteScroller.add_widget(self.objectPalette)
+		
+		
+		# Scroller for autotile palettes
+		# Add palettes to main canvas
+		self.mapCanvas.palettes.append(self.objectPalette)
+		
+		# Structure for leftSide:
+		leftSide.add_widget(Label(text = "Objects Palette", size_hint = (1, None), height = 25))
+		leftSide.add_widget(self.objectPaletteScroller)
+
+		
+		# # # # # # # # # # #
+		# RIGHT side of MAIN
+		# # # # # # # # # # #
+		rightSide = GridLayout(cols = 1,
+								width = 200,
+								size_hint_x = None)
+		# PARTS OF RIGHT SIDE
+		# Map Properties
+		mapProperties = GridLayout(cols = 1, size_hint = (1, None), height = 210)
+		self.mapPropertiesNameInput = TextInput(hint_text = "New Map", multiline = False, size_hint = (1, None), height = 30)
+		self.mapPropertiesIDInput = TextInput(hint_text = "ID", multiline = False, size_hint = (1, None), height = 30)
+		self.sizeLabel = Label(size_hint = (1, None), height = 30)
+		self.update_size_label()
+		changeSizeButton = Button(text = "Change Size", size_hint = (1, None), height = 30)
+		swapStoriesButton = Button(text = "Swap Stories", size_hint = (1, None), height = 30)
+		mapProperties.add_widget(Label(text = "Map Name:"))
+		mapProperties.add_widget(self.mapPropertiesNameInput)
+		mapProperties.add_widget(Label(text = "Map ID:"))
+		mapProperties.add_widget(self.mapPropertiesIDInput)
+		mapProperties.add_widget(self.sizeLabel)
+		mapProperties.add_widget(changeSizeButton)
+		mapProperties.add_widget(swapStoriesButton)
+		# CHANGE SIZE:
+		# Layout of the popup
+		changeSizeContent = GridLayout(rows = 2, cols = 2)
+		changeSizeContentInputs = GridLayout(rows = 2, cols = 2)
+		changeSizeContent.add_widget(changeSizeContentInputs)
+		changeSizeContent.add_widget(Label(text = ("Crop or extend \n every story to \n I x J tiles.")))
+		# Actual popup window
+		self.changeSizePopup = Popup(title = "Change Size", content = changeSizeContent, size_hint = (None, None), height = 200, width = 320, auto_dismiss = False)
+		# Width / Height inputs, filled in with the current size when the popup opens
+		self.changeSizeWidthInput = TextInput(input_filter = 'int', multiline = False, size_hint = (1, None), height = 28)
+		self.changeSizeHeightInput = TextInput(input_filter = 'int', multiline = False, size_hint = (1, None), height = 28)
+		# Confirmation button and cancel button
+		changeSizeOKButton = Button(text = "OK", size_hint_y = None, height = 25)
+		changeSizeCancelButton = Button(text = "Cancel", size_hint_y = None, height = 25)
+		# Add inputs, labels and buttons to the content of the popup:
+		changeSizeContentInputs.add_widget(Label(text = "I", size_hint = (1, None), height = 25))
+		changeSizeContentInputs.add_widget(Label(text = "J", size_hint = (1, None), height = 25))
+		changeSizeContentInputs.add_widget(self.changeSizeWidthInput)
+		changeSizeContentInputs.add_widget(self.changeSizeHeightInput)
+		changeSizeContent.add_widget(changeSizeOKButton)
+		changeSizeContent.add_widget(changeSizeCancelButton)
+		# Change Size button bindings:
+		changeSizeButton.bind(on_press = self.open_change_size)
+		changeSizeOKButton.bind(on_press = self.change_size)
+		changeSizeCancelButton.bind(on_press = self.changeSizePopup.dismiss)
+		# SWAP STORIES:
+		# Layout of the popup
+		swapStoriesContent = GridLayout(rows = 2, cols = 2)
+		swapStoriesContentInputs = GridLayout(rows = 2, cols = 2)
+		swapStoriesContent.add_widget(swapStoriesContentInputs)
+		swapStoriesContent.add_widget(Label(text = ("Swap two stories, \n numbered from 0 \n at the bottom.")))
+		# Actual popup window
+		self.swapStoriesPopup = Popup(title = "Swap Stories", content = swapStoriesContent, size_hint = (None, None), height = 200, width = 320, auto_dismiss = False)
+		# Story inputs
+		self.swapStoriesFirstInput = TextInput(input_filter = 'int', multiline = False, size_hint = (1, None), height = 28, text = "0")
+		self.swapStoriesSecondInput = TextInput(input_filter = 'int', multiline = False, size_hint = (1, None), height = 28, text = "1")
+		# Confirmation button and cancel button
+		swapStoriesOKButton = Button(text = "OK", size_hint_y = None, height = 25)
+		swapStoriesCancelButton = Button(text = "Cancel", size_hint_y = None, height = 25)
+		# Add inputs, labels and buttons to the content of the popup:
+		swapStoriesContentInputs.add_widget(Label(text = "Story", size_hint = (1, None), height = 25))
+		swapStoriesContentInputs.add_widget(Label(text = "Story", size_hint = (1, None), height = 25))
+		swapStoriesContentInputs.add_widget(self.swapStoriesFirstInput)
+		swapStoriesContentInputs.add_widget(self.swapStoriesSecondInput)
+		swapStoriesContent.add_widget(swapStoriesOKButton)
+		swapStoriesContent.add_widget(swapStoriesCancelButton)
+		# Swap Stories button bindings:
+		swapStoriesButton.bind(on_press = self.swapStoriesPopup.open)
+		swapStoriesOKButton.bind(on_press = self.swap_stories)
+		swapStoriesCancelButton.bind(on_press = self.swapStoriesPopup.dismiss)
+		# Story Selection
+		
+		# Layer Selection
+		layerSelection = GridLayout(cols = 1)
+		for l in range(6):
+			text = "Layer " + str(5 - l)
+			button = Button(text = text,
+							size_hint = (1, None),
+							height = 35)
+			button.id = str(5 - l)
+			button.bind(on_press = self.change_layer)
+			layerSelection.add_widget(button)
+		# Structure for rightSide:
+		rightSide.add_widget(Label(text = "Map Properties",
+									size_hint = (1, None),
+									height = 25))
+		rightSide.add_widget(mapProperties)
+		rightSide.add_widget(Label(text = ("Layer Selection"),
+									size_hint = (1, None),
+									height = 25))
+		rightSide.add_widget(layerSelection)
+		
+		# Add Left, Center, Right to MAIN:
+		main.add_widget(leftSide)
+		main.add_widget(self.centerSide)
+		main.add_widget(rightSide)
+		
+		self.centerSide.add_widget(toolbar)
+
+		self.centerSide.add_widget(mapCanvasScroller)
+		self.tooltip = Button(text = "Tooltip placeholder", size_hint_y = None, height = 20)
+		self.centerSide.add_widget(self.tooltip)
+		
+		# Maps are saved on a worker thread, reporting in the tooltip bar, and saved to an autosave file every few minutes
+		# while they have unsaved changes.
+		self.saver = BackgroundSaver(onProgress = self.on_save_progress, onDone = self.on_save_done)
+		self.saver.mark_saved(self.mapCanvas.mapFile)
+		Clock.schedule_interval(self.autosave, AUTOSAVE_INTERVAL)
+		# Maps are loaded on a worker thread too.
+		self.loader = BackgroundLoader(onHeader = self.on_load_header, onDone = self.on_load_done)
+		# Frame times, draw counts, cache hit rates and the slowest functions, shown and hidden with ctrl + p.
+		self.profilerOverlay = ProfilerOverlay(self.mapCanvas)
+		self.keyboard.bind_shortcut('p', self.toggle_profiler)
+		if os.environ.get("ISOMAP_OVERLAY"):
+			Clock.schedule_once(lambda dt: self.toggle_profiler())
+		
+		self.keyboard._keyboard_open()
+	
+	def new_map(self, button):
+		# Calls functions from canvas.py
+		# Uses data from newMap-section of this .py file
+		self.mapCanvas.set_map(MapFile(i = int(self.newMapWidthInput.text), j = int(self.newMapHeightInput.text), stories = int(self.newMapStoriesInput.text) ))
+		self.saver.mark_saved(self.mapCanvas.mapFile)
+		self.update_size_label()
+		self.newMapPopup.dismiss()
+
+	def update_size_label(self):
+		self.sizeLabel.text = str("Size: " + str(self.mapCanvas.iCount) + " X " + str(self.mapCanvas.jCount) + " X " + str(len(self.mapCanvas.mapFile.stories)))
+
+	def open_change_size(self, button):
+		self.changeSizeWidthInput.text = str(self.mapCanvas.iCount)
+		self.changeSizeHeightInput.text = str(self.mapCanvas.jCount)
+		self.changeSizePopup.open()
+
+	def change_size(self, button):
+		# Resizing goes through the canvas, which records it in the history so that it can be undone.
+		if self.mapCanvas.loadingSize != None:
+			return
+		i, j = int(self.changeSizeWidthInput.text or 0), int(self.changeSizeHeightInput.text or 0)
+		if i <= 0 or j <= 0:
+			self.tooltip.text = "A map must be at least 1 X 1 tiles"
+			return
+		self.mapCanvas.resize_map(i, j)
+		self.update_size_label()
+		self.changeSizePopup.dismiss()
+
+	def swap_stories(self, button):
+		# Swapping goes through the canvas too, and can be undone.
+		if self.mapCanvas.loadingSize != None:
+			return
+		story1, story2 = int(self.swapStoriesFirstInput.text or 0), int(self.swapStoriesSecondInput.text or 0)
+		storyCount = len(self.mapCanvas.mapFile.stories)
+		if not (0 <= story1 < storyCount and 0 <= story2 < storyCount):
+			self.tooltip.text = "Stories are numbered from 0 to " + str(storyCount - 1)
+			return
+		self.mapCanvas.swap_stories(story1, story2)
+		self.swapStoriesPopup.dismiss()
+	
+	def save_map(self, button):
+		if self.mapCanvas.mapFile.ID == "": return log.warning("Maps without an ID are not saved")
+		saveDirectory = join(paths.subDirectory['maps'], str(self.mapCanvas.mapFile.ID) + ".msf")
+		self.saver.save(self.mapCanvas.mapFile, saveDirectory)
+	
+	def autosave(self, dt):
+		# Only maps changed since they were last saved or loaded are autosaved.
+		if self.mapCanvas.mapFile.ID == "" or self.saver.is_busy() or self.loader.is_busy() or not self.saver.is_changed(self.mapCanvas.mapFile):
+			return
+		os.makedirs(paths.subDirectory['autosaves'], exist_ok = True)
+		self.saver.save(self.mapCanvas.mapFile, join(paths.subDirectory['autosaves'], str(self.mapCanvas.mapFile.ID) + ".msf"))
+	
+	def on_save_progress(self, path, fraction):
+		self.tooltip.text = "Saving " + split(path)[1] + ": " + str(int(fraction * 100)) + "%"
+	
+	def on_save_done(self, path, error):
+		if error == None:
+			self.tooltip.text = "Map saved as " + split(path)[1]
+		else:
+			self.tooltip.text = "Saving " + split(path)[1] + " failed: " + str(error)
+	
+	def load_map(self, button):
+		# Binary maps are memory-mapped, while old pickled maps are converted on the fly, both on a worker thread.
+		# Only one map loads at a time. The popup stays open until the one loading is done.
+		if self.loader.is_busy():
+			self.tooltip.text = "Another map is still loading"
+			return
+		self.loader.load(join(paths.subDirectory['maps'], self.loadMapSelectedFileLabel.text))
+		self.loadMapPopup.dismiss()
+	
+	def on_load_header(self, path, header):
+		# The canvas is sized from the header before the tiles arrive. The current map, and its history, stay until the
+		# new one has loaded, so that nothing is lost if loading fails. Until then the canvas is disabled.
+		self.tooltip.text = "Loading " + split(path)[1] + "..."
+		self.mapCanvas.disabled = True
+		if header != None:
+			self.mapCanvas.size_for_load(header["iCount"], header["jCount"], header["storyCount"])
+			self.sizeLabel.text = str("Size: " + str(header["iCount"]) + " X " + str(header["jCount"]) + " X " + str(header["storyCount"]))
+	
+	def on_load_done(self, path, mapFile, error):
+		self.mapCanvas.disabled = False
+		if error != None:
+			# The map shown before comes back as it was.
+			if self.mapCanvas.loadingSize != None:
+				self.mapCanvas.end_load()
+			self.update_size_label()
+			self.tooltip.text = "Loading " + split(path)[1] + " failed: " + str(error)
+			return
+		self.mapCanvas.end_load(mapFile)
+		self.saver.mark_saved(mapFile)
+		self.update_size_label()
+		self.tooltip.text = "Loaded " + split(path)[1]
+	
+	def change_layer(self, button):
+		#Changes attributes in the canvas.py file
+		self.mapCanvas.set_layer(int(button.id))
+		
+	def select_eraser(self, button):
+		# Painting with [None] clears the sprite of the tile on the current layer.
+		self.mapCanvas.clear_palette_selection()
+		self.mapCanvas.selectedPaint = [None]
+
+	def fill_selection(self, button):
+		self.mapCanvas.fill_selection()
+
+	def toggle_flood_fill(self, button, state):
+		# While pressed, clicking with a paint flood fills instead of painting single tiles and rectangles.
+		self.mapCanvas.paintMode = 'flood' if state == 'down' else 'brush'
+
+	def toggle_movement_range(self, button, state):
+		# While pressed, clicking a tile shows the movement range from it instead of selecting or painting.
+		self.mapCanvas.rangeMode = state == 'down'
+		if state != 'down':
+			self.mapCanvas.draw_range(None)
+
+	def press_movement_range(self):
+		self.movementRange.state = 'normal' if self.movementRange.state == 'down' else 'down'
+
+	def toggle_triggers(self, button, state):
+		# While pressed, the tiles holding a trigger are marked.
+		self.mapCanvas.showTriggers = state == 'down'
+		self.mapCanvas.draw_triggers()
+
+	def press_triggers(self):
+		self.triggers.state = 'normal' if self.triggers.state == 'down' else 'down'
+
+	def undo_change(self, *args):
+		# Undoing or redoing a resize changes the size shown.
+		self.mapCanvas.undo()
+		self.update_size_label()
+
+	def redo_change(self, *args):
+		self.mapCanvas.redo()
+		self.update_size_label()
+
+	def toggle_profiler(self):
+		self.profilerOverlay.toggle(Window)
+
+	def zoom_in(self, *args):
+		self.mapCanvas.set_zoom(self.mapCanvas.zoomFactor * ZOOM_STEP)
+
+	def zoom_out(self, *args):
+		self.mapCanvas.set_zoom(self.mapCanvas.zoomFactor / ZOOM_STEP)
+
+	def update_zoom_buttons(self, canvas, zoomFactor):
+		# The buttons are disabled at the ends of the zoom range, however it was reached.
+		self.zoomIn.disabled = zoomFactor >= MAX_ZOOM
+		self.zoomOut.disabled = zoomFactor <= MIN_ZOOM
+		
+class MapMaker(App):
+	def build(self):
+		# Logging, profiling and tracing of the session, as set in the environment.
+		profiling.configure()
+		# width and height are that of the map, will depend on map later, random for now
+		self.root = RootWidget(cols = 1)
+		# listen to size and position changes
+		self.root.bind(pos = self.updateLayout, size = self.updateLayout)
+		with self.root.canvas.before:
+			Color(0.5, 0.5, 0.5, 1)
+			self.background = Rectangle()
+
+	def updateLayout(self, instance, value):
+		self.background.pos = instance.pos
+		self.background.size = instance.size
+		return self.root
+
+	def on_stop(self):
+		profiling.instruments.finish()
+		
+if __name__ == "__main__":
+	MapMaker().run()
\ No newline at end of file
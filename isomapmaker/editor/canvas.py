@@ -0,0 +1,814 @@
+# Fundamental imports
+import os, sys, inspect
+import numpy
+from kivy.core.window import Window
+# Layouts
+from kivy.uix.floatlayout import FloatLayout
+# Graphics Elements
+from kivy.graphics import Color, Quad, Rectangle, Line, Mesh, InstructionGroup, PushMatrix, PopMatrix, Scale
+from kivy.clock import Clock
+from kivy.properties import NumericProperty
+# Elements from subdirectories
+from .keyboard import KeyboardListener
+from ..core.mapfile import MapFile
+from ..core.chunks import ChunkCache, chunk_bounds, INSTRUCTION_BYTES, DEFAULT_BUDGET
+from .meshes import ChunkMeshes, SpriteCache, quad_indices, MAX_QUADS
+from .layercache import LayerCache
+from .animation import Animator
+from ..core.selection import Selection, rect_between
+from ..core.projection import Projection
+from ..core.history import History, PaintDelta, SwapDelta, ResizeDelta
+from ..core.pathfinding import PathGrid, transitions_from_triggers, WALKING
+from ..core.profiling import timed, log
+
+# Zoom:
+# Everything is built once, in map coordinates with tiles of tileWidth x tileHeight, and zoomed by a Scale in front of
+# the canvas. Zooming changes the Scale and the size of the widget, and only builds the chunks that come into view.
+# The tilesets are mipmapped, so that zoomed out sprites are sampled from smaller levels instead of aliasing.
+MIN_ZOOM = 1 / 16
+MAX_ZOOM = 2
+# Factor of one step of the zoom buttons or the mouse wheel:
+ZOOM_STEP = 2 ** 0.25
+
+class MapCanvas(FloatLayout):
+	# Pixels on screen per unit of map coordinates:
+	zoomFactor = NumericProperty(1)
+
+	def __init__(self, tileWidth = 64, tileHeight = 32, jCount = 23, iCount = 23, mapFile = None, keyboard = None, chunkBudget = DEFAULT_BUDGET, cullMargin = 2, chunksPerFrame = 16, cacheLayers = True, layerCacheMargin = 128, **kwargs):
+		super(MapCanvas, self).__init__(**kwargs)
+		# Width in classic coordinates of one isometric tile:
+		self.tileWidth = tileWidth
+		# Height in classic coordinates of one isometric tile:
+		self.tileHeight = tileHeight
+		# Count of isometric tiles in the i-direction,  which corresponds to isometric x
+		self.iCount = iCount
+		# Count of isometric tiles in the j-direction, which corresponds to isometric y
+		self.jCount = jCount
+		# Mapfile which contains data of each tile, including sprites and etc.
+		if mapFile != None:
+			self.mapFile = mapFile
+		else:
+			self.mapFile = MapFile(i = iCount, j = jCount, stories = 1)
+		# Palettes
+		self.palettes = []
+		# While a map loads, its size [iCount, jCount, storyCount] from the header, and None otherwise. See size_for_load.
+		self.loadingSize = None
+		# The zoom, opened in canvas.before and closed at the end of canvas.after:
+		self.zoomScale = Scale(1, 1, 1)
+		# Set size
+		self.update_size()
+		# Bindings for the drawing functionality
+		self.bind(on_touch_down = self.on_down)
+		self.bind(on_touch_move = self.on_move)
+		self.bind(on_touch_up = self.on_up)
+		# Tracking if a mouse key is held down:
+		self.leftHold = self.rightHold = self.removingTiles = False
+		# Initially, no sprite is selected to paint with.
+		self.selectedPaint = None
+		# How a click paints: 'brush' paints the tile clicked, or the rectangle dragged, and 'flood' paints the area around
+		# the tile clicked that holds the same sprite on the current layer.
+		self.paintMode = 'brush'
+		# Initially, no tiles are selected.
+		self.selection = Selection(iCount, jCount)
+		# Initially, no tiles are being previewed for change either. The preview is the rectangle [i0, i1, j0, j1] being dragged.
+		self.previewRect = None
+		# While rangeMode is on, clicking a tile shows the tiles a unit standing on it could move to, spending at most
+		# rangeBudget by the movement of rangeKind.
+		self.rangeMode = False
+		self.rangeBudget = 6
+		self.rangeKind = WALKING
+		# While showTriggers is on, the tiles of the current story holding a trigger are marked. Only those in view are
+		# drawn, looked up in the spatial index of the triggers, and drawn again when the view or the triggers change.
+		self.showTriggers = False
+		self.drawnTriggers = None
+		# The range, the triggers, the selection and the preview are drawn on top of the map:
+		self.rangeGroup = InstructionGroup()
+		self.triggerGroup = InstructionGroup()
+		self.selectionGroup = InstructionGroup()
+		self.previewGroup = InstructionGroup()
+		self.canvas.after.add(Color(0.2, 0.5, 0.9, 0.5))
+		self.canvas.after.add(self.rangeGroup)
+		self.canvas.after.add(Color(0.9, 0.4, 0.1, 0.6))
+		self.canvas.after.add(self.triggerGroup)
+		self.canvas.after.add(Color(0.8, 0.8, 0, 0.75))
+		self.canvas.after.add(self.selectionGroup)
+		self.canvas.after.add(self.previewGroup)
+		self.canvas.after.add(PopMatrix())
+		# Initial position:
+		self.initialPosition = []
+		# Current story
+		self.currentStory = 0
+		# Current layer
+		self.currentLayer = 0
+		# Keyboard listener:
+		self.keyboard = keyboard
+		# Get coefficients for i-j coordinates:
+		self.get_coefficients()
+		# Built chunks, kept under a memory budget in bytes. Only chunks in view are built and drawn.
+		self.chunkCache = ChunkCache(budget = chunkBudget, onEvict = self.unbuild_chunk)
+		self.visibleChunks = []
+		# Tiles outside the viewport are not drawn. cullMargin tiles around it are drawn too, so that they are ready as they scroll into view.
+		self.cullMargin = cullMargin
+		# Redraw the tiles changed since the last frame, at most once per frame.
+		self.dirtyTrigger = Clock.create_trigger(self.flush_dirty)
+		# Look for new chunks in view whenever the canvas is scrolled, at most once per frame.
+		self.visibleTrigger = Clock.create_trigger(self.update_visible)
+		# At most chunksPerFrame chunks are built per frame, nearest to the middle of the view first, so that the editor
+		# stays responsive while a large map fills in. None builds every chunk in view at once.
+		self.chunksPerFrame = chunksPerFrame
+		self.buildTrigger = Clock.create_trigger(self.update_visible)
+		self.bind(parent = self.on_parent_change)
+		# Undo history of the map, as deltas of the changes made to it.
+		self.history = History()
+		self.historyMap = self.mapFile
+		# The layers not being edited are drawn from Fbos, rendered again only when they change. See layercache.py.
+		self.cacheLayers = cacheLayers
+		self.layerCache = LayerCache(margin = layerCacheMargin)
+		# Advances the animated sprites of the chunks in view. See animation.py.
+		self.animator = Animator()
+		# Textures and texture coordinates of the sprites of the map, made anew for every map. See meshes.py.
+		self.spriteCache = None
+		# Set up the chunk groups:
+		self.clear_lists()
+		self.populate_lists()
+		# Render the map
+		self.render_map()
+		
+		
+	@timed("canvas.set_map")
+	def set_map(self, mapFile, story = 0):
+		# Shows another map, sized from its own data.
+		self.mapFile = mapFile
+		self.loadingSize = None
+		self.currentStory = story
+		self.iCount = mapFile.stories[0].iCount
+		self.jCount = mapFile.stories[0].jCount
+		self.update_size()
+		self.clear_lists()
+		self.populate_lists()
+		self.render_map()
+		self.draw_selection()
+		self.draw_range(None)
+
+	def update_size(self):
+		# Offset for size	
+		self.offset = [50, 50]
+		# Width in classical coordinates, minimum being iCount * tileWidth, zoomed
+		self.width = ((self.iCount + self.jCount) * self.tileWidth / 2 + 2 * self.offset[0]) * self.zoomFactor
+		# Height in classical coordinates, minimum being jCount * tileHeight, zoomed
+		storyCount = self.loadingSize[2] if self.loadingSize != None else len(self.mapFile.stories)
+		self.height = ((self.iCount + self.jCount) * self.tileHeight / 2 + 2 * self.offset[1] + storyCount * 3 * self.tileHeight) * self.zoomFactor
+		if self.parent != None:
+			if self.parent.width > self.width:
+				log.debug("Widening the canvas to its parent, %s px", self.parent.width)
+				self.width += (self.parent.width - self.width) / 2
+			if self.parent.height > self.height:
+				self.height += (self.parent.height - self.height) / 2 
+		self.get_coefficients()
+		
+	def size_for_load(self, iCount, jCount, storyCount):
+		# Sizes the canvas and the projection for a map whose header has been read, so that the view is laid out before
+		# its tiles arrive. The map shown so far, and its history, are kept but no longer drawn, and nothing is built
+		# until end_load shows either the map loaded or, if loading failed, this one again.
+		self.loadingSize = [iCount, jCount, storyCount]
+		self.iCount = iCount
+		self.jCount = jCount
+		self.update_size()
+		self.chunkCache.clear()
+		self.visibleChunks = []
+		self.animator.clear()
+		self.layerCache.clear()
+		self.clear_before()
+		for group in [self.rangeGroup, self.triggerGroup, self.selectionGroup, self.previewGroup]:
+			group.clear()
+		self.drawnTriggers = None
+
+	def end_load(self, mapFile = None):
+		# Shows the map loaded, or with None the map shown before loading started, on the story it was shown on.
+		if mapFile == None:
+			self.set_map(self.mapFile, self.currentStory)
+		else:
+			self.set_map(mapFile)
+
+	@timed("canvas.set_zoom")
+	def set_zoom(self, factor, anchor = None):
+		# Zooms to factor, keeping the point anchor = (x, y) of the canvas, the middle of the view by default, where it is
+		# on screen. Nothing is built again, apart from the chunks coming into view.
+		factor = min(MAX_ZOOM, max(MIN_ZOOM, factor))
+		if factor == self.zoomFactor:
+			return
+		x0, y0, x1, y1 = self.get_view_rect()
+		if anchor == None:
+			anchor = [(x0 + x1) / 2, (y0 + y1) / 2]
+		# The anchor in map coordinates, and its place in the view:
+		mapX, mapY = anchor[0] / self.zoomFactor, anchor[1] / self.zoomFactor
+		viewX, viewY = anchor[0] - x0, anchor[1] - y0
+		self.zoomFactor = factor
+		self.zoomScale.xyz = (factor, factor, 1)
+		self.update_size()
+		scroller = self.parent
+		if scroller != None and hasattr(scroller, 'scroll_x'):
+			if self.width > scroller.width:
+				scroller.scroll_x = min(1, max(0, (mapX * factor - viewX) / (self.width - scroller.width)))
+			if self.height > scroller.height:
+				scroller.scroll_y = min(1, max(0, (mapY * factor - viewY) / (self.height - scroller.height)))
+		self.populate_lists()
+
+	def on_wheel(self, scroller, touch, *args):
+		# The mouse wheel zooms around the pointer while ctrl is held, and scrolls otherwise.
+		if not touch.is_mouse_scrolling or self.keyboard == None or not self.ctrl_held() or not scroller.collide_point(*touch.pos):
+			return False
+		# Kivy calls turning the wheel away from oneself scrolling down.
+		if touch.button in ('scrolldown', 'scrollup'):
+			self.set_zoom(self.zoomFactor * (ZOOM_STEP if touch.button == 'scrolldown' else 1 / ZOOM_STEP), anchor = scroller.to_local(*touch.pos))
+		return True
+
+	def clear_before(self):
+		# Empties canvas.before, apart from the zoom, which the end of canvas.after takes back off.
+		self.canvas.before.clear()
+		self.canvas.before.add(PushMatrix())
+		self.canvas.before.add(self.zoomScale)
+
+	@timed("canvas.clear_lists")
+	def clear_lists(self):
+		self.clear_before()
+		# A map of another size needs a new selection.
+		if self.selection.mask.shape != (self.iCount, self.jCount):
+			self.selection = Selection(self.iCount, self.jCount)
+			self.previewRect = None
+			self.draw_selection()
+		# Another map starts a history of its own.
+		if self.historyMap is not self.mapFile:
+			self.history.clear()
+			self.historyMap = self.mapFile
+		# Instead of a renderList entry per tile of the whole map, each story and layer has a group holding the
+		# instructions of the chunks in view, and each chunk is only built once it comes into view.
+		self.chunkCache.clear()
+		self.visibleChunks = []
+		if self.spriteCache != None:
+			self.spriteCache.clear()
+		self.spriteCache = SpriteCache(self.mapFile.spriteTable)
+		self.gridFill = InstructionGroup()
+		self.gridLines = InstructionGroup()
+		self.gridFillColor = Color(0.8, 0.8, 0.8, 1)
+		self.gridLineColor = Color(1, 1, 1, 1)
+		self.dirtyTiles = set()
+		self.dirtyLayers = set()
+		self.layerColors = [ [ Color(1, 1, 1, 1) for l in range(self.mapFile.layerCount)] for s in range(self.mapFile.storyCount)]
+		self.layerGroups = [ [ InstructionGroup() for l in range(self.mapFile.layerCount)] for s in range(self.mapFile.storyCount)]
+		# What each layer is drawn with: its tint, then either its group or the quad of its Fbo.
+		self.layerCache.clear()
+		self.layerViews = [ [ InstructionGroup() for l in range(self.mapFile.layerCount)] for s in range(self.mapFile.storyCount)]
+		self.animator.clear()
+
+	def on_parent_change(self, instance, parent):
+		if parent != None and hasattr(parent, 'scroll_x'):
+			parent.bind(scroll_x = self.visibleTrigger, scroll_y = self.visibleTrigger, size = self.visibleTrigger)
+			parent.bind(on_scroll_start = self.on_wheel)
+
+	def get_view_rect(self):
+		# Returns [x0, y0, x1, y1], the part of the canvas shown by the ScrollView holding it, in pixels.
+		scroller = self.parent
+		if scroller == None or not hasattr(scroller, 'scroll_x'):
+			return [0, 0, self.width, self.height]
+		x0 = scroller.scroll_x * max(0, self.width - scroller.width)
+		y0 = scroller.scroll_y * max(0, self.height - scroller.height)
+		return [x0, y0, x0 + scroller.width, y0 + scroller.height]
+
+	def get_viewport(self):
+		# Returns the part of the canvas in view in map coordinates, in which everything is built.
+		return [v / self.zoomFactor for v in self.get_view_rect()]
+
+	def get_visible_range(self, s):
+		# Returns [i0, i1, j0, j1], the range of tiles of story s in view, plus cullMargin tiles on every side.
+		return self.projection.visible_range(self.get_viewport(), self.iCount, self.jCount, s, self.cullMargin)
+
+	def get_visible_chunks(self):
+		# Returns the keys (story, ci, cj) of the chunks holding tiles in view, in drawing order.
+		x0, y0, x1, y1 = self.get_viewport()
+		chunkSize = self.mapFile.chunkSize
+		visible = []
+		for s in range(self.currentStory + 1):
+			i0, i1, j0, j1 = self.get_visible_range(s)
+			if i0 >= i1 or j0 >= j1:
+				continue
+			# Chunks are drawn back to front, the same order in which tiles are drawn inside a chunk.
+			for ci in reversed(range(i0 // chunkSize, (i1 - 1) // chunkSize + 1)):
+				for cj in reversed(range(j0 // chunkSize, (j1 - 1) // chunkSize + 1)):
+					# The (i, j) range is a rectangle, while the viewport cuts a diamond out of it,
+					# so the chunks in the corners of the range are checked against the viewport as well.
+					left, bottom, right, top = self.projection.screen_bounds(*chunk_bounds(ci, cj, self.iCount, self.jCount, chunkSize), s = s)
+					if right >= x0 and left <= x1 and top >= y0 and bottom <= y1:
+						visible.append((s, ci, cj))
+		return visible
+
+	def update_visible(self, *args):
+		self.populate_lists()
+	
+	def get_coefficients(self):
+		self.ratio = self.tileHeight / self.tileWidth
+		# For i:
+		self.iCoeffMin = self.offset[1] + self.ratio * (self.offset[0] + self.jCount * self.tileWidth / 2)
+		self.iCoeffMax = self.offset[1] + (self.jCount + self.iCount) * self.tileHeight / 2 + self.ratio * (self.offset[0] + self.iCount * self.tileWidth / 2)
+		self.iCoeffSR = (self.iCoeffMax - self.iCoeffMin) / self.iCount
+		# For j:
+		self.jCoeffMin = self.offset[1] - self.ratio * (self.offset[0] + self.jCount * self.tileWidth / 2)
+		self.jCoeffMax =  self.offset[1] + (self.jCount + self.iCount) * self.tileHeight / 2 - self.ratio * (self.offset[0] + self.iCount * self.tileWidth / 2)
+		self.jCoeffSR = (self.jCoeffMax - self.jCoeffMin) / self.jCount	
+		# The projection does the same conversions for whole arrays of tiles, and is used for all drawing and hit-testing.
+		self.projection = Projection(tileWidth = self.tileWidth, tileHeight = self.tileHeight, offset = self.offset, jCount = self.jCount)
+		
+	def get_coordinates(self, x, y, s = 0):
+		# (x, y) is a position on the zoomed canvas, such as that of a touch.
+		i, j = self.projection.to_tile(x / self.zoomFactor, y / self.zoomFactor, s)
+		return [int(i), int(j)]
+		
+	def ctrl_held(self):
+		return 'lctrl' in self.keyboard.pressedKeys or 'rctrl' in self.keyboard.pressedKeys
+
+	@timed("canvas.on_down")
+	def on_down(self, parent, touch):
+		# Function for handling what happens when one clicks anywhere on the map, with the left or right mouse button.
+		# Nothing can be changed while a map is loading.
+		if self.disabled: return
+		# Left mouse button being pressed:		
+		if 'left' in touch.button:
+			if self.leftHold == True: return # To filter out undesired second click-registering:
+			else:
+				self.leftHold = True
+				# Everything painted until the button is released is undone as one step.
+				self.history.begin()
+				coords = self.get_coordinates(touch.pos[0], touch.pos[1], self.currentStory)
+				i = coords[0]
+				j = coords[1]	
+				# Check if (i, j) is within the map area:
+				if i <= self.iCount - 1 and j <= self.jCount - 1 and i > - 1 and j > - 1:
+					# Register the initial touch-down coordinates.
+					self.initialPosition = [i, j]
+					if self.rangeMode:
+						self.show_range(i, j)
+					# If there is no paint selected, the tile is selected.
+					elif self.selectedPaint == None:
+						# No ctrl is held down, meaning a new selection should be made.
+						if not self.ctrl_held():
+							self.selection.clear()
+						# Otherwise, ctrl is held down. Starting on an already selected tile removes from the selection,
+						# and starting anywhere else adds to it.
+						elif (i, j) in self.selection:
+							self.removingTiles = True
+						self.previewRect = rect_between(self.initialPosition, self.initialPosition)
+						self.draw_selection()
+					elif self.paintMode == 'flood':
+						self.flood_fill(i, j)
+					else:
+						# The tile is painted at once, and the rectangle dragged from it is painted when the button is released.
+						self.set_graphics(graphics = self.selectedPaint, i = i, j = j, layer = self.currentLayer)
+						self.previewRect = rect_between(self.initialPosition, self.initialPosition)
+						self.draw_preview()
+		# Right mouse button being pressed:
+		elif 'right' in touch.button:
+			if self.rightHold == True: return #Used to filter out undesired second click-registering.
+			else:
+				# Register that the right mouse button is being held.
+				self.rightHold = True
+				if self.selectedPaint == None:
+					# Check if left is held. Then merely cancel whatever left is doing, leaving the selection as it was.
+					if self.leftHold == True:
+						self.previewRect = None
+					# Conditions for what to happen if left is not being pressed shall go below here once implimented.
+					elif self.leftHold == False:
+						self.selection.clear()
+					self.draw_selection()
+				else:
+					# Dropping the paint also cancels a rectangle being dragged.
+					self.selectedPaint = None
+					self.previewRect = None
+					self.draw_preview()
+					self.clear_palette_selection()
+					
+	def clear_palette_selection(self):
+		if self.palettes != None or len(self.palettes) != 0:
+			for k in range(len(self.palettes)):
+				self.palettes[k].canvas.after.clear()
+						
+	@timed("canvas.on_move")
+	def on_move(self, parent, touch):
+		# Left mouse button is being held:
+		if self.leftHold == True and self.rightHold != True:
+			# Convert classical (x,y)-coordinates to isometric (i,j)-coordinates:
+			coords = self.get_coordinates(touch.pos[0], touch.pos[1], self.currentStory)
+			if self.initialPosition == []:
+				return
+			# The dragged square is a single rectangle, and only its quad is redrawn as it changes.
+			# Whether it selects or paints is decided when the button is released.
+			if self.previewRect != None:
+				self.previewRect = rect_between(self.initialPosition, coords)
+				self.draw_preview()
+		
+	@timed("canvas.on_up")
+	def on_up(self, parent, touch):
+		if 'left' in touch.button:
+			self.leftHold = False
+			# Confirm previews.
+			if self.previewRect != None:
+				if self.selectedPaint != None:
+					self.fill_rect(self.previewRect)
+				elif self.removingTiles == False:
+					self.selection.add_rect(self.previewRect)
+				else:
+					self.selection.remove_rect(self.previewRect)
+			self.previewRect = None
+			self.draw_selection()
+			self.history.end()
+
+		elif 'right' in touch.button:
+			self.rightHold = False		
+		
+		self.removingTiles = False
+		self.initialPosition = []
+
+	@timed("canvas.draw_selection")
+	def draw_selection(self):
+		# Draws the selection, one quad per rectangle of it, in as few Meshes as possible.
+		self.selectionGroup.clear()
+		rects = self.selection.get_rects()
+		for n in range(0, len(rects), MAX_QUADS):
+			batch = rects[n:n + MAX_QUADS]
+			vertices = self.projection.rect_vertices(batch, self.currentStory)
+			self.selectionGroup.add(Mesh(vertices = vertices.ravel().tolist(), indices = quad_indices(len(batch)), mode = 'triangles'))
+		self.draw_preview()
+
+	@timed("canvas.draw_preview")
+	def draw_preview(self):
+		# Draws the square being dragged, tinted red when it removes from the selection.
+		self.previewGroup.clear()
+		if self.previewRect != None:
+			rect = self.selection.clip(self.previewRect)
+			if self.removingTiles == True:
+				self.previewGroup.add(Color(0.8, 0.2, 0, 0.75))
+			else:
+				self.previewGroup.add(Color(0.8, 0.8, 0, 0.75))
+			vertices = self.projection.rect_vertices([rect], self.currentStory)
+			self.previewGroup.add(Mesh(vertices = vertices.ravel().tolist(), indices = quad_indices(1), mode = 'triangles'))
+
+	@timed("canvas.show_range")
+	def show_range(self, i, j):
+		# The map is read anew for every range shown, so that it is up to date with whatever was edited.
+		grid = PathGrid(self.mapFile, self.rangeKind, transitions = transitions_from_triggers(self.mapFile))
+		self.draw_range(grid.reachable((self.currentStory, i, j), self.rangeBudget))
+
+	def draw_range(self, reach):
+		# Draws the tiles of a Reach that can be stopped on, on whichever story they are, or nothing if reach is None.
+		self.rangeGroup.clear()
+		if reach == None:
+			return
+		tiles = numpy.array(reach.tiles(), dtype = numpy.int64).reshape(-1, 3)
+		for s in numpy.unique(tiles[:, 0]).tolist():
+			onStory = tiles[tiles[:, 0] == s]
+			for n in range(0, len(onStory), MAX_QUADS):
+				batch = onStory[n:n + MAX_QUADS]
+				vertices = self.projection.diamond_vertices(batch[:, 1], batch[:, 2], s)
+				self.rangeGroup.add(Mesh(vertices = vertices.ravel().tolist(), indices = quad_indices(len(batch)), mode = 'triangles'))
+
+	@timed("canvas.draw_triggers")
+	def draw_triggers(self):
+		if not self.showTriggers:
+			self.triggerGroup.clear()
+			self.drawnTriggers = None
+			return
+		triggers = self.mapFile.stories[self.currentStory].triggers
+		rect = self.get_visible_range(self.currentStory)
+		drawn = [id(triggers), triggers.version, self.currentStory, list(rect)]
+		if drawn == self.drawnTriggers:
+			return
+		self.drawnTriggers = drawn
+		self.triggerGroup.clear()
+		tiles = numpy.array([key for key, trigger in triggers.items_in(rect)], dtype = numpy.int64).reshape(-1, 2)
+		for n in range(0, len(tiles), MAX_QUADS):
+			batch = tiles[n:n + MAX_QUADS]
+			vertices = self.projection.diamond_vertices(batch[:, 0], batch[:, 1], self.currentStory)
+			self.triggerGroup.add(Mesh(vertices = vertices.ravel().tolist(), indices = quad_indices(len(batch)), mode = 'triangles'))
+
+	def set_graphics(self, graphics, i, j, layer):
+		# Painting with [None] erases the tile.
+		self.set_sprite(self.mapFile.spriteTable.intern(graphics), i, j, layer)
+
+	def set_sprite(self, sprite, i, j, layer):
+		# Paints the sprite with index sprite in the sprite table, 0 being no sprite.
+		tile = self.mapFile.stories[self.currentStory].matrix[int(i)][int(j)]
+		old = tile.get_sprite_id(layer)
+		if old == sprite:
+			return
+		tile.set_sprite_id(layer, sprite)
+		self.history.record(PaintDelta(self.currentStory, layer, [int(i) * self.jCount + int(j)], [old], sprite, self.jCount))
+		self.mark_dirty(self.currentStory, layer, int(i), int(j))
+
+	def get_paint_sprite(self):
+		# Returns the index of the selected paint in the sprite table, or None if nothing is selected.
+		if self.selectedPaint == None:
+			return None
+		return self.mapFile.spriteTable.intern(self.selectedPaint)
+
+	# Bulk painting:
+	# Every fill changes the sprite plane of the current layer in one pass in the MapFile, and the tiles that changed are
+	# then redrawn together by the next flush_dirty.
+	@timed("canvas.fill_selection")
+	def fill_selection(self):
+		# Paints the selected paint on every selected tile of the current layer.
+		sprite = self.get_paint_sprite()
+		if sprite == None or self.selection.is_empty():
+			return
+		self.record_fill(sprite, *self.mapFile.fill(self.currentStory, self.currentLayer, self.selection.mask, sprite))
+
+	@timed("canvas.fill_rect")
+	def fill_rect(self, rect):
+		# Paints the selected paint on the rectangle of tiles [i0, i1, j0, j1] of the current layer.
+		sprite = self.get_paint_sprite()
+		if sprite == None:
+			return
+		self.record_fill(sprite, *self.mapFile.fill_rect(self.currentStory, self.currentLayer, rect, sprite))
+
+	@timed("canvas.flood_fill")
+	def flood_fill(self, i, j):
+		# Paints the selected paint on the tiles connected to (i, j) that hold the same sprite on the current layer.
+		# Starting inside the selection keeps the fill inside it.
+		sprite = self.get_paint_sprite()
+		if sprite == None:
+			return
+		mask = self.selection.mask if (i, j) in self.selection else None
+		self.record_fill(sprite, *self.mapFile.flood_fill(self.currentStory, self.currentLayer, i, j, sprite, mask))
+
+	def record_fill(self, sprite, i, j, old):
+		# Records the tiles (i, j) painted over with sprite on the current layer, and has them redrawn.
+		if len(i) == 0:
+			return
+		self.history.record(PaintDelta(self.currentStory, self.currentLayer, i * self.jCount + j, old, sprite, self.jCount))
+		self.mark_dirty_tiles(self.currentStory, self.currentLayer, i, j)
+
+	# Changes to the whole map:
+	def swap_stories(self, story1, story2):
+		if story1 == story2:
+			return
+		self.mapFile.swap_stories(story1, story2)
+		self.history.record(SwapDelta(story1, story2))
+		self.refresh_stories([story1, story2])
+
+	def resize_map(self, i, j):
+		# Crops or extends the map to i x j tiles.
+		delta = ResizeDelta(self.mapFile, i, j)
+		self.mapFile.resize(i, j)
+		self.history.record(delta)
+		self.refresh_size()
+
+	def refresh_stories(self, stories):
+		# Throws away the built chunks of some stories, so that the chunks in view are built again from their new data.
+		for key in self.chunkCache.keys():
+			if key[0] in stories:
+				self.unbuild_chunk(key, self.chunkCache.remove(key))
+		self.populate_lists()
+
+	def refresh_size(self):
+		# Takes over the size of the map file, which moves every tile on screen, so everything is built again.
+		self.iCount = self.mapFile.stories[0].iCount
+		self.jCount = self.mapFile.stories[0].jCount
+		self.update_size()
+		self.clear_lists()
+		self.populate_lists()
+		self.render_map()
+		self.draw_selection()
+		self.draw_range(None)
+
+	# Undo and redo:
+	# Undone paints are redrawn through mark_dirty_tiles, like the paints themselves.
+	@timed("canvas.undo")
+	def undo(self):
+		if self.leftHold == False and self.loadingSize == None:
+			self.apply_deltas(self.history.undo(self.mapFile))
+
+	@timed("canvas.redo")
+	def redo(self):
+		if self.leftHold == False and self.loadingSize == None:
+			self.apply_deltas(self.history.redo(self.mapFile))
+
+	def apply_deltas(self, deltas):
+		for delta in deltas:
+			if delta.kind == 'paint':
+				i, j = delta.get_tiles()
+				self.mark_dirty_tiles(delta.story, delta.layer, i, j)
+			elif delta.kind == 'swap':
+				self.refresh_stories([delta.story1, delta.story2])
+			elif delta.kind == 'resize':
+				self.refresh_size()
+
+	def mark_dirty_tiles(self, s, l, i, j):
+		# Registers the tiles (i, j), given as arrays, whose sprites changed in one go. Patching them one by one would cost
+		# more than rebuilding, so the layer of every chunk they lie in is rebuilt instead, once, by flush_dirty.
+		if len(i) == 0:
+			return
+		chunkSize = self.mapFile.chunkSize
+		chunks = numpy.unique(numpy.stack([numpy.asarray(i) // chunkSize, numpy.asarray(j) // chunkSize], axis = 1), axis = 0)
+		for ci, cj in chunks.tolist():
+			self.dirtyLayers.add((s, ci, cj, l))
+		self.mapFile.mark_changed(s)
+		self.dirtyTrigger()
+
+	def mark_dirty(self, s, l, i, j):
+		# Registers a tile whose sprite changed. Dirty tiles are redrawn together once per frame by flush_dirty,
+		# and nothing else on the canvas is touched.
+		self.dirtyTiles.add((s, l, i, j))
+		self.mapFile.mark_changed(s)
+		self.dirtyTrigger()
+
+	@timed("canvas.flush_dirty")
+	def flush_dirty(self, *args):
+		# Sorts the dirty tiles by chunk and layer, and updates only the Meshes of those.
+		chunkSize = self.mapFile.chunkSize
+		batches = {}
+		for s, l, i, j in self.dirtyTiles:
+			# Tiles in a layer that is rebuilt anyway need no patching.
+			if not (s, i // chunkSize, j // chunkSize, l) in self.dirtyLayers:
+				batches.setdefault((s, i // chunkSize, j // chunkSize, l), []).append((i, j))
+		self.dirtyTiles = set()
+		changed = set()
+		for s, ci, cj, l in self.dirtyLayers:
+			meshes = self.chunkCache.peek((s, ci, cj))
+			if meshes != None:
+				meshes.build_layer(self.mapFile.get_chunk(s, ci, cj), l, self.spriteCache, self.projection)
+				changed.add((s, ci, cj))
+		self.dirtyLayers = set()
+		for (s, ci, cj, l), tiles in batches.items():
+			meshes = self.chunkCache.peek((s, ci, cj))
+			# Chunks that are not built pick up the changes whenever they are.
+			if meshes != None:
+				meshes.update_tiles(self.mapFile.get_chunk(s, ci, cj), l, tiles, self.spriteCache, self.projection)
+				changed.add((s, ci, cj))
+		# Rebuilt layers have new runs, which may hold animated sprites.
+		for key in changed:
+			self.animator.add_chunk(key, self.chunkCache.peek(key))
+		# Layers of chunks that were empty before are not in the layer groups yet.
+		self.order_chunks()
+		self.update_layer_views()
+
+	@timed("canvas.populate_lists")
+	def populate_lists(self, *args):
+		# Builds the chunks that came into view, and pushes out the least recently used ones when over budget.
+		if self.loadingSize != None:
+			return
+		visible = self.get_visible_chunks()
+		missing = [key for key in visible if self.chunkCache.peek(key) == None]
+		if self.chunksPerFrame != None and len(missing) > self.chunksPerFrame:
+			missing.sort(key = self.get_chunk_distance)
+			missing = missing[:self.chunksPerFrame]
+			# The rest is built on the next frames.
+			self.buildTrigger()
+		# Only the chunks found built, and those built now, count towards the hit rate of the cache. Other lookups, like
+		# the ones above and those made for drawing, use peek.
+		for key in visible:
+			if self.chunkCache.peek(key) != None:
+				self.chunkCache.get(key)
+		for key in missing:
+			self.chunkCache.get(key)
+			self.build_chunk(key)
+		self.visibleChunks = visible
+		self.animator.set_visible(visible)
+		self.order_chunks()
+		self.update_layer_views()
+		self.draw_triggers()
+		self.chunkCache.evict(keep = set(visible))
+
+	def get_chunk_distance(self, key):
+		# Returns the squared distance on screen from the middle of the viewport to the middle of a chunk.
+		x0, y0, x1, y1 = self.get_viewport()
+		left, bottom, right, top = self.projection.screen_bounds(*chunk_bounds(key[1], key[2], self.iCount, self.jCount, self.mapFile.chunkSize), s = key[0], spriteHeight = 0)
+		return ((left + right - x0 - x1) / 2) ** 2 + ((bottom + top - y0 - y1) / 2) ** 2
+
+	@timed("canvas.build_chunk")
+	def build_chunk(self, key):
+		s, ci, cj = key
+		chunk = self.mapFile.get_chunk(s, ci, cj)
+		meshes = ChunkMeshes(key, self.mapFile.layerCount)
+		# The grid is only drawn for the current story.
+		if s == self.currentStory:
+			meshes.build_grid(chunk, self.projection)
+		if not chunk.is_empty():
+			for l in range(self.mapFile.layerCount):
+				meshes.build_layer(chunk, l, self.spriteCache, self.projection)
+		self.animator.add_chunk(key, meshes)
+		self.chunkCache.put(key, meshes, (meshes.instruction_count() + len(meshes.groups)) * INSTRUCTION_BYTES)
+		return meshes
+
+	def unbuild_chunk(self, key, meshes):
+		# Takes the instructions of a chunk off the canvas.
+		self.animator.remove_chunk(key)
+		for l in range(len(meshes.groups)):
+			if meshes.groups[l] in self.layerGroups[key[0]][l].children:
+				self.layerGroups[key[0]][l].remove(meshes.groups[l])
+		if meshes.fill in self.gridFill.children:
+			self.gridFill.remove(meshes.fill)
+			self.gridLines.remove(meshes.lines)
+
+	@timed("canvas.order_chunks")
+	def order_chunks(self):
+		# Fills the grid and layer groups with the chunks in view, in drawing order. Groups already holding the right
+		# chunks are left alone, so that the layers cached in Fbos are not rendered again.
+		fills = []
+		lines = []
+		layers = [ [ [] for l in range(len(self.layerGroups[s]))] for s in range(len(self.layerGroups))]
+		for key in self.visibleChunks:
+			meshes = self.chunkCache.peek(key)
+			# Chunks not built yet are added once they are.
+			if meshes == None:
+				continue
+			if meshes.fill != None:
+				fills.append(meshes.fill)
+				lines.append(meshes.lines)
+			for l in range(len(meshes.groups)):
+				# Empty layers are left out, so that a layer without sprites in view is neither drawn nor cached.
+				if len(meshes.runs[l]) != 0:
+					layers[key[0]][l].append(meshes.groups[l])
+		set_children(self.gridFill, fills)
+		set_children(self.gridLines, lines)
+		for s in range(len(self.layerGroups)):
+			for l in range(len(self.layerGroups[s])):
+				set_children(self.layerGroups[s][l], layers[s][l])
+
+	@timed("canvas.update_layer_views")
+	def update_layer_views(self):
+		# Draws the layer being edited, layers without sprites in view and layers with animated sprites in view from their
+		# groups, and every other layer of the stories shown from the layer cache.
+		useCache = self.cacheLayers and self.layerCache.fit(self.get_view_rect(), self.width, self.height, self.zoomFactor)
+		animated = self.animator.get_animated_layers()
+		for s in range(len(self.layerGroups)):
+			for l in range(len(self.layerGroups[s])):
+				key = (s, l)
+				cached = useCache and s <= self.currentStory and key != (self.currentStory, self.currentLayer) and len(self.layerGroups[s][l].children) != 0 and not key in animated
+				if cached == (key in self.layerCache) and len(self.layerViews[s][l].children) != 0:
+					continue
+				view = self.layerViews[s][l]
+				view.clear()
+				self.layerCache.release(key)
+				if cached:
+					for instruction in self.layerCache.cache(key, self.layerGroups[s][l], self.layerColors[s][l].rgba):
+						view.add(instruction)
+				else:
+					view.add(self.layerColors[s][l])
+					view.add(self.layerGroups[s][l])
+		self.layerCache.trim()
+
+	def get_draw_counts(self):
+		# Returns [instructions, sprites] of the chunks in view, for the profiling overlay.
+		instructions = sprites = 0
+		for key in self.visibleChunks:
+			meshes = self.chunkCache.peek(key)
+			if meshes != None:
+				instructions += meshes.instruction_count()
+				sprites += sum(len(run.tiles) for runs in meshes.runs for run in runs)
+		return [instructions, sprites]
+
+	def set_layer(self, layer):
+		# Switching layers only changes the tint of the grid and of the layers. The layer left is cached and rendered
+		# once, the layer switched to is drawn directly again, and no other tiles are redrawn.
+		self.currentLayer = layer
+		self.update_colors()
+		self.update_layer_views()
+
+	def update_colors(self):
+		if self.currentLayer == 0:
+			self.gridFillColor.rgba = (0.8, 0.8, 0.8, 1)
+			self.gridLineColor.rgba = (1, 1, 1, 1)
+		else:
+			self.gridFillColor.rgba = (0.3, 0.3, 0.5, 1)
+			self.gridLineColor.rgba = (0.4, 0.4, 1, 1)
+		for s in range(len(self.layerColors)):
+			for l in range(len(self.layerColors[s])):
+				if l == self.currentLayer:
+					self.layerColors[s][l].rgba = (1, 1, 1, 1)
+				elif l < self.currentLayer:
+					self.layerColors[s][l].rgba = (0.5, 0.5, 0.7, 1)
+				elif l > self.currentLayer:
+					self.layerColors[s][l].rgba = (1, 1, 1, 0.2)
+				# Cached layers are tinted by a premultiplied copy of their color.
+				if (s, l) in self.layerCache:
+					self.layerCache.tint((s, l), self.layerColors[s][l].rgba)
+
+	@timed("canvas.render_map")
+	def render_map(self):
+		self.clear_before()
+		self.update_colors()
+		# The grid of the chunks in view, filled first and outlined after:
+		self.canvas.before.add(self.gridFillColor)
+		self.canvas.before.add(self.gridFill)
+		self.canvas.before.add(self.gridLineColor)
+		self.canvas.before.add(self.gridLines)
+
+		for s in range(self.currentStory + 1):
+			for l in range(len(self.layerGroups[s])):
+				self.canvas.before.add(self.layerViews[s][l])
+		self.update_layer_views()
+
+def set_children(group, children):
+	# Refills an InstructionGroup with children, unless it holds exactly those already.
+	if group.children != children:
+		group.clear()
+		for child in children:
+			group.add(child)
\ No newline at end of file
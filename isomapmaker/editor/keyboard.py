@@ -1,10 +1,14 @@
 #Fundamental imports
 from kivy.core.window import Window
+# Elements from subdirectories
+from ..core.profiling import timed
 
 class KeyboardListener():
 	def __init__(self, **kwargs):
 		self._keyboard_open()
 		self.pressedKeys = []
+		# Functions to call when a key is pressed while ctrl is held, by key:
+		self.shortcuts = {}
 		
 	def _keyboard_open(self):
 		# Used to add keyboard functionality. This must be called whenever one loses focus to other text-inputs in the editor. Very important!
@@ -20,11 +24,19 @@ class KeyboardListener():
 		self._keyboard.unbind(on_key_up = self._on_keyboard_up)
 		self._keyboard = None
 		
+	@timed("keyboard.key_down")
 	def _on_keyboard_down(self, *args):
 		# In args, args[1][1] is the key pressed. Add it to the list:
 		if not args[1][1] in self.pressedKeys:
 			self.pressedKeys.append(str(args[1][1]))
+		if str(args[1][1]) in self.shortcuts and ('lctrl' in self.pressedKeys or 'rctrl' in self.pressedKeys):
+			self.shortcuts[str(args[1][1])]()
 	
+	def bind_shortcut(self, key, function):
+		# Calls function whenever key is pressed while ctrl is held down.
+		self.shortcuts[key] = function
+
+	@timed("keyboard.key_up")
 	def _on_keyboard_up(self, *args):
 		# The key pressed lies in args[1][1]
 		self.pressedKeys.remove(str(args[1][1]))
\ No newline at end of file
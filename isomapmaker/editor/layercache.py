@@ -0,0 +1,138 @@
+# Graphics Elements
+from kivy.graphics import Fbo, Rectangle, Color, ClearColor, ClearBuffers, Translate, Scale, Callback
+from kivy.graphics.opengl import glBlendFunc, glBlendFuncSeparate, GL_ONE, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA
+# Elements from subdirectories
+from ..core.profiling import instruments
+
+# Layer cache:
+# Only one layer of one story is edited at a time, yet every layer of every story up to the current one used to be
+# drawn Mesh by Mesh every frame. The layers not being edited are instead rendered into an Fbo each, covering the view
+# plus a margin, and drawn as a single textured quad. Kivy renders an Fbo again only when an instruction inside it
+# changes, so a cached layer is rendered again exactly when one of its chunks is rebuilt, patched, or scrolls in or
+# out of view, and never when another layer is switched to or edited.
+# The tint of a layer is applied to its quad. Sprites of a half transparent layer therefore no longer show through each
+# other where they overlap.
+# Sprite edges are partly transparent where their textures are filtered. Blending them into an Fbo as usual multiplies
+# their color by their alpha once in the Fbo and once more on screen, which darkens the edges. The Fbos are therefore
+# blended into with premultiplied color and their quads drawn as premultiplied, which gives the same pixels as drawing
+# the layer directly.
+# The Fbos hold the view in pixels of the screen, whatever the zoom, so that their quads are drawn one texel per pixel.
+# Zooming renders every cached layer again, once.
+
+# Longest side of an Fbo, in pixels. A larger view, such as a canvas without a ScrollView around it, is not cached.
+MAX_SIZE = 4096
+# Fbos kept for reuse after their layer is drawn directly again, as when switching back and forth between two layers.
+# Making an Fbo costs more than resizing one, so all of them are reused when the canvas is cleared and filled again.
+SPARE_COUNT = 2
+
+class LayerCache():
+	def __init__(self, margin = 128):
+		# margin pixels on every side of the view are rendered too, so that scrolling a little renders nothing again.
+		self.margin = margin
+		# [x0, y0, x1, y1], the part of the canvas the Fbos hold, in pixels of the zoomed canvas, and the zoom:
+		self.region = None
+		self.zoom = 1
+		# [fbo, translate, scale, rectangle, group, color] by (story, layer):
+		self.entries = {}
+		# [fbo, translate, scale] no longer in use, to be reused before new Fbos are made:
+		self.spare = []
+		# Renders of any Fbo, for the profiling overlay:
+		self.renders = 0
+
+	def __contains__(self, key):
+		return key in self.entries
+
+	def __len__(self):
+		return len(self.entries)
+
+	def fit(self, viewport, width, height, zoom = 1):
+		# Makes the region cover the viewport of a canvas of width x height, both in pixels, drawn at zoom, moving the
+		# Fbos if it does not yet. Returns False if the view is too large to be cached.
+		x0, y0, x1, y1 = [max(0, int(viewport[0])), max(0, int(viewport[1])), min(int(width), int(viewport[2]) + 1), min(int(height), int(viewport[3]) + 1)]
+		if self.region != None and zoom == self.zoom and x0 >= self.region[0] and y0 >= self.region[1] and x1 <= self.region[2] and y1 <= self.region[3]:
+			return True
+		region = [max(0, x0 - self.margin), max(0, y0 - self.margin), min(int(width), x1 + self.margin), min(int(height), y1 + self.margin)]
+		if region[2] - region[0] > MAX_SIZE or region[3] - region[1] > MAX_SIZE or region[2] <= region[0] or region[3] <= region[1]:
+			return False
+		self.region = region
+		self.zoom = zoom
+		for entry in self.entries.values():
+			self.place(entry)
+		return True
+
+	def place(self, entry):
+		# Moves an Fbo and its quad to the region. Resizing an Fbo gives it a new texture.
+		fbo, translate, scale, rectangle = entry[:4]
+		x0, y0, x1, y1 = self.region
+		if list(fbo.size) != [x1 - x0, y1 - y0]:
+			fbo.size = (x1 - x0, y1 - y0)
+		if list(translate.xy) != [-x0, -y0]:
+			translate.xy = (-x0, -y0)
+		if scale.x != self.zoom:
+			scale.xyz = (self.zoom, self.zoom, 1)
+		# The quad is drawn in the coordinates of the map, under the zoom of the canvas.
+		rectangle.pos = (x0 / self.zoom, y0 / self.zoom)
+		rectangle.size = ((x1 - x0) / self.zoom, (y1 - y0) / self.zoom)
+		rectangle.texture = fbo.texture
+
+	def count_render(self, instruction):
+		self.renders += 1
+		instruments.count("layers rendered")
+
+	def cache(self, key, group, rgba):
+		# Moves the instructions in group into an Fbo, and returns the instructions drawing it: the Fbo, which renders
+		# group whenever it changed, and the quad showing it tinted by rgba. The region must have been fitted.
+		x0, y0, x1, y1 = self.region
+		if len(self.spare) != 0:
+			fbo, translate, scale = self.spare.pop()
+		else:
+			fbo = Fbo(size = (x1 - x0, y1 - y0))
+			translate = Translate(-x0, -y0)
+			scale = Scale(self.zoom, self.zoom, 1)
+			fbo.add(ClearColor(0, 0, 0, 0))
+			fbo.add(ClearBuffers())
+			fbo.add(Callback(self.count_render))
+			fbo.add(Callback(blend_into_fbo))
+			fbo.add(translate)
+			fbo.add(scale)
+			fbo.add(Callback(blend_default))
+		# The group goes before the last Callback.
+		fbo.insert(6, group)
+		rectangle = Rectangle()
+		color = Color()
+		entry = self.entries[key] = [fbo, translate, scale, rectangle, group, color]
+		self.place(entry)
+		self.tint(key, rgba)
+		return [fbo, Callback(blend_premultiplied), color, rectangle, Callback(blend_default)]
+
+	def tint(self, key, rgba):
+		# Sets the tint of a cached layer, premultiplied like its Fbo.
+		r, g, b, a = rgba
+		self.entries[key][5].rgba = (r * a, g * a, b * a, a)
+
+	def release(self, key):
+		# Takes the instructions of a cached layer back out of its Fbo, which is kept for reuse until trimmed.
+		entry = self.entries.pop(key, None)
+		if entry != None:
+			entry[0].remove(entry[4])
+			self.spare.append(entry[:3])
+
+	def trim(self):
+		# Drops the spare Fbos beyond SPARE_COUNT.
+		del self.spare[SPARE_COUNT:]
+
+	def clear(self):
+		for key in list(self.entries.keys()):
+			self.release(key)
+		self.region = None
+
+def blend_into_fbo(instruction):
+	# Color is stored premultiplied by alpha, and alpha is the coverage of everything drawn.
+	glBlendFuncSeparate(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+
+def blend_premultiplied(instruction):
+	glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+
+def blend_default(instruction):
+	# The blending Kivy draws everything else with.
+	glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
\ No newline at end of file
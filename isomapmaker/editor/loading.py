@@ -0,0 +1,57 @@
+# Fundamental imports
+import threading
+from kivy.clock import Clock
+# Elements from subdirectories
+from ..core import msfformat
+from ..core.profiling import log
+
+# Background loading:
+# The header of a map file is read on the main thread, so that a file that is not a map is turned down straight away,
+# and so that the canvas can be sized for the new map while the current one stays, in case loading fails.
+# The rest of the file is decoded on a worker thread, which for binary maps means mapping or decompressing the sections,
+# and for legacy maps converting the pickled tiles. The canvas then builds the chunks in view over the next frames.
+
+class BackgroundLoader():
+	def __init__(self, onHeader = None, onDone = None, **kwargs):
+		# onHeader(path, header) is called as soon as the header is read, header being None for legacy maps.
+		# onDone(path, mapFile, error) is called on the main thread once the map is decoded, error being None on success.
+		self.onHeader = onHeader
+		self.onDone = onDone
+		self.thread = None
+
+	def is_busy(self):
+		return self.thread != None
+
+	def load(self, path):
+		if self.is_busy():
+			return False
+		header = None
+		try:
+			if msfformat.is_msf(path):
+				header = msfformat.read_header(path)
+		except Exception as e:
+			log.exception("Reading the header of %s failed", path)
+			if self.onDone != None:
+				self.onDone(path, None, e)
+			return False
+		if self.onHeader != None:
+			self.onHeader(path, header)
+		self.thread = threading.Thread(target = self.run, args = (path,), daemon = True)
+		self.thread.start()
+		return True
+
+	def run(self, path):
+		# Runs on the worker thread.
+		mapFile = None
+		error = None
+		try:
+			mapFile = msfformat.load_map(path)
+		except Exception as e:
+			log.exception("Loading %s failed", path)
+			error = e
+		Clock.schedule_once(lambda dt: self.finish(path, mapFile, error))
+
+	def finish(self, path, mapFile, error):
+		self.thread = None
+		if self.onDone != None:
+			self.onDone(path, mapFile, error)
\ No newline at end of file
@@ -0,0 +1,87 @@
+# Fundamental imports
+from kivy.clock import Clock
+from kivy.properties import StringProperty, ObjectProperty
+# UI Elements
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.textinput import TextInput
+from kivy.uix.image import Image
+# Layouts
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+# Graphics Elements
+from kivy.graphics.texture import Texture
+# Elements from subdirectories
+from ..core.catalog import Catalog
+
+class MapEntry(Button):
+	# One row of the map list. Rows are recycled by the RecycleView, which sets these from the entries of its data.
+	file = StringProperty("")
+	browser = ObjectProperty(None, allownone = True)
+
+	def on_press(self):
+		if self.browser != None:
+			self.browser.select(self.file)
+
+class MapBrowser(GridLayout):
+	def __init__(self, directory, keyboard = None, onSelect = None, **kwargs):
+		super(MapBrowser, self).__init__(cols = 2, **kwargs)
+		# Lists the maps of a directory from its catalog, so that opening and searching the list never reads the maps.
+		# onSelect(file) is called when a map is picked from the list.
+		self.catalog = Catalog(directory)
+		self.keyboard = keyboard
+		self.onSelect = onSelect
+		self.selectedFile = None
+		# Left: search field above the list. Only the rows in view exist as widgets, whatever the number of maps.
+		listSide = GridLayout(cols = 1)
+		self.searchInput = TextInput(multiline = False, size_hint = (1, None), height = 28, hint_text = "Search")
+		self.searchInput.bind(text = self.update_list)
+		self.searchInput.bind(focus = self.on_search_focus)
+		self.mapList = RecycleView(viewclass = MapEntry)
+		listLayout = RecycleBoxLayout(orientation = 'vertical', default_size = (None, 30), default_size_hint = (1, None), size_hint_y = None)
+		listLayout.bind(minimum_height = listLayout.setter('height'))
+		self.mapList.add_widget(listLayout)
+		listSide.add_widget(self.searchInput)
+		listSide.add_widget(self.mapList)
+		# Right: thumbnail and details of the selected map.
+		detailSide = GridLayout(cols = 1, size_hint_x = None, width = 160)
+		self.thumbnail = Image(size_hint = (1, None), height = 128, allow_stretch = True)
+		self.detailLabel = Label(text = "", valign = 'top')
+		detailSide.add_widget(self.thumbnail)
+		detailSide.add_widget(self.detailLabel)
+		self.add_widget(listSide)
+		self.add_widget(detailSide)
+		self.entries = {}
+		self.update_list()
+
+	def refresh(self):
+		# Shows the catalog as it is at once, and again once new and changed files have been read.
+		self.update_list()
+		self.catalog.refresh_async(onDone = lambda changes: Clock.schedule_once(self.update_list) if changes != 0 else None)
+
+	def update_list(self, *args):
+		entries = self.catalog.search(self.searchInput.text)
+		self.entries = dict((entry["file"], entry) for entry in entries)
+		self.mapList.data = [{'text': entry["file"] if entry["name"] == "" else entry["file"] + "  -  " + entry["name"], 'file': entry["file"], 'browser': self} for entry in entries]
+
+	def on_search_focus(self, instance, focus):
+		# The text input takes the keyboard, which has to be given back to the editor afterwards.
+		if not focus and self.keyboard != None:
+			self.keyboard._keyboard_open()
+
+	def select(self, file):
+		self.selectedFile = file
+		entry = self.entries.get(file)
+		if entry != None:
+			self.detailLabel.text = "Name: " + entry["name"] + "\nID: " + entry["ID"] + "\nSize: " + str(entry["iCount"]) + " X " + str(entry["jCount"]) + " X " + str(entry["storyCount"]) + "\nLayers: " + str(entry["layerCount"])
+		thumbnail = self.catalog.get_thumbnail(file)
+		if thumbnail != None:
+			texture = Texture.create(size = (thumbnail[0], thumbnail[1]), colorfmt = 'rgba')
+			texture.mag_filter = 'nearest'
+			texture.blit_buffer(thumbnail[2], colorfmt = 'rgba', bufferfmt = 'ubyte')
+			self.thumbnail.texture = texture
+		else:
+			self.thumbnail.texture = None
+		if self.onSelect != None:
+			self.onSelect(file)
@@ -0,0 +1,200 @@
+# Fundamental imports
+import numpy
+# Graphics Elements
+from kivy.graphics import Mesh, InstructionGroup
+# Elements from subdirectories
+from . import textures
+from ..core.profiling import instruments
+from ..core.sprites import get_frame_rate
+
+# Batched rendering:
+# Instead of a Quad and a Line per grid cell and a Rectangle per sprite, every chunk is drawn with a handful of Meshes:
+# one for the grid fill, one for the grid lines, and per layer one for each run of sprites sharing a texture.
+# All vertices are four floats, (x, y, u, v), and each tile or sprite is a quad of four vertices, placed by a Projection.
+# Chunks are at most 32 x 32 tiles, which keeps every Mesh well below the 65535 vertices that Kivy can index.
+# The vertices of a run are kept in a float32 array and handed to its Mesh as a memoryview, which Kivy copies in one
+# go rather than float by float from a list. Animated sprites are quads in the same runs as the others, and showing
+# another frame only writes their texture coordinates in the array and hands it over again. See animation.py.
+FLOATS_PER_QUAD = 16
+# Most quads one Mesh can hold.
+MAX_QUADS = 65535 // 4
+
+def quad_indices(count):
+	# Two triangles per quad, for Meshes in 'triangles' mode.
+	base = numpy.arange(count, dtype = numpy.int64)[:, None] * 4
+	return (base + numpy.array([0, 1, 2, 2, 3, 0])).ravel().tolist()
+
+def outline_indices(count):
+	# The four sides of each quad, for Meshes in 'lines' mode.
+	base = numpy.arange(count, dtype = numpy.int64)[:, None] * 4
+	return (base + numpy.array([0, 1, 1, 2, 2, 3, 3, 0])).ravel().tolist()
+
+class SpriteCache():
+	def __init__(self, spriteTable):
+		# Texture, texture coordinates and aspect of each sprite index, worked out once per sprite instead of once per tile.
+		self.spriteTable = spriteTable
+		self.entries = {}
+		# The tilesets whose textures the entries hold, pinned in the texture manager until the cache is cleared, so that
+		# every sprite of a tileset keeps the same texture and the runs are not split.
+		self.pinned = set()
+		# Hit and miss counters:
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, index):
+		# Returns [texture, texCoords, aspect, animation] for a sprite index, or None if the sprite is not drawn as a single
+		# quad. animation is None, or [frames per second, [frames, 8] texture coordinates of every frame] for an animated
+		# sprite, whose texCoords are those of its first frame.
+		if index in self.entries:
+			self.hits += 1
+		else:
+			self.misses += 1
+			graphicsInfo = self.spriteTable.get(index)
+			type = self.spriteTable.get_type(index)
+			entry = None
+			if type[0] == 'object' or type[0] == 'wall':
+				# Sprites of the same tileset, or of any tileset packed in the atlas, share the texture and so the same run.
+				# The frames of an animated sprite are all cut from the same tileset.
+				texture = textures.manager.get_owner(graphicsInfo[0])
+				if not graphicsInfo[0] in self.pinned:
+					textures.manager.pin(graphicsInfo[0])
+					self.pinned.add(graphicsInfo[0])
+				frames = [list(textures.manager.get_region(graphicsInfo[0], x, y, graphicsInfo[2][0], graphicsInfo[2][1]).tex_coords) for x, y in graphicsInfo[1][0]]
+				animation = [get_frame_rate(graphicsInfo), numpy.array(frames, dtype = numpy.float32)] if type[1] else None
+				entry = [texture, frames[0], graphicsInfo[2][1] / graphicsInfo[2][0], animation]
+			self.entries[index] = entry
+		return self.entries[index]
+
+	def get_hit_rate(self):
+		if self.hits + self.misses == 0:
+			return 0
+		return self.hits / (self.hits + self.misses)
+
+	def clear(self):
+		self.entries = {}
+		for path in self.pinned:
+			textures.manager.unpin(path)
+		self.pinned = set()
+
+class SpriteRun():
+	def __init__(self, texture, tiles, vertices, entries):
+		# A run of sprites of one layer that share a texture and follow each other in drawing order, drawn with one Mesh.
+		# entries are the SpriteCache entries of the sprites.
+		self.texture = texture
+		self.tiles = tiles
+		self.positions = dict((tiles[n], n) for n in range(len(tiles)))
+		self.vertices = vertices
+		self.mesh = Mesh(vertices = memoryview(vertices), indices = quad_indices(len(tiles)), mode = 'triangles', texture = texture)
+		# The animated sprites by frame rate, as [quads, starts, counts, table]: the frames of the sprite of quad n are
+		# the rows starts[n] to starts[n] + counts[n] of table. Each rate shows frames[rate], the first one to begin with.
+		self.animations = {}
+		self.frames = {}
+		animated = {}
+		for n in range(len(entries)):
+			if entries[n][3] != None:
+				animated.setdefault(entries[n][3][0], []).append([n, entries[n][3][1]])
+		for rate, sprites in animated.items():
+			# Sprites drawn more than once in the run share their rows.
+			rows = {}
+			table = []
+			for n, frames in sprites:
+				if not id(frames) in rows:
+					rows[id(frames)] = sum(len(t) for t in table)
+					table.append(frames)
+			self.animations[rate] = [numpy.array([n for n, frames in sprites]), numpy.array([rows[id(frames)] for n, frames in sprites]),
+									numpy.array([len(frames) for n, frames in sprites]), numpy.concatenate(table)]
+			self.frames[rate] = 0
+
+	def set_quad(self, n, vertices):
+		# Replaces the quad of the n-th sprite. The Mesh is not updated until upload is called.
+		self.vertices[n * FLOATS_PER_QUAD:(n + 1) * FLOATS_PER_QUAD] = vertices
+
+	def animate(self, rate, frame):
+		# Shows frame number frame of the animated sprites of rate, each looping through its own frames. Returns the number
+		# of sprites changed, which need an upload to be seen.
+		if self.frames[rate] == frame:
+			return 0
+		self.frames[rate] = frame
+		quads, starts, counts, table = self.animations[rate]
+		self.vertices.reshape(-1, 4, 4)[quads, :, 2:] = table[starts + frame % counts].reshape(-1, 4, 2)
+		return len(quads)
+
+	def upload(self):
+		self.mesh.vertices = memoryview(self.vertices)
+
+class ChunkMeshes():
+	def __init__(self, key, layerCount):
+		# The Meshes of one chunk. key is (story, ci, cj).
+		self.key = key
+		self.fill = None
+		self.lines = None
+		self.runs = [ [] for l in range(layerCount)]
+		self.groups = [ InstructionGroup() for l in range(layerCount)]
+
+	def instruction_count(self):
+		return sum(len(runs) for runs in self.runs) + (2 if self.fill != None else 0)
+
+	def build_grid(self, chunk, projection):
+		i0, i1, j0, j1 = chunk.bounds
+		i, j = numpy.mgrid[i0:i1, j0:j1]
+		count = i.size
+		vertices = projection.diamond_vertices(i.ravel(), j.ravel(), self.key[0]).ravel().tolist()
+		self.fill = Mesh(vertices = vertices, indices = quad_indices(count), mode = 'triangles')
+		self.lines = Mesh(vertices = vertices, indices = outline_indices(count), mode = 'lines')
+
+	def build_layer(self, chunk, layer, spriteCache, projection):
+		# Builds the sprite Meshes of one layer of the chunk.
+		self.groups[layer].clear()
+		self.runs[layer] = []
+		i0, i1, j0, j1 = chunk.bounds
+		ids = chunk.sprites[layer]
+		di, dj = ids.nonzero()
+		if len(di) == 0:
+			return
+		# Tiles are drawn back to front.
+		di, dj = di[::-1], dj[::-1]
+		tiles = []
+		entries = []
+		for n in range(len(di)):
+			entry = spriteCache.get(int(ids[di[n], dj[n]]))
+			if entry != None:
+				tiles.append((int(di[n]) + i0, int(dj[n]) + j0))
+				entries.append(entry)
+		instruments.count("sprites built", len(tiles))
+		if len(tiles) == 0:
+			return
+		i = numpy.array([t[0] for t in tiles])
+		j = numpy.array([t[1] for t in tiles])
+		vertices = projection.sprite_vertices(i, j, self.key[0], [e[1] for e in entries], [e[2] for e in entries]).ravel()
+		# Split into runs wherever the texture changes, so that the drawing order is kept across textures.
+		start = 0
+		for n in range(1, len(tiles) + 1):
+			if n == len(tiles) or entries[n][0] is not entries[start][0]:
+				run = SpriteRun(entries[start][0], tiles[start:n], vertices[start * FLOATS_PER_QUAD:n * FLOATS_PER_QUAD].copy(), entries[start:n])
+				self.runs[layer].append(run)
+				self.groups[layer].add(run.mesh)
+				start = n
+
+	def update_tiles(self, chunk, layer, tiles, spriteCache, projection):
+		# Updates the sprites of some tiles of a layer. Where a tile already has a quad in a run with the same texture,
+		# only its vertices are replaced. If any tile gains, loses or changes texture, its draw-order neighbours shift,
+		# and the sprites of the layer are rebuilt instead, which still only touches this chunk. So it is if animated
+		# sprites are painted, or painted over, as their frames are kept with the run.
+		changed = []
+		for i, j in tiles:
+			entry = spriteCache.get(int(chunk.story.sprites[layer, i, j]))
+			run = None
+			if entry != None and entry[3] == None:
+				for r in self.runs[layer]:
+					if (i, j) in r.positions and r.texture is entry[0] and len(r.animations) == 0:
+						run = r
+						break
+			if run == None:
+				self.build_layer(chunk, layer, spriteCache, projection)
+				return
+			run.set_quad(run.positions[(i, j)], projection.sprite_vertices([i], [j], self.key[0], [entry[1]], [entry[2]]).ravel())
+			if not run in changed:
+				changed.append(run)
+		instruments.count("sprites updated", len(tiles))
+		for run in changed:
+			run.upload()
\ No newline at end of file
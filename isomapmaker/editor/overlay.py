@@ -0,0 +1,96 @@
+# Fundamental imports
+from kivy.clock import Clock
+# UI Elements
+from kivy.uix.label import Label
+# Graphics Elements
+from kivy.graphics import Color, Rectangle
+# Elements from subdirectories
+from . import textures
+from ..core.profiling import instruments
+
+# Profiling overlay:
+# Shows, twice a second, the frame times, the instructions and sprites drawn for the chunks in view, the layers cached
+# and rendered into Fbos, the hit rates of the chunk, sprite and texture caches, and the slowest timed functions of the
+# last half second.
+# The instruments only time and count while the overlay is shown, or while a trace is written.
+
+# Seconds between updates:
+UPDATE_INTERVAL = 0.5
+# Timers listed, slowest in total first:
+TIMER_COUNT = 8
+
+class ProfilerOverlay(Label):
+	def __init__(self, mapCanvas, **kwargs):
+		super(ProfilerOverlay, self).__init__(size_hint = (None, None), halign = 'left', valign = 'top', font_size = 12, font_name = 'RobotoMono-Regular', **kwargs)
+		self.mapCanvas = mapCanvas
+		self.bind(texture_size = self.on_texture_size)
+		with self.canvas.before:
+			Color(0, 0, 0, 0.7)
+			self.background = Rectangle()
+		self.bind(pos = self.update_background, size = self.update_background)
+		self.frameTimes = []
+		self.frameEvent = None
+		self.updateEvent = None
+		self.shown = False
+		# Whether the instruments were on before the overlay turned them on:
+		self.wasEnabled = False
+
+	def on_texture_size(self, instance, size):
+		self.size = [size[0] + 16, size[1] + 16]
+
+	def update_background(self, *args):
+		self.background.pos = self.pos
+		self.background.size = self.size
+
+	def toggle(self, window):
+		# Shows the overlay in the top-right corner of window, or hides it.
+		if self.shown:
+			self.hide(window)
+		else:
+			self.show(window)
+
+	def show(self, window):
+		if self.shown:
+			return
+		self.shown = True
+		self.wasEnabled = instruments.enabled
+		instruments.enabled = True
+		instruments.take()
+		self.frameTimes = []
+		self.frameEvent = Clock.schedule_interval(self.on_frame, 0)
+		self.updateEvent = Clock.schedule_interval(self.update, UPDATE_INTERVAL)
+		window.add_widget(self)
+		self.update()
+
+	def hide(self, window):
+		if not self.shown:
+			return
+		self.shown = False
+		instruments.enabled = self.wasEnabled
+		self.frameEvent.cancel()
+		self.updateEvent.cancel()
+		window.remove_widget(self)
+
+	def on_frame(self, dt):
+		self.frameTimes.append(dt)
+
+	def update(self, *args):
+		times, self.frameTimes = self.frameTimes, []
+		timers, counters = instruments.take()
+		lines = []
+		if len(times) != 0:
+			average = sum(times) / len(times)
+			lines.append("Frame  %.1f ms average, %.1f ms longest, %.0f fps" % (average * 1000, max(times) * 1000, 1 / max(average, 1e-6)))
+		instructions, sprites = self.mapCanvas.get_draw_counts()
+		lines.append("Drawn  %d instructions, %d sprites in %d chunks" % (instructions, sprites, len(self.mapCanvas.visibleChunks)))
+		lines.append("Built  %d sprites, %d updated" % (counters.get("sprites built", 0), counters.get("sprites updated", 0)))
+		lines.append("Layers %d cached, %d rendered" % (len(self.mapCanvas.layerCache), counters.get("layers rendered", 0)))
+		lines.append("Anim   %d runs, %d sprites advanced" % (self.mapCanvas.animator.get_count(), counters.get("sprites animated", 0)))
+		lines.append("Hits   chunks %.0f%%, sprites %.0f%%, textures %.0f%%" % (self.mapCanvas.chunkCache.get_hit_rate() * 100,
+																				self.mapCanvas.spriteCache.get_hit_rate() * 100,
+																				textures.manager.get_hit_rate() * 100))
+		for name, (calls, total, longest) in sorted(timers.items(), key = lambda item: -item[1][1])[:TIMER_COUNT]:
+			lines.append("%-28s %5d x %7.2f ms, longest %7.2f ms" % (name, calls, total / calls * 1000, longest * 1000))
+		self.text = "\n".join(lines)
+		if self.parent != None:
+			self.pos = [self.parent.width - self.width - 8, self.parent.height - self.height - 8]
@@ -4,10 +4,11 @@ from os.path import dirname, join
 # Layouts
 from kivy.uix.floatlayout import FloatLayout
 # Graphics Elements
-from kivy.core.image import Image
 from kivy.graphics import Color, Rectangle
 # Elements from subdirectories
-import globals
+from .. import paths
+from . import textures
+from ..core.profiling import timed, log
 
 
 class Palette(FloatLayout):
@@ -35,6 +36,7 @@ class Palette(FloatLayout):
 		# Populate the palette
 		self.populate_palette()
 	
+	@timed("palette.on_down")
 	def on_down(self, parent, touch):
 		# Check if the touch-down position is within the palette:
 		if touch.pos[0] > self.offset and touch.pos[0] < self.width - self.offset and touch.pos[1] > self.offset and touch.pos[1] < self.height - self.offset:
@@ -47,7 +49,7 @@ class Palette(FloatLayout):
 			self.highlight(x, y)
 			self.mapCanvas.selectedPaint = [self.tileset, [ [ [x * self.imageRes[0], y * self.imageRes[1] ] ] ], [self.imageRes[0], self.imageRes[1]] ]
 		else:
-			print("not touching the palette!")
+			log.debug("Touch at %s is outside of the palette", touch.pos)
 		
 		
 	def on_move(self, parent, touch):
@@ -56,23 +58,24 @@ class Palette(FloatLayout):
 	def on_up(self, parent, touch):
 		pass
 		
+	@timed("palette.highlight")
 	def highlight(self, x, y):
 		yDiv = (self.res[1] / self.res[0])
-		print(y)
-		print(self.height)
+		log.debug("Highlighting palette tile %s, %s", x, y)
 		self.canvas.after.clear()
 		with self.canvas.after:
 			Color(0, 0.5, 1, 0.4)
 			Rectangle(size = self.res, pos = (x * self.res[0] + self.offset, y * self.res[1] + self.offset))
-		self.mapCanvas.selectedPaint = self.tilesetImage.get_region(x *  self.imageRes[0], y * self.imageRes[1], self.imageRes[0], self.imageRes[1] )	
+		self.mapCanvas.selectedPaint = textures.manager.get_region(self.tileset, x *  self.imageRes[0], y * self.imageRes[1], self.imageRes[0], self.imageRes[1] )	
 		
+	@timed("palette.populate_palette")
 	def populate_palette(self):
 		if self.tileset != None:
 			# Set image
-			self.tilesetImage = Image(self.tileset).texture
+			self.tilesetImage = textures.manager.get_texture(self.tileset)
 			# Set background image:
-			backgroundImagePath = join(globals.subDirectory['graphics'], "emptytile.png")
-			backgroundImage = Image(backgroundImagePath).texture
+			backgroundImagePath = join(paths.subDirectory['graphics'], "emptytile.png")
+			backgroundImage = textures.manager.get_texture(backgroundImagePath)
 			# Find the resolution of this image:
 			yDiv = (self.res[1] / self.res[0]) / 4
 			self.imageRes = [self.tilesetImage.width / 4 , self.tilesetImage.width * yDiv]
@@ -95,6 +98,6 @@ class Palette(FloatLayout):
 				for y in range(int(self.tilesetImage.height / (self.tilesetImage.width * yDiv))):
 					with self.canvas:
 						Color(1, 1, 1, 1)
-						Rectangle(texture = self.tilesetImage.get_region(x * self.imageRes[0], y * self.imageRes[1], self.imageRes[0], self.imageRes[1]), 
+						Rectangle(texture = textures.manager.get_region(self.tileset, x * self.imageRes[0], y * self.imageRes[1], self.imageRes[0], self.imageRes[1]), 
 									size = self.res, 
 									pos = (x * self.res[0] + self.offset, y * self.res[1] + self.offset ))		
\ No newline at end of file
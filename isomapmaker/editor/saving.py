@@ -0,0 +1,126 @@
+# Fundamental imports
+import threading
+from kivy.clock import Clock
+# Elements from subdirectories
+from ..core import msfformat
+from ..core.profiling import log
+
+# Background saving:
+# Saving takes a snapshot of the map on the main thread, which is a copy of the planes of the stories that changed plus
+# the encoded metadata, and hands it to a worker thread that compresses it and writes it to a temporary file that
+# replaces the map file once complete. The editor keeps running, and may keep changing the map, in the meantime.
+# Sections are written uncompressed unless the saver is made with compress = True, so that the editor can map the saved
+# file straight back in. When compressing, the sections of every story are kept, with the revision of the story they were
+# made from, so that a story that has not changed since the last save is written from them instead of being copied and
+# compressed again.
+
+class Snapshot():
+	def __init__(self, mapFile, encoded, compress):
+		# Copies what is needed to write mapFile, except for the stories whose sections in encoded are still up to date.
+		self.size = msfformat.map_size(mapFile)
+		self.metadata = msfformat.build_metadata(mapFile)
+		self.revisions = mapFile.get_revisions()
+		self.compress = compress
+		# Per story, either the planes copied from it or its sections encoded before:
+		self.planes = {}
+		self.sections = {}
+		for s in range(len(mapFile.stories)):
+			if s in encoded and encoded[s][0] == self.revisions[s]:
+				self.sections[s] = encoded[s][1]
+			else:
+				self.planes[s] = [(p[0], p[1], p[2], p[3].copy()) for p in msfformat.story_planes(mapFile.stories[s], s)]
+
+class BackgroundSaver():
+	def __init__(self, compress = False, onProgress = None, onDone = None, **kwargs):
+		# onProgress(path, fraction) and onDone(path, error) are called on the main thread, error being None on success.
+		self.compress = compress
+		self.onProgress = onProgress
+		self.onDone = onDone
+		self.thread = None
+		# A save asked for while another one runs, started once that one is done:
+		self.pending = None
+		# The map the encoded sections belong to, its [iCount, jCount, layerCount] when they were made, and by story,
+		# [revision, sections]:
+		self.mapFile = None
+		self.encodedSize = None
+		self.encoded = {}
+		# Revisions of the map when it was last written:
+		self.savedRevisions = None
+
+	def is_busy(self):
+		return self.thread != None
+
+	def is_changed(self, mapFile):
+		# Checks whether mapFile changed since it was last written, or loaded.
+		return mapFile is not self.mapFile or mapFile.get_revisions() != self.savedRevisions
+
+	def mark_saved(self, mapFile):
+		# Takes mapFile as it is now for saved, as when it has just been loaded, or made and not yet changed.
+		if mapFile is not self.mapFile:
+			self.mapFile = mapFile
+			self.encodedSize = None
+			self.encoded = {}
+		self.savedRevisions = mapFile.get_revisions()
+
+	def save(self, mapFile, path):
+		if self.is_busy():
+			self.pending = [mapFile, path]
+			return
+		size = msfformat.map_size(mapFile)
+		if mapFile is not self.mapFile or self.encodedSize != [size[0], size[1], size[3]]:
+			self.mapFile = mapFile
+			self.encoded = {}
+			self.savedRevisions = None
+		if msfformat.DETACH_BEFORE_REPLACE:
+			# Done here, on the main thread, as it swaps the planes of the map.
+			msfformat.detach_map(mapFile, path)
+		try:
+			snapshot = Snapshot(mapFile, self.encoded, self.compress)
+		except TypeError as e:
+			# A map holding occupants or triggers that can not be written is not saved at all.
+			log.error("Saving %s failed: %s", path, e)
+			if self.onDone != None:
+				self.onDone(path, e)
+			return
+		self.thread = threading.Thread(target = self.run, args = (snapshot, path), daemon = True)
+		self.thread.start()
+
+	def run(self, snapshot, path):
+		# Runs on the worker thread. Encoding and writing are reported as the first and second half of the progress.
+		error = None
+		sections = dict(snapshot.sections)
+		try:
+			stories = sorted(snapshot.planes.keys())
+			for n in range(len(stories)):
+				sections[stories[n]] = msfformat.encode_planes(snapshot.planes[stories[n]], snapshot.compress)
+				self.report(path, 0.5 * (n + 1) / len(stories))
+			allSections = []
+			for s in range(snapshot.size[2]):
+				allSections += sections[s]
+			flags = msfformat.FLAG_ZLIB if snapshot.compress else 0
+			msfformat.replace_file(path, lambda file: msfformat.write_sections(file, snapshot.size, snapshot.metadata, allSections, flags,
+																				lambda fraction: self.report(path, 0.5 + 0.5 * fraction)))
+		except Exception as e:
+			log.exception("Saving %s failed", path)
+			error = e
+		Clock.schedule_once(lambda dt: self.finish(snapshot, sections, path, error))
+
+	def report(self, path, fraction):
+		if self.onProgress != None:
+			Clock.schedule_once(lambda dt: self.onProgress(path, fraction))
+
+	def finish(self, snapshot, sections, path, error):
+		# Runs on the main thread once the worker is done.
+		self.thread = None
+		if error == None:
+			if snapshot.compress:
+				for s in sections:
+					self.encoded[s] = [snapshot.revisions[s], sections[s]]
+				self.encodedSize = [snapshot.size[0], snapshot.size[1], snapshot.size[3]]
+			self.savedRevisions = snapshot.revisions
+		if self.onDone != None:
+			self.onDone(path, error)
+		if self.pending != None:
+			mapFile, path = self.pending
+			self.pending = None
+			self.save(mapFile, path)
\ No newline at end of file
@@ -0,0 +1,194 @@
+# Fundamental imports
+import os
+from os import listdir
+from os.path import join
+from collections import OrderedDict
+import numpy
+# Graphics Elements
+from kivy.core.image import Image
+from kivy.graphics.texture import Texture
+# Elements from subdirectories
+from ..core.profiling import timed
+
+# Texture manager:
+# Every tileset is loaded once for the whole process, and every region cut from it is made once, instead of each
+# palette, tile and render pass calling Image(path).texture and get_region on its own.
+# Both caches are least recently used caches with a size limit. Tilesets in use by meshes are pinned, and never dropped
+# from the cache: loading one again would give a second texture of the same tileset, whose sprites could no longer be
+# drawn in the same run as those of the first.
+# Tilesets can optionally be packed into a single atlas texture, so that sprites from different tilesets can be
+# drawn by the same Mesh with one texture bind.
+# Tilesets and the atlas are mipmapped, so that sprites drawn smaller than their pixels, as on a zoomed out canvas,
+# are sampled from a level of about their size on screen instead of skipping texels and shimmering. Regions share the
+# mipmaps of the texture they are cut from.
+
+def make_key(path):
+	# Paths are compared in absolute, normalised form, so that different spellings of a path share one texture.
+	return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+class TextureManager():
+	def __init__(self, maxTextures = 64, maxRegions = 8192, mipmap = True, **kwargs):
+		self.maxTextures = maxTextures
+		self.maxRegions = maxRegions
+		self.mipmap = mipmap
+		# Tileset textures by path key:
+		self.textures = OrderedDict()
+		# Number of holders of each pinned tileset, by path key:
+		self.pinned = {}
+		# Region textures by (path key, x, y, w, h):
+		self.regions = OrderedDict()
+		# The atlas, if built, and where each tileset in it starts, as [x, y] of its lower-left corner:
+		self.atlas = None
+		self.atlasLocations = {}
+		# Hit and miss counters for both caches:
+		self.hits = 0
+		self.misses = 0
+
+	def get_texture(self, path):
+		# Returns the texture of a whole tileset, loading it only the first time.
+		key = make_key(path)
+		if key in self.textures:
+			self.hits += 1
+			self.textures.move_to_end(key)
+			return self.textures[key]
+		self.misses += 1
+		texture = self.load_texture(path)
+		self.textures[key] = texture
+		self.trim()
+		return texture
+
+	def trim(self):
+		# Drops the least recently used tilesets that are not pinned, until at most maxTextures are left, or only pinned ones.
+		for key in list(self.textures.keys()):
+			if len(self.textures) <= self.maxTextures:
+				break
+			if not key in self.pinned:
+				del self.textures[key]
+
+	def pin(self, path):
+		# Keeps the texture of a tileset until it is unpinned as many times as it was pinned.
+		key = make_key(path)
+		self.pinned[key] = self.pinned.get(key, 0) + 1
+
+	def unpin(self, path):
+		key = make_key(path)
+		if key in self.pinned:
+			self.pinned[key] -= 1
+			if self.pinned[key] == 0:
+				del self.pinned[key]
+				self.trim()
+
+	@timed("textures.load_texture")
+	def load_texture(self, path):
+		texture = Image(path, mipmap = self.mipmap).texture
+		self.set_filters(texture)
+		return texture
+
+	def set_filters(self, texture):
+		# Blends the two nearest mipmap levels when sprites are drawn smaller than their pixels.
+		if self.mipmap:
+			texture.min_filter = 'linear_mipmap_linear'
+
+	def get_owner(self, path):
+		# Returns the texture that regions of path are cut from: the atlas if path is packed in it, else the tileset itself.
+		if make_key(path) in self.atlasLocations:
+			return self.atlas
+		return self.get_texture(path)
+
+	def get_region(self, path, x, y, w, h):
+		# Returns the region (x, y, w, h) of a tileset, in the coordinates of the tileset even when it is packed in the atlas.
+		key = (make_key(path), x, y, w, h)
+		if key in self.regions:
+			self.hits += 1
+			self.regions.move_to_end(key)
+			return self.regions[key]
+		self.misses += 1
+		location = self.atlasLocations.get(key[0])
+		if location != None:
+			region = self.atlas.get_region(location[0] + x, location[1] + y, w, h)
+		else:
+			region = self.get_texture(path).get_region(x, y, w, h)
+		self.regions[key] = region
+		while len(self.regions) > self.maxRegions:
+			self.regions.popitem(last = False)
+		return region
+
+	def get_hit_rate(self):
+		if self.hits + self.misses == 0:
+			return 0
+		return self.hits / (self.hits + self.misses)
+
+	def clear(self):
+		self.textures.clear()
+		self.regions.clear()
+		self.atlas = None
+		self.atlasLocations = {}
+
+	@timed("textures.load_pixels")
+	def load_pixels(self, path):
+		# Returns the pixels of an image as a [height, width, 4] RGBA array, top row first.
+		image = Image(path, keep_data = True)
+		data = image.image._data[0]
+		channels = len(data.fmt)
+		pixels = numpy.frombuffer(data.data, dtype = numpy.uint8)
+		# Rows can be padded to a multiple of 4 bytes.
+		pixels = pixels[:len(pixels) - len(pixels) % data.height].reshape(data.height, -1)[:, :data.width * channels]
+		pixels = pixels.reshape(data.height, data.width, channels)
+		if data.fmt in ('bgr', 'bgra'):
+			pixels = pixels[:, :, [2, 1, 0] + ([3] if channels == 4 else [])]
+		if channels == 3:
+			pixels = numpy.concatenate([pixels, numpy.full((data.height, data.width, 1), 255, dtype = numpy.uint8)], axis = 2)
+		if not data.flip_vertical:
+			pixels = pixels[::-1]
+		return pixels
+
+	@timed("textures.build_atlas")
+	def build_atlas(self, paths, maxSize = 4096):
+		# Packs the tilesets in paths into one texture, in rows ordered by height. Tilesets that do not fit are left out
+		# and keep their own texture. Returns the list of paths that were packed.
+		images = sorted([(self.load_pixels(path), path) for path in paths], key = lambda entry: -entry[0].shape[0])
+		width = 1
+		while width < max([entry[0].shape[1] for entry in images] + [1]):
+			width *= 2
+		width = min(width * 2, maxSize)
+		placed = []
+		x = y = rowHeight = 0
+		for pixels, path in images:
+			h, w = pixels.shape[:2]
+			if w > width:
+				continue
+			if x + w > width:
+				x, y, rowHeight = 0, y + rowHeight, 0
+			if y + h > maxSize:
+				continue
+			placed.append((pixels, path, x, y))
+			x += w
+			rowHeight = max(rowHeight, h)
+		if len(placed) == 0:
+			return []
+		height = 1
+		while height < max(entry[3] + entry[0].shape[0] for entry in placed):
+			height *= 2
+		# The atlas is composed top row first, like the image data, and flipped when uploaded.
+		atlasPixels = numpy.zeros((height, width, 4), dtype = numpy.uint8)
+		self.atlasLocations = {}
+		for pixels, path, x, y in placed:
+			h, w = pixels.shape[:2]
+			atlasPixels[y:y + h, x:x + w] = pixels
+			# Regions are addressed from the lower-left corner.
+			self.atlasLocations[make_key(path)] = [x, height - y - h]
+		self.atlas = Texture.create(size = (width, height), colorfmt = 'rgba', mipmap = self.mipmap)
+		# The mipmaps are generated as the pixels are uploaded.
+		self.atlas.blit_buffer(atlasPixels.tobytes(), colorfmt = 'rgba', bufferfmt = 'ubyte')
+		self.atlas.flip_vertical()
+		self.set_filters(self.atlas)
+		# Regions cut before the atlas existed point to the old textures.
+		self.regions.clear()
+		return [entry[1] for entry in placed]
+
+	def pack_directory(self, directory, maxSize = 4096):
+		# Packs every .png directly inside directory into the atlas.
+		return self.build_atlas([join(directory, f) for f in sorted(listdir(directory)) if f[-4:].lower() == ".png"], maxSize)
+
+# The texture manager shared by the whole process:
+manager = TextureManager()
\ No newline at end of file
@@ -0,0 +1,16 @@
+# Fundamental imports
+from os.path import dirname, abspath, realpath, join
+
+# Directories of the editor's assets and maps, next to the package.
+root = realpath(dirname(dirname(abspath(__file__))))
+subDirectory = {}
+subDirectory['graphics'] = join(root, "graphics")
+subDirectory['autotiles'] = join(root, "graphics", "autotiles")
+subDirectory['walls'] = join(root, "graphics", "walls")
+subDirectory['maps'] = join(root, "maps")
+# Autosaves are kept apart from the maps, so that they are not listed as maps of their own.
+subDirectory['autosaves'] = join(root, "maps", "autosave")
+
+def tileset_paths():
+	# Directories that tilesets saved on another machine are looked up in, by file name.
+	return [subDirectory['graphics'], subDirectory['walls'], subDirectory['autotiles']]
\ No newline at end of file
@@ -0,0 +1,88 @@
+# Command-line tool for map files:
+#	python maptool.py validate maps/*.msf
+#	python maptool.py stats --json maps/*.msf
+#	python maptool.py convert --compress --out converted maps/*.msf
+#	python maptool.py thumbnail --out thumbnails --tile-width 16 maps/*.msf
+# Files are worked on in parallel by a process pool. Only isomapmaker.core is imported, so the tool
+# runs on machines without a display.
+
+# Fundamental imports
+import os, sys, json, argparse
+from os.path import dirname, join, basename
+from concurrent.futures import ProcessPoolExecutor
+# Elements from subdirectories
+from isomapmaker import paths
+from isomapmaker.core import maptools
+
+def run_job(job):
+	# Runs in a worker process. Errors are returned instead of raised, so that one broken map does not stop the batch.
+	command, path, options = job
+	try:
+		if command == "validate":
+			return maptools.validate_file(path, options["searchPaths"])
+		if command == "stats":
+			return maptools.stats_file(path)
+		if command == "convert":
+			outPath = join(options["out"], basename(path)) if options["out"] != None else None
+			return maptools.convert_file(path, outPath, options["compress"])
+		if command == "thumbnail":
+			outPath = join(options["out"] if options["out"] != None else dirname(path), basename(path)[:-4] + ".png")
+			return maptools.thumbnail_file(path, outPath, options["tileWidth"], options["searchPaths"])
+	except Exception as e:
+		return {"file": path, "error": str(e)}
+
+def describe(command, result):
+	# One line of text per result.
+	if "error" in result:
+		return result["file"] + ": error: " + result["error"]
+	if command == "validate":
+		return result["file"] + ": " + ("ok" if result["ok"] else "\n\t".join([str(len(result["problems"])) + " problems"] + result["problems"]))
+	if command == "stats":
+		return (result["file"] + ": " + str(result["iCount"]) + " x " + str(result["jCount"]) + " x " + str(result["storyCount"]) + ", "
+				+ str(result["layerCount"]) + " layers, " + str(sum(sum(story) for story in result["paintedTiles"])) + " painted tiles, "
+				+ str(result["spritesUsed"]) + " of " + str(result["sprites"]) + " sprites used, " + result["format"]
+				+ (" compressed" if result["compressed"] else "") + ", " + str(result["fileBytes"]) + " bytes")
+	if command == "convert":
+		return result["file"] + ": " + ("converted from legacy" if result["legacy"] else "rewritten") + " to " + result["output"] + ", " + str(result["bytesAfter"]) + " bytes"
+	return result["file"] + ": " + result["output"] + ", " + str(result["width"]) + " x " + str(result["height"])
+
+def main(arguments = None):
+	parser = argparse.ArgumentParser(description = "Converts, validates, describes and renders map files in parallel.")
+	parser.add_argument("command", choices = ["validate", "stats", "convert", "thumbnail"])
+	parser.add_argument("files", nargs = "+", help = "map files, or directories to take every .msf file from")
+	parser.add_argument("--out", default = None, help = "directory for converted maps and thumbnails, instead of next to the maps")
+	parser.add_argument("--compress", action = "store_true", help = "compress converted maps")
+	parser.add_argument("--tile-width", type = int, default = 16, help = "width in pixels of a tile in thumbnails")
+	parser.add_argument("--graphics", action = "append", default = [], help = "directory to look for tilesets in, besides graphics/")
+	parser.add_argument("--processes", type = int, default = None, help = "number of worker processes, one per CPU by default")
+	parser.add_argument("--json", action = "store_true", help = "print the results as JSON")
+	args = parser.parse_args(arguments)
+	files = []
+	for path in args.files:
+		if os.path.isdir(path):
+			files += sorted(join(path, f) for f in os.listdir(path) if f[-4:] == ".msf")
+		else:
+			files.append(path)
+	if args.out != None:
+		os.makedirs(args.out, exist_ok = True)
+	options = {"out": args.out, "compress": args.compress, "tileWidth": args.tile_width, "searchPaths": args.graphics + paths.tileset_paths()}
+	jobs = [(args.command, path, options) for path in files]
+	results = []
+	if args.processes == 1 or len(jobs) < 2:
+		results = [run_job(job) for job in jobs]
+	else:
+		with ProcessPoolExecutor(max_workers = args.processes) as pool:
+			for result in pool.map(run_job, jobs):
+				results.append(result)
+				if not args.json:
+					print(describe(args.command, result))
+	if args.json:
+		print(json.dumps(results, indent = 1))
+	elif args.processes == 1 or len(jobs) < 2:
+		for result in results:
+			print(describe(args.command, result))
+	# Failing validations and errors give a non-zero exit status, for scripts.
+	return 1 if any("error" in result or result.get("ok") == False for result in results) else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,87 @@
+# Tests of the map model, the map files and the undo history, run with python -m pytest from the root of the repository.
+# They only use isomapmaker.core, and so run without Kivy or a display.
+
+# Fundamental imports
+import sys, types, pickle
+from os.path import dirname, abspath
+import numpy
+import pytest
+
+root = dirname(dirname(abspath(__file__)))
+if not root in sys.path:
+	sys.path.insert(0, root)
+
+from isomapmaker.core.mapfile import MapFile
+from isomapmaker.core.msfformat import PLANES, LegacyUnpickler
+
+def painted_map(i = 40, j = 30, stories = 2, layerCount = 3, seed = 0):
+	# A map with sprites of a few definitions painted at random, every plane set, and some occupants and triggers.
+	mapFile = MapFile(name = "Test Map", ID = "test", i = i, j = j, stories = stories, layerCount = layerCount)
+	ids = [mapFile.spriteTable.intern(["tileset base.png", [[[64 * n, 0]]], [64, 32]]) for n in range(4)]
+	rng = numpy.random.default_rng(seed)
+	for story in mapFile.stories:
+		story.sprites[...] = numpy.array([0] + ids)[rng.integers(0, len(ids) + 1, story.sprites.shape)]
+		story.enterDir[...] = rng.integers(0, 256, story.enterDir.shape)
+		story.stepCost[...] = rng.integers(0, 8, story.stepCost.shape)
+		story.terrain[...] = rng.integers(0, 3, story.terrain.shape)
+		story.occupants[(1, 2)] = {"type": "unit", "name": "knight"}
+		story.triggers[(i - 1, j - 1)] = "door"
+		story.triggers[(3, 4)] = {"story": 0, "cost": 2}
+	mapFile.terrainTypes += ["grass", "water"]
+	return mapFile
+
+def legacy_pickle(path, stories = 1, iCount = 4, jCount = 3, layerCount = 6, graphicsLayers = None, storyCount = None):
+	# Writes a map the way older versions of the editor pickled it, from stand-ins for the old classes, put in modules of
+	# the old names while pickling. Every tile holds graphicsLayers layers, layerCount by default, with a sprite on the
+	# first, and storyCount is written as given, the number of stories by default.
+	old = dict((module, sys.modules.get(module)) for module, name in LegacyUnpickler.legacyClasses)
+	classes = {}
+	for module, name in LegacyUnpickler.legacyClasses:
+		if not isinstance(sys.modules.get(module), types.ModuleType) or getattr(sys.modules[module], "legacy", False) != True:
+			sys.modules[module] = types.ModuleType(module)
+			sys.modules[module].legacy = True
+		classes[name] = type(name, (), {"__module__": module})
+		setattr(sys.modules[module], name, classes[name])
+	try:
+		record = classes["MapFile"]()
+		record.name, record.ID, record.layerCount = "Legacy Map", "legacy", layerCount
+		record.storyCount = storyCount if storyCount != None else stories
+		record.stories = []
+		for s in range(stories):
+			story = classes["Story"]()
+			story.matrix = []
+			for i in range(iCount):
+				row = []
+				for j in range(jCount):
+					tile = classes["Tile"]()
+					tile.graphics = [["tileset base.png", [[[64 * s, 0]]], [64, 32]]] + [[None]] * ((graphicsLayers if graphicsLayers != None else layerCount) - 1)
+					tile.enterDir = [1] * 8
+					tile.stepCost = [1, 2, 3]
+					tile.terrainType = "grass" if (i + j) % 2 == 0 else None
+					tile.trigger = "door" if (i, j) == (0, 0) else None
+					tile.occupant = None
+					row.append(tile)
+				story.matrix.append(row)
+			record.stories.append(story)
+		with open(path, "wb") as file:
+			pickle.dump(record, file)
+	finally:
+		for module, previous in old.items():
+			if previous == None:
+				del sys.modules[module]
+			else:
+				sys.modules[module] = previous
+
+@pytest.fixture
+def mapFile():
+	return painted_map()
+
+def assert_same_map(a, b):
+	# Checks that two maps hold the same data, planes being compared by value whether mapped or in memory.
+	assert (a.name, a.ID, a.layerCount, len(a.stories)) == (b.name, b.ID, b.layerCount, len(b.stories))
+	assert a.spriteTable.definitions == b.spriteTable.definitions and a.terrainTypes == b.terrainTypes
+	for story1, story2 in zip(a.stories, b.stories):
+		for name in PLANES:
+			assert (numpy.asarray(getattr(story1, name)) == numpy.asarray(getattr(story2, name))).all()
+		assert dict(story1.occupants.items()) == dict(story2.occupants.items())
+		assert dict(story1.triggers.items()) == dict(story2.triggers.items())
\ No newline at end of file
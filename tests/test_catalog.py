@@ -0,0 +1,36 @@
+# Fundamental imports
+import os
+# Elements from subdirectories
+from isomapmaker.core import msfformat
+from isomapmaker.core.catalog import Catalog
+from conftest import painted_map
+
+def test_refresh_only_reads_new_and_changed_files(tmp_path):
+	catalog = Catalog(str(tmp_path))
+	try:
+		msfformat.save_map(painted_map(seed = 1), str(tmp_path / "a.msf"))
+		msfformat.save_map(painted_map(i = 12, j = 10, seed = 2), str(tmp_path / "b.msf"))
+		assert catalog.refresh() == 2
+		assert catalog.refresh() == 0
+		os.remove(str(tmp_path / "a.msf"))
+		assert catalog.refresh() == 1
+		entries = catalog.search("b")
+		assert [(entry["file"], entry["iCount"], entry["jCount"]) for entry in entries] == [("b.msf", 12, 10)]
+		width, height, pixels = catalog.get_thumbnail("b.msf")
+		assert len(pixels) == width * height * 4
+		assert catalog.get_thumbnail("a.msf") == None
+	finally:
+		catalog.close()
+
+def test_catalog_skips_autosaves(tmp_path):
+	os.makedirs(str(tmp_path / "autosave"))
+	msfformat.save_map(painted_map(seed = 1), str(tmp_path / "test.msf"))
+	msfformat.save_map(painted_map(seed = 2), str(tmp_path / "autosave" / "test.msf"))
+	catalog = Catalog(str(tmp_path))
+	try:
+		assert catalog.refresh() == 1
+		entries = catalog.search()
+		assert [entry["file"] for entry in entries] == ["test.msf"]
+		assert (entries[0]["ID"], entries[0]["iCount"], entries[0]["storyCount"]) == ("test", 40, 2)
+	finally:
+		catalog.close()
\ No newline at end of file
@@ -0,0 +1,139 @@
+# Fundamental imports
+import numpy
+# Elements from subdirectories
+from isomapmaker.core.history import History, PaintDelta, SwapDelta, ResizeDelta, PLANES
+
+def paint(mapFile, history, s, l, tiles, sprite):
+	# Paints like the canvas does: changes the map, then records what changed.
+	plane = mapFile.stories[s].sprites[l]
+	jCount = plane.shape[1]
+	i, j = numpy.array(tiles).T
+	old = plane[i, j].copy()
+	plane[i, j] = sprite
+	history.record(PaintDelta(s, l, i * jCount + j, old, sprite, jCount))
+
+def planes_of(mapFile):
+	return [[getattr(story, name).copy() for name in PLANES] for story in mapFile.stories]
+
+def same_planes(a, b):
+	return len(a) == len(b) and all(x.shape == y.shape and (x == y).all() for story1, story2 in zip(a, b) for x, y in zip(story1, story2))
+
+def test_a_stroke_is_one_step(mapFile):
+	history = History(coalesceTime = 0)
+	before = planes_of(mapFile)
+	history.begin()
+	paint(mapFile, history, 0, 1, [(0, 0), (0, 1)], 9)
+	paint(mapFile, history, 0, 1, [(0, 1), (0, 2)], 8)
+	history.end()
+	assert len(history.undoSteps) == 1 and len(history.undoSteps[0].deltas) == 1
+	after = planes_of(mapFile)
+	deltas = history.undo(mapFile)
+	assert len(deltas) == 1 and same_planes(planes_of(mapFile), before)
+	history.redo(mapFile)
+	assert same_planes(planes_of(mapFile), after)
+	assert mapFile.stories[0].sprites[1, 0, :3].tolist() == [9, 8, 8]
+
+def test_merged_paint_keeps_the_first_old_and_last_new_sprite():
+	first = PaintDelta(0, 0, [1, 2], [5, 5], 6, 4)
+	second = PaintDelta(0, 0, [2, 3], [6, 5], 7, 4)
+	assert first.merge(second)
+	assert first.index.tolist() == [1, 2, 3] and first.old.tolist() == [5, 5, 5] and first.new.tolist() == [6, 7, 7]
+	# Painting a tile back to what it was is no change at all.
+	assert first.merge(PaintDelta(0, 0, [1], [6], 5, 4))
+	assert first.index.tolist() == [2, 3]
+	assert not first.merge(PaintDelta(0, 1, [1], [0], 5, 4))
+
+def test_strokes_in_quick_succession_join_one_step(mapFile):
+	history = History(coalesceTime = 60)
+	for l in [0, 0, 1]:
+		history.begin()
+		paint(mapFile, history, 0, l, [(l, 5)], 4)
+		history.end()
+	# The second stroke joined the first, the third is on another layer.
+	assert len(history.undoSteps) == 2
+	history = History(coalesceTime = 0)
+	for n in range(3):
+		history.begin()
+		paint(mapFile, history, 0, 0, [(n, 5)], 4)
+		history.end()
+	assert len(history.undoSteps) == 3
+
+def test_undo_and_redo_walk_the_steps_in_order(mapFile):
+	history = History(coalesceTime = 0)
+	states = [planes_of(mapFile)]
+	for n in range(5):
+		paint(mapFile, history, n % 2, n % 3, [(n, n), (n + 1, n)], n + 1)
+		states.append(planes_of(mapFile))
+	for n in range(5, 0, -1):
+		assert same_planes(planes_of(mapFile), states[n])
+		history.undo(mapFile)
+	assert same_planes(planes_of(mapFile), states[0]) and not history.can_undo()
+	assert history.undo(mapFile) == []
+	for n in range(1, 4):
+		history.redo(mapFile)
+		assert same_planes(planes_of(mapFile), states[n])
+	# A new change drops what was left to redo.
+	paint(mapFile, history, 0, 0, [(0, 0)], 1)
+	assert not history.can_redo()
+
+def test_oldest_steps_are_dropped_over_the_budget(mapFile):
+	history = History(budget = 200, coalesceTime = 0)
+	for n in range(10):
+		paint(mapFile, history, 0, 0, [(n, j) for j in range(10)], 3)
+	assert 1 <= len(history.undoSteps) < 10 and history.size <= max(200, history.undoSteps[-1].nbytes())
+	assert history.size == sum(step.nbytes() for step in history.undoSteps)
+
+def test_resize_keeps_the_tiles_left(mapFile):
+	old = mapFile.stories[1].sprites.copy()
+	mapFile.resize(20, 50)
+	story = mapFile.stories[1]
+	assert story.sprites.shape == (3, 20, 50)
+	assert (story.sprites[:, :, :30] == old[:, :20, :]).all() and (story.sprites[:, :, 30:] == 0).all()
+	assert (story.enterDir[:, 30:] == 0xFF).all()
+	# The trigger in the far corner was cut off, the others are kept.
+	assert set(story.triggers.keys()) == set([(3, 4)])
+	assert (1, 2) in story.occupants
+
+def test_resize_undo_restores_what_was_cut_off(mapFile):
+	history = History()
+	before = planes_of(mapFile)
+	triggers = [dict(story.triggers.items()) for story in mapFile.stories]
+	occupants = [dict(story.occupants.items()) for story in mapFile.stories]
+	for size in [(12, 9), (60, 45)]:
+		delta = ResizeDelta(mapFile, *size)
+		mapFile.resize(*size)
+		history.record(delta)
+	assert mapFile.stories[0].sprites.shape[1:] == (60, 45)
+	history.undo(mapFile)
+	history.undo(mapFile)
+	assert same_planes(planes_of(mapFile), before)
+	assert [dict(story.triggers.items()) for story in mapFile.stories] == triggers
+	assert [dict(story.occupants.items()) for story in mapFile.stories] == occupants
+	# The terrain index counts the restored plane, not the cropped one.
+	story = mapFile.stories[0]
+	assert len(story.terrainIndex.tiles(1)[0]) == int((story.terrain == 1).sum())
+	history.redo(mapFile)
+	assert mapFile.stories[1].sprites.shape[1:] == (12, 9) and set(mapFile.stories[1].triggers.keys()) == set([(3, 4)])
+
+def test_swap_undo(mapFile):
+	history = History()
+	stories = list(mapFile.stories)
+	mapFile.swap_stories(0, 1)
+	history.record(SwapDelta(0, 1))
+	assert mapFile.stories == stories[::-1]
+	history.undo(mapFile)
+	assert mapFile.stories == stories
+
+def test_steps_to_redo_count_towards_the_budget(mapFile):
+	history = History(budget = 10 ** 6, coalesceTime = 0)
+	for n in range(5):
+		paint(mapFile, history, 0, 0, [(n, j) for j in range(10)], 3)
+	size = history.size
+	for n in range(3):
+		history.undo(mapFile)
+	assert history.size == size == sum(step.nbytes() for step in history.undoSteps + history.redoSteps)
+	history.redo(mapFile)
+	assert history.size == size
+	# A new change drops the steps left to redo, and their bytes.
+	paint(mapFile, history, 0, 0, [(9, 9)], 3)
+	assert history.size == sum(step.nbytes() for step in history.undoSteps) and not history.can_redo()
\ No newline at end of file
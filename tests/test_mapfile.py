@@ -0,0 +1,75 @@
+# Fundamental imports
+import numpy
+# Elements from subdirectories
+from isomapmaker.core.mapfile import MapFile
+
+def flood_reference(plane, i, j, mask = None):
+	# A plain breadth-first flood over the 4 neighbours, to check the scanline fill against.
+	matching = plane == plane[i, j]
+	if mask is not None:
+		matching &= mask
+	region = numpy.zeros(plane.shape, dtype = bool)
+	if not matching[i, j]:
+		return region
+	queue = [(i, j)]
+	region[i, j] = True
+	while len(queue) != 0:
+		i, j = queue.pop()
+		for n, m in [(i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)]:
+			if 0 <= n < plane.shape[0] and 0 <= m < plane.shape[1] and matching[n, m] and not region[n, m]:
+				region[n, m] = True
+				queue.append((n, m))
+	return region
+
+def test_flood_region_matches_a_plain_flood():
+	mapFile = MapFile(i = 37, j = 29, stories = 1, layerCount = 1)
+	rng = numpy.random.default_rng(2)
+	plane = mapFile.stories[0].sprites[0]
+	plane[...] = rng.integers(0, 2, plane.shape)
+	for i, j in rng.integers(0, 29, (20, 2)):
+		assert (mapFile.flood_region(0, 0, i, j) == flood_reference(plane, i, j)).all()
+
+def test_flood_region_stays_inside_the_mask():
+	mapFile = MapFile(i = 10, j = 10, stories = 1, layerCount = 1)
+	mask = numpy.zeros((10, 10), dtype = bool)
+	mask[2:6, 3:9] = True
+	region = mapFile.flood_region(0, 0, 4, 4, mask)
+	assert (region == mask).all()
+	assert not mapFile.flood_region(0, 0, 0, 0, mask).any()
+
+def test_flood_fill_returns_only_the_tiles_changed():
+	mapFile = MapFile(i = 8, j = 8, stories = 1, layerCount = 2)
+	plane = mapFile.stories[0].sprites[1]
+	# A wall across row 4 keeps the fill in the rows above it.
+	plane[4, :] = 3
+	i, j, old = mapFile.flood_fill(0, 1, 0, 0, 5)
+	assert len(i) == 4 * 8 and (old == 0).all()
+	assert (plane[:4] == 5).all() and (plane[4] == 3).all() and (plane[5:] == 0).all()
+	# Filling with the sprite already there changes nothing.
+	assert len(mapFile.flood_fill(0, 1, 0, 0, 5)[0]) == 0
+
+def test_fill_rect_is_clipped_to_the_map():
+	mapFile = MapFile(i = 6, j = 6, stories = 1, layerCount = 1)
+	i, j, old = mapFile.fill_rect(0, 0, [-2, 2, 4, 10], 7)
+	assert sorted(zip(i.tolist(), j.tolist())) == [(0, 4), (0, 5), (1, 4), (1, 5)]
+	assert int(mapFile.stories[0].sprites[0].sum()) == 4 * 7
+def test_changes_are_counted_by_story():
+	mapFile = MapFile(i = 8, j = 8, stories = 2)
+	changes = [
+		lambda: mapFile.fill(1, 0, numpy.ones((8, 8), dtype = bool), 1),
+		lambda: mapFile.fill_rect(1, 0, [0, 2, 0, 2], 2),
+		lambda: mapFile.flood_fill(1, 0, 0, 0, 3),
+		lambda: mapFile.stories[1].matrix[1][1].set_dir(2, False),
+		lambda: setattr(mapFile.stories[1].matrix[1][1], "stepCost", [1, 2, 3]),
+		lambda: setattr(mapFile.stories[1].matrix[1][1], "terrainType", "grass"),
+		lambda: mapFile.stories[1].matrix[1][1].set_trigger("stairs"),
+		lambda: mapFile.stories[1].matrix[1][1].set_occupant("rock")]
+	for change in changes:
+		before = mapFile.get_revisions()
+		change()
+		after = mapFile.get_revisions()
+		assert after[0] == before[0] and after[1] != before[1]
+	# Painting what is already there changes nothing.
+	before = mapFile.get_revisions()
+	mapFile.fill_rect(1, 0, [0, 2, 0, 2], 3)
+	assert mapFile.get_revisions() == before
\ No newline at end of file
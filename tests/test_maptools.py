@@ -0,0 +1,66 @@
+# Fundamental imports
+import json
+# Elements from subdirectories
+from isomapmaker import paths
+from isomapmaker.core import msfformat, maptools
+from conftest import painted_map, legacy_pickle
+import maptool
+
+def rewrite_header(path, **values):
+	# Changes fields of the header of a binary map in place.
+	with open(path, "r+b") as file:
+		fields = list(msfformat.HEADER.unpack(file.read(msfformat.HEADER.size)))
+		names = ["magic", "version", "flags", "iCount", "jCount", "storyCount", "layerCount", "sectionCount", "sectionTableOffset", "metadataOffset", "metadataLength"]
+		for name, value in values.items():
+			fields[names.index(name)] = value
+		file.seek(0)
+		file.write(msfformat.HEADER.pack(*fields))
+
+def test_valid_maps_pass(tmp_path):
+	path = str(tmp_path / "map.msf")
+	msfformat.save_map(painted_map(), path)
+	legacyPath = str(tmp_path / "legacy.msf")
+	legacy_pickle(legacyPath, stories = 2)
+	for file in [path, legacyPath]:
+		result = maptools.validate_file(file, paths.tileset_paths())
+		assert result["ok"], result["problems"]
+
+def test_legacy_maps_are_checked_as_stored(tmp_path, capsys):
+	# storyCount 3 with a single story, and tiles of 4 layers in a map of 6, which loading alone would smooth over.
+	path = str(tmp_path / "legacy.msf")
+	legacy_pickle(path, stories = 1, storyCount = 3, graphicsLayers = 4)
+	result = maptools.validate_file(path, paths.tileset_paths())
+	assert not result["ok"]
+	assert result["problems"] == ["storyCount is 3 but the map has 1 stories", "story 0 has tiles with 4 graphics layers, the map 6, first at (0, 0)"]
+	assert maptool.main(["validate", "--processes", "1", path]) == 1
+	assert "2 problems" in capsys.readouterr().out
+
+def test_binary_maps_are_checked_against_their_header(tmp_path):
+	mapFile = painted_map(stories = 2, layerCount = 3)
+	path = str(tmp_path / "map.msf")
+	msfformat.save_map(mapFile, path)
+	# A header claiming a third story, whose sections are not there.
+	rewrite_header(path, storyCount = 3)
+	problems = maptools.validate_file(path, paths.tileset_paths())["problems"]
+	assert "section (2, 1, 0) is missing" in problems and "section (2, 4, 0) is missing" in problems
+	assert problems[-1].startswith("cannot be loaded")
+	# A header claiming fewer layers than were written.
+	rewrite_header(path, storyCount = 2, layerCount = 2)
+	problems = maptools.validate_file(path, paths.tileset_paths())["problems"]
+	assert problems[:2] == ["section (0, 1, 2) does not belong to a map of 2 stories and 2 layers", "section (1, 1, 2) does not belong to a map of 2 stories and 2 layers"]
+
+def test_metadata_is_checked_against_the_size(tmp_path):
+	mapFile = painted_map(i = 10, j = 10)
+	path = str(tmp_path / "map.msf")
+	msfformat.save_map(mapFile, path)
+	header = msfformat.read_header(path)
+	metadata = msfformat.read_metadata(path, header)
+	metadata["triggers"].append([5, 1, 1, "stairs"])
+	# The metadata is written again at the end of the file, where the header is pointed.
+	data = json.dumps(metadata).encode("utf-8")
+	with open(path, "ab") as file:
+		offset = file.tell()
+		file.write(data)
+	rewrite_header(path, metadataOffset = offset, metadataLength = len(data))
+	problems = maptools.validate_file(path, paths.tileset_paths())["problems"]
+	assert problems[0] == "trigger 'stairs' lies outside the map, on story 5 at (1, 1)"
\ No newline at end of file
@@ -0,0 +1,74 @@
+# Fundamental imports
+import os
+import numpy
+import pytest
+# Elements from subdirectories
+from isomapmaker.core import msfformat
+from isomapmaker.core.mapfile import MapFile
+from isomapmaker.core.msfformat import PLANES
+from conftest import assert_same_map, legacy_pickle
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(tmp_path, mapFile, compress):
+	path = str(tmp_path / "map.msf")
+	msfformat.save_map(mapFile, path, compress)
+	header = msfformat.read_header(path)
+	assert (header["iCount"], header["jCount"], header["storyCount"], header["layerCount"]) == (40, 30, 2, 3)
+	assert bool(header["flags"] & msfformat.FLAG_ZLIB) == compress
+	loaded = msfformat.load_map(path)
+	assert_same_map(mapFile, loaded)
+	# Uncompressed planes are mapped from the file, compressed ones decompressed into memory.
+	assert isinstance(loaded.stories[0].sprites, numpy.memmap) != compress
+	assert isinstance(loaded.stories[1].terrain, numpy.memmap) != compress
+
+def test_mapped_planes_are_copy_on_write(tmp_path, mapFile):
+	path = str(tmp_path / "map.msf")
+	msfformat.save_map(mapFile, path)
+	loaded = msfformat.load_map(path)
+	loaded.stories[0].sprites[0, 0, 0] = 77
+	loaded.stories[1].stepCost[2, 5, 5] = 99
+	assert_same_map(mapFile, msfformat.load_map(path))
+
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("size", [dict(stories = 0), dict(i = 0, j = 5), dict(i = 5, j = 0), dict(layerCount = 0)])
+def test_empty_maps(tmp_path, compress, size):
+	mapFile = MapFile(**size)
+	path = str(tmp_path / "empty.msf")
+	msfformat.save_map(mapFile, path, compress)
+	loaded = msfformat.load_map(path)
+	assert len(loaded.stories) == len(mapFile.stories)
+	for story1, story2 in zip(mapFile.stories, loaded.stories):
+		for name in PLANES:
+			assert getattr(story1, name).shape == getattr(story2, name).shape
+
+def test_unserializable_triggers_are_refused_before_writing(tmp_path, mapFile):
+	path = str(tmp_path / "map.msf")
+	msfformat.save_map(mapFile, path)
+	saved = open(path, "rb").read()
+	mapFile.stories[1].triggers[(6, 7)] = {"open": object()}
+	with pytest.raises(TypeError, match = r"trigger on story 1 at \(6, 7\)"):
+		msfformat.save_map(mapFile, path)
+	assert open(path, "rb").read() == saved and not os.path.exists(path + ".tmp")
+
+def test_legacy_maps_are_converted(tmp_path):
+	path = str(tmp_path / "legacy.msf")
+	legacy_pickle(path, stories = 2)
+	assert msfformat.legacy_problems(msfformat.read_legacy_record(path)) == []
+	mapFile = msfformat.load_map(path)
+	assert (len(mapFile.stories), mapFile.layerCount, mapFile.stories[0].sprites.shape) == (2, 6, (6, 4, 3))
+	assert mapFile.stories[1].get_tile(2, 1).graphics[0] == ["tileset base.png", [[[64, 0]]], [64, 32]]
+	assert mapFile.stories[0].get_tile(0, 0).trigger == "door" and mapFile.stories[0].get_tile(1, 1).stepCost == [1, 2, 3]
+	msfformat.convert_legacy_map(path)
+	assert msfformat.is_msf(path)
+	assert_same_map(mapFile, msfformat.load_map(path))
+
+def test_legacy_maps_that_disagree_with_themselves_are_reported(tmp_path, caplog):
+	path = str(tmp_path / "legacy.msf")
+	legacy_pickle(path, stories = 1, storyCount = 3, graphicsLayers = 4)
+	problems = msfformat.legacy_problems(msfformat.read_legacy_record(path))
+	assert problems == ["storyCount is 3 but the map has 1 stories", "story 0 has tiles with 4 graphics layers, the map 6, first at (0, 0)"]
+	with caplog.at_level("WARNING", logger = "isomapmaker"):
+		mapFile = msfformat.load_map(path)
+	assert [record.getMessage() for record in caplog.records] == [path + ": " + problem for problem in problems]
+	# The map is loaded as best it can be.
+	assert len(mapFile.stories) == 1 and mapFile.stories[0].sprites.shape[0] == 6
\ No newline at end of file
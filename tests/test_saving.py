@@ -0,0 +1,52 @@
+# Fundamental imports
+import os
+import numpy
+import pytest
+# Elements from subdirectories
+from isomapmaker.core import msfformat
+from isomapmaker.core.msfformat import PLANES
+from conftest import assert_same_map
+
+@pytest.mark.parametrize("detach", [False, True])
+def test_saving_over_the_mapped_file(tmp_path, mapFile, monkeypatch, detach):
+	# On Windows the planes mapped from the file are copied into memory before it is replaced, which is tried here on
+	# any platform.
+	monkeypatch.setattr(msfformat, "DETACH_BEFORE_REPLACE", detach)
+	path = str(tmp_path / "map.msf")
+	msfformat.save_map(mapFile, path)
+	loaded = msfformat.load_map(path)
+	loaded.stories[1].sprites[2, 7, 8] = 1
+	loaded.stories[0].triggers[(0, 0)] = "chest"
+	msfformat.save_map(loaded, path)
+	assert isinstance(loaded.stories[0].sprites, numpy.memmap) != detach
+	reloaded = msfformat.load_map(path)
+	assert_same_map(loaded, reloaded)
+	assert int(reloaded.stories[1].sprites[2, 7, 8]) == 1
+	# The map saved over still reads its own tiles, and a second save over the new file works too.
+	reloaded.stories[0].sprites[1, 1, 1] = 2
+	msfformat.save_map(reloaded, path, True)
+	assert_same_map(reloaded, msfformat.load_map(path))
+	assert not os.path.exists(path + ".tmp")
+
+def test_detach_only_copies_planes_mapped_from_the_file(tmp_path, mapFile):
+	path, other = str(tmp_path / "map.msf"), str(tmp_path / "other.msf")
+	msfformat.save_map(mapFile, path)
+	msfformat.save_map(mapFile, other)
+	loaded = msfformat.load_map(path)
+	assert msfformat.detach_map(loaded, other) == 0
+	assert msfformat.detach_map(loaded, path) == len(PLANES) * 2
+	assert not any(isinstance(getattr(story, name), numpy.memmap) for story in loaded.stories for name in PLANES)
+	assert_same_map(mapFile, loaded)
+
+def test_loaded_maps_are_not_saved_until_changed(tmp_path, mapFile):
+	saving = pytest.importorskip("isomapmaker.editor.saving")
+	path = str(tmp_path / "map.msf")
+	msfformat.save_map(mapFile, path)
+	loaded = msfformat.load_map(path)
+	saver = saving.BackgroundSaver()
+	assert saver.is_changed(loaded)
+	saver.mark_saved(loaded)
+	assert not saver.is_changed(loaded)
+	loaded.stories[0].matrix[2][3].set_trigger("stairs")
+	assert saver.is_changed(loaded)
+	assert not saver.compress
\ No newline at end of file
@@ -0,0 +1,63 @@
+# Fundamental imports
+import numpy
+# Elements from subdirectories
+from isomapmaker.core.selection import Selection, rect_between
+
+def rects_mask(rects, iCount, jCount):
+	# Paints the rectangles into a mask, checking that none of them overlap.
+	mask = numpy.zeros((iCount, jCount), dtype = numpy.int32)
+	for i0, i1, j0, j1 in rects:
+		mask[i0:i1, j0:j1] += 1
+	assert mask.max(initial = 0) <= 1
+	return mask.astype(bool)
+
+def test_rect_between_includes_both_corners():
+	assert rect_between([5, 2], [3, 7]) == [3, 6, 2, 8]
+	assert rect_between([4, 4], [4, 4]) == [4, 5, 4, 5]
+
+def test_rects_are_clipped_to_the_map():
+	selection = Selection(10, 8)
+	selection.add_rect([-3, 2, 6, 20])
+	assert selection.get_bounds() == [0, 2, 6, 8]
+	assert len(selection) == 4
+	assert (-1, 6) not in selection and (1, 7) in selection
+	selection.add_rect([20, 30, 0, 5])
+	assert len(selection) == 4
+
+def test_union_and_difference_of_rects():
+	selection = Selection(12, 12)
+	selection.add_rect([0, 6, 0, 6])
+	selection.add_rect([3, 9, 3, 9])
+	selection.remove_rect([4, 5, 0, 12])
+	other = Selection(12, 12)
+	other.add(11, 11)
+	selection.union(other)
+	expected = numpy.zeros((12, 12), dtype = bool)
+	expected[0:6, 0:6] = True
+	expected[3:9, 3:9] = True
+	expected[4, :] = False
+	expected[11, 11] = True
+	assert (selection.mask == expected).all()
+	selection.difference(other)
+	assert not (11, 11) in selection
+
+def test_rects_cover_the_selection_exactly():
+	rng = numpy.random.default_rng(1)
+	selection = Selection(30, 25)
+	for n in range(40):
+		a, b = rng.integers(0, 30, 2), rng.integers(0, 25, 2)
+		rect = rect_between([a[0], b[0]], [a[1], b[1]])
+		if n % 3 == 2:
+			selection.remove_rect(rect)
+		else:
+			selection.add_rect(rect)
+		assert (rects_mask(selection.get_rects(), 30, 25) == selection.mask).all()
+
+def test_rects_are_worked_out_again_only_after_a_change():
+	selection = Selection(6, 6)
+	selection.add_rect([1, 3, 1, 3])
+	rects = selection.get_rects()
+	assert rects == [[1, 3, 1, 3]]
+	assert selection.get_rects() is rects
+	selection.clear()
+	assert selection.get_rects() == [] and selection.is_empty() and selection.get_bounds() == None
\ No newline at end of file
@@ -0,0 +1,23 @@
+# Fundamental imports
+import pytest
+# Elements from subdirectories
+from isomapmaker.core.sprites import SpriteTable, MAX_SPRITE_INDEX
+
+def test_definitions_are_stored_once():
+	table = SpriteTable()
+	first = table.intern(["tileset base.png", [[[0, 0]]], [64, 32]])
+	assert first == 1 and table.intern(("tileset base.png", (((0, 0),),), (64, 32))) == first
+	assert table.intern([None]) == 0 and table.intern(None) == 0
+	assert table.get(first) == ["tileset base.png", [[[0, 0]]], [64, 32]] and table.get(0) == [None]
+	assert table.get_type(first) == ['object', False]
+
+def test_sprite_table_refuses_indices_past_the_planes():
+	table = SpriteTable()
+	for n in range(MAX_SPRITE_INDEX):
+		table.intern(["tileset base.png", [[[n, 0]]], [64, 32]])
+	assert len(table) == MAX_SPRITE_INDEX + 1
+	# Definitions already in the table are still found.
+	assert table.intern(["tileset base.png", [[[3, 0]]], [64, 32]]) == 4
+	with pytest.raises(ValueError):
+		table.intern(["wall base.png", [[[0, 0]]], [64, 96]])
+	assert len(table) == MAX_SPRITE_INDEX + 1
\ No newline at end of file